@@ -0,0 +1,182 @@
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+
+#the submission issues to re-parse: those with MATE_BACKFILL_LABEL, in MATE_BACKFILL_STATE (open, closed or all)
+SUBMISSION_REPO = "ModelAtlasofTheEarth/model_submission"
+LABEL = os.getenv("MATE_BACKFILL_LABEL", "new model")
+STATE = os.getenv("MATE_BACKFILL_STATE", "all")
+
+#issues parsed at once, and the maximum number of metadata requests per second shared by all of them
+WORKERS = int(os.getenv("MATE_BACKFILL_WORKERS", 4))
+RATE_LIMIT = float(os.getenv("MATE_BACKFILL_RATE_LIMIT", 5))
+
+JOURNAL_FILE = "journal.jsonl"
+
+#journal statuses of a finished issue. Issues that raised an error are parsed again when the run is resumed, and
+#issues parsed without a model repository slug are recorded as SLUG_ERROR
+OK = "ok"
+FORM_ERROR = "form_error"
+SLUG_ERROR = "slug_error"
+ERROR = "error"
+
+
+class Journal:
+
+    """
+    Append-only record of the issues a backfill has finished, one JSON line per issue, written as each finishes.
+
+    An issue is done if its last line has status OK, FORM_ERROR or SLUG_ERROR and the issue hasn't been edited
+    since (same updated_at), so an interrupted run resumes where it stopped, and a resumed run picks up edited
+    issues. A line left incomplete by an interruption is ignored.
+
+    Parameters:
+    - path (str): the journal file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.entries[entry["issue"]] = entry
+        except FileNotFoundError:
+            pass
+
+    def done(self, number, updated_at):
+        entry = self.entries.get(number)
+        return entry is not None and entry["status"] in (OK, FORM_ERROR, SLUG_ERROR) and entry["updated_at"] == updated_at
+
+    def record(self, number, updated_at, status, message=""):
+        entry = {"issue": number, "updated_at": updated_at, "status": status, "message": message,
+                 "time": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries[number] = entry
+
+
+def list_issues(repo, label=LABEL, state=STATE, numbers=None):
+    """
+    Returns the submission issues (not pull requests) with a label and state, or the given issue numbers.
+    """
+    if numbers:
+        return [repo.get_issue(number=n) for n in numbers]
+    labels = [repo.get_label(label)] if label else []
+    return [issue for issue in repo.get_issues(state=state, labels=labels) if issue.pull_request is None]
+
+
+def _write(path, content):
+    #the outputs of an issue are replaced whole, so a half-written file is never left for review
+    with open(path + ".tmp", "w") as f:
+        f.write(content)
+    os.replace(path + ".tmp", path)
+
+
+def backfill_issue(issue, out_dir):
+
+    """
+    Parses one issue and writes its outputs to out_dir/<issue number>: issue_dict.json, the report (report.md)
+    and the parse log (log.md).
+
+    The model repositories of past issues already exist, so the proposed slug is taken as the slug without checking
+    that a repository can be created with it (parse_issue's check_repo_name).
+
+    Returns:
+    - tuple: (journal status, message)
+    """
+
+    from parse_issue import parse_issue
+    from issue_fields import IssueFormError
+    from crosswalks import dict_to_report
+
+    issue_dir = os.path.join(out_dir, str(issue.number))
+    os.makedirs(issue_dir, exist_ok=True)
+    try:
+        data, error_log = parse_issue(issue, check_repo_name=False)
+    except IssueFormError as err:
+        _write(os.path.join(issue_dir, "log.md"), str(err))
+        return FORM_ERROR, str(err)
+    _write(os.path.join(issue_dir, "issue_dict.json"), json.dumps(data, indent=2))
+    _write(os.path.join(issue_dir, "report.md"), dict_to_report(data, verbose=True))
+    _write(os.path.join(issue_dir, "log.md"), error_log)
+    if not data.get("slug"):
+        return SLUG_ERROR, "no model repository slug"
+    return OK, f"{error_log.count('Error')} errors, {error_log.count('Warning')} warnings"
+
+
+def backfill(issues, out_dir, workers=WORKERS, rate_limit=RATE_LIMIT):
+
+    """
+    Re-parses submission issues concurrently into out_dir, skipping those the journal records as done.
+
+    The threads share the process's caches (templates, FoR codes, person index) and the metadata records
+    fetched (request_utils.enable_record_cache), and all metadata requests are held to rate_limit per second.
+    Nothing is published: the outputs are only written to out_dir.
+
+    Parameters:
+    - issues (list): the issues (github.Issue.Issue).
+    - out_dir (str): the output directory, holding the journal (journal.jsonl).
+    - workers (int, optional): the number of issues parsed at once.
+    - rate_limit (float, optional): the maximum number of metadata requests per second (0 for no limit).
+
+    Returns:
+    - dict: the number of issues per journal status, and 'skipped' (done in an earlier run).
+    """
+
+    from request_utils import enable_record_cache, set_rate_limit
+    enable_record_cache()
+    set_rate_limit(rate_limit)
+
+    os.makedirs(out_dir, exist_ok=True)
+    journal = Journal(os.path.join(out_dir, JOURNAL_FILE))
+    counts = {OK: 0, FORM_ERROR: 0, SLUG_ERROR: 0, ERROR: 0, "skipped": 0}
+    pending = []
+    for issue in issues:
+        updated_at = issue.updated_at.isoformat()
+        if journal.done(issue.number, updated_at):
+            counts["skipped"] += 1
+        else:
+            pending.append((issue, updated_at))
+
+    def run(issue, updated_at):
+        try:
+            status, message = backfill_issue(issue, out_dir)
+        except Exception as err:
+            status, message = ERROR, f"{type(err).__name__}: {err}"
+        journal.record(issue.number, updated_at, status, message)
+        return issue.number, status, message
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run, issue, updated_at) for issue, updated_at in pending]
+        for future in as_completed(futures):
+            number, status, message = future.result()
+            counts[status] += 1
+            print(f"#{number}: {status} ({message.splitlines()[0] if message else ''})")
+    return counts
+
+
+if __name__ == "__main__":
+    #python3 .github/scripts/backfill.py <output directory> [issue number ...]
+    if len(sys.argv) < 2:
+        print("usage: backfill.py OUT_DIR [ISSUE_NUMBER ...]")
+        sys.exit(2)
+    from github import Github, Auth
+    g = Github(auth=Auth.Token(os.environ["GITHUB_TOKEN"]))
+    repo = g.get_repo(SUBMISSION_REPO)
+    issues = list_issues(repo, numbers=[int(n) for n in sys.argv[2:]])
+    counts = backfill(issues, sys.argv[1])
+    print(", ".join(f"{count} {status}" for status, count in counts.items()))
+    sys.exit(1 if counts[ERROR] else 0)
@@ -0,0 +1,220 @@
+import base64
+import difflib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from request_utils import session, TIMEOUT
+from regeneration import OUTPUT_FILES, build_outputs
+
+
+#the organisation whose model repositories are regenerated. A repository is a model repository if it has
+#.metadata_trail/issue_dict.json on its default branch
+ORGANISATION = os.getenv("MATE_ORGANISATION", "ModelAtlasofTheEarth")
+GRAPHQL_URL = "https://api.github.com/graphql"
+
+#repositories fetched per GraphQL query (each with its issue_dict.json, crate and index.md), index.md files
+#rendered at once, and repositories committed to at once
+PAGE_SIZE = int(os.getenv("MATE_BULK_PAGE_SIZE", 25))
+RENDER_WORKERS = int(os.getenv("MATE_BULK_RENDER_WORKERS", os.cpu_count() or 1))
+PUSH_WORKERS = int(os.getenv("MATE_BULK_PUSH_WORKERS", 4))
+
+INDEX_FILE = OUTPUT_FILES["index"][0]
+ISSUE_DICT_FILE = OUTPUT_FILES["issue_dict"][0]
+#the nested crate, whose root entity has the id ./ (see regeneration.crate_timestamp)
+CRATE_FILE = OUTPUT_FILES["nested_crate"][0]
+COMMIT_MESSAGE = "Regenerate .website_material/index.md from the metadata trail"
+
+#repository statuses in the summary
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+_repositories_query = """
+query($organisation: String!, $first: Int!, $after: String) {
+  organization(login: $organisation) {
+    repositories(first: $first, after: $after, orderBy: {field: NAME, direction: ASC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        name
+        isArchived
+        defaultBranchRef { name target { oid } }
+        issueDict: object(expression: "HEAD:%s") { ... on Blob { text } }
+        crate: object(expression: "HEAD:%s") { ... on Blob { text } }
+        index: object(expression: "HEAD:%s") { ... on Blob { text } }
+      }
+    }
+  }
+}
+""" % (ISSUE_DICT_FILE, CRATE_FILE, INDEX_FILE)
+
+_commit_mutation = """
+mutation($input: CreateCommitOnBranchInput!) {
+  createCommitOnBranch(input: $input) { commit { oid url } }
+}
+"""
+
+
+def graphql(query, variables, token):
+    """
+    Runs a GitHub GraphQL query, and returns its data. Raises RuntimeError with the messages of any errors.
+    """
+    response = session.post(GRAPHQL_URL, json={"query": query, "variables": variables},
+                            headers={"Authorization": f"Bearer {token}"}, timeout=TIMEOUT)
+    response.raise_for_status()
+    result = response.json()
+    if result.get("errors"):
+        raise RuntimeError("; ".join(error.get("message", "") for error in result["errors"]))
+    return result["data"]
+
+
+def _text(blob):
+    return blob["text"] if blob else None
+
+
+def fetch_models(token, organisation=ORGANISATION, page_size=PAGE_SIZE):
+    """
+    Yields the model repositories of an organisation, PAGE_SIZE repositories per GraphQL query.
+
+    Each is a dict with the repository 'name', its default 'branch' and 'head' commit, and the text of its
+    issue_dict.json ('issue_dict'), nested RO-Crate ('crate') and index.md ('index'), or None for a
+    missing file. Archived and empty repositories, and those without an issue_dict.json, are not yielded.
+    """
+    after = None
+    while True:
+        data = graphql(_repositories_query, {"organisation": organisation, "first": page_size, "after": after}, token)
+        repositories = data["organization"]["repositories"]
+        for node in repositories["nodes"]:
+            if node["isArchived"] or node["defaultBranchRef"] is None or node["issueDict"] is None:
+                continue
+            yield {
+                "name": node["name"],
+                "branch": node["defaultBranchRef"]["name"],
+                "head": node["defaultBranchRef"]["target"]["oid"],
+                "issue_dict": _text(node["issueDict"]),
+                "crate": _text(node["crate"]),
+                "index": _text(node["index"]),
+            }
+        if not repositories["pageInfo"]["hasNextPage"]:
+            return
+        after = repositories["pageInfo"]["endCursor"]
+
+
+def render_index(model):
+
+    """
+    Renders the index.md of a model repository from its issue_dict.json (run in a worker process).
+
+    The page keeps the date it was published with: the datePublished of the repository's nested RO-Crate. It is
+    written with the round-trip emitter, which wrote the existing pages, so that no page changes only by the way
+    its scalars are quoted or escaped.
+
+    Parameters:
+    - model (dict): a model repository, as yielded by fetch_models.
+
+    Returns:
+    - tuple: (status, new index.md or None, message)
+    """
+
+    from crate_graph import CrateGraph
+    try:
+        issue_dict = json.loads(model["issue_dict"])
+        timestamp = (CrateGraph(json.loads(model["crate"])).root or {}).get("datePublished", False) if model["crate"] else False
+        if not timestamp:
+            return SKIPPED, None, f"no datePublished in {CRATE_FILE}"
+        index = build_outputs(issue_dict, ["index"], timestamp=timestamp, yaml_mode='rt')[INDEX_FILE]
+    except Exception as err:
+        return FAILED, None, f"{type(err).__name__}: {err}"
+    if index == model["index"]:
+        return UNCHANGED, None, ""
+    diff = list(difflib.unified_diff((model["index"] or "").splitlines(), index.splitlines(), lineterm="", n=0))
+    changed_lines = sum(1 for line in diff if line[:1] in "+-" and line[:3] not in ("+++", "---"))
+    return CHANGED, index, f"{changed_lines} lines changed"
+
+
+def push_index(model, index, token):
+    """
+    Commits a new index.md to the default branch of a model repository, in a single commit. The commit is refused
+    if the branch has moved since the repository was fetched.
+
+    Returns:
+    - str: the URL of the commit
+    """
+    commit_input = {
+        "branch": {"repositoryNameWithOwner": f"{ORGANISATION}/{model['name']}", "branchName": model["branch"]},
+        "expectedHeadOid": model["head"],
+        "message": {"headline": COMMIT_MESSAGE},
+        "fileChanges": {"additions": [{"path": INDEX_FILE, "contents": base64.b64encode(index.encode()).decode()}]},
+    }
+    data = graphql(_commit_mutation, {"input": commit_input}, token)
+    return data["createCommitOnBranch"]["commit"]["url"]
+
+
+def regenerate_indexes(token, push=False, render_workers=RENDER_WORKERS, push_workers=PUSH_WORKERS):
+
+    """
+    Regenerates the website index.md of every model repository of the organisation.
+
+    The repositories are fetched in batches through GraphQL, the pages are rendered in a process pool, and (with
+    push) the changed pages are committed, at most push_workers repositories at once, one commit per repository.
+    Unchanged pages are not pushed.
+
+    Parameters:
+    - token (str): a GitHub token that can read (and, with push, write to) the model repositories.
+    - push (bool, optional): commit the changed pages; otherwise only report them.
+    - render_workers (int, optional): the number of rendering processes.
+    - push_workers (int, optional): the number of repositories committed to at once.
+
+    Returns:
+    - list: one (repository name, status, message) tuple per model repository
+    """
+
+    models = list(fetch_models(token))
+    with ProcessPoolExecutor(max_workers=render_workers) as executor:
+        rendered = list(executor.map(render_index, models))
+
+    results = {}
+    changed = []
+    for model, (status, index, message) in zip(models, rendered):
+        results[model["name"]] = (status, message)
+        if status == CHANGED:
+            changed.append((model, index))
+
+    def push_one(model, index):
+        try:
+            url = push_index(model, index, token)
+            return model["name"], (CHANGED, f"{results[model['name']][1]}, {url}")
+        except Exception as err:
+            return model["name"], (FAILED, f"push failed: {type(err).__name__}: {err}")
+
+    if push and changed:
+        with ThreadPoolExecutor(max_workers=push_workers) as executor:
+            for name, result in executor.map(lambda item: push_one(*item), changed):
+                results[name] = result
+    return [(name, status, message) for name, (status, message) in results.items()]
+
+
+def summary(results, pushed=False):
+    """
+    Formats the results of regenerate_indexes as a summary: one line per repository that isn't unchanged,
+    then the number of repositories per status.
+    """
+    text = ""
+    for name, status, message in results:
+        if status != UNCHANGED:
+            text += f"{name}: {status}{' (not pushed)' if status == CHANGED and not pushed else ''}" + (f" - {message}" if message else "") + "\n"
+    counts = {}
+    for _, status, _ in results:
+        counts[status] = counts.get(status, 0) + 1
+    text += f"{len(results)} model repositories: " + ", ".join(f"{count} {status}" for status, count in sorted(counts.items())) + "\n"
+    return text
+
+
+if __name__ == "__main__":
+    #python3 .github/scripts/bulk_index.py [--push]
+    #without --push, the changes are only reported
+    push = "--push" in sys.argv[1:]
+    results = regenerate_indexes(os.environ["GITHUB_TOKEN"], push=push)
+    print(summary(results, pushed=push), end="")
+    sys.exit(1 if any(status == FAILED for _, status, _ in results) else 0)
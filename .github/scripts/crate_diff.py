@@ -0,0 +1,253 @@
+import json
+import sys
+from template_store import copy_json
+
+
+#properties whose list order is meaningful (e.g. author order); any change replaces the whole list.
+#all other lists are treated as sets, as JSON-LD does, and changed item by item
+ORDERED_PROPERTIES = frozenset(["author", "creator", "contributor", "editor", "funder", "itemListElement"])
+
+
+def _escape(token):
+    #RFC 6901 JSON pointer escaping
+    return str(token).replace('~', '~0').replace('/', '~1')
+
+
+def _unescape(token):
+    return token.replace('~1', '/').replace('~0', '~')
+
+
+def entity_path(entity_id, key=None):
+    """
+    Returns the change-set path of an entity ('/@graph/<@id>') or of one of its properties ('/@graph/<@id>/<key>').
+    """
+    path = '/@graph/' + _escape(entity_id)
+    return path if key is None else path + '/' + _escape(key)
+
+
+def parse_path(path):
+    """
+    Splits a change-set path into (entity_id, key, append). entity_id is None for '/@context', key is None for a
+    whole entity, and append is True for a path ending in '/-' (an item added to a set-like list).
+    """
+    tokens = [_unescape(t) for t in path.split('/')[1:]]
+    if tokens == ['@context']:
+        return None, None, False
+    if len(tokens) < 2 or tokens[0] != '@graph':
+        raise ValueError(f"Invalid change path: {path}")
+    append = len(tokens) == 4 and tokens[3] == '-'
+    if len(tokens) > 3 and not append:
+        raise ValueError(f"Invalid change path: {path}")
+    return tokens[1], tokens[2] if len(tokens) > 2 else None, append
+
+
+def _key(value):
+    return json.dumps(value, sort_keys=True)
+
+
+def _as_list(value):
+    return value if isinstance(value, list) else [value]
+
+
+def diff_entity(entity_id, old, new):
+    """
+    Returns the property-level changes that turn entity old into entity new (both with the same '@id').
+    """
+    changes = []
+    for key, old_value in old.items():
+        if key == '@id':
+            continue
+        if key not in new:
+            changes.append({'op': 'remove', 'path': entity_path(entity_id, key)})
+            continue
+        new_value = new[key]
+        if _key(old_value) == _key(new_value):
+            continue
+        if (key not in ORDERED_PROPERTIES and isinstance(old_value, list) and isinstance(new_value, list)):
+            old_keys = {_key(v) for v in old_value}
+            new_keys = {_key(v) for v in new_value}
+            removed = [v for v in old_value if _key(v) not in new_keys]
+            added = [v for v in new_value if _key(v) not in old_keys]
+            #if neither is set, the lists hold the same items in a different order: nothing to change for a set
+            for v in removed:
+                changes.append({'op': 'remove', 'path': entity_path(entity_id, key), 'value': v})
+            for v in added:
+                changes.append({'op': 'add', 'path': entity_path(entity_id, key) + '/-', 'value': v})
+            continue
+        changes.append({'op': 'replace', 'path': entity_path(entity_id, key), 'value': new_value})
+    for key, new_value in new.items():
+        if key not in old:
+            changes.append({'op': 'add', 'path': entity_path(entity_id, key), 'value': new_value})
+    return changes
+
+
+def diff_crates(old_crate, new_crate):
+
+    """
+    Computes a change set that turns old_crate into new_crate.
+
+    Entities are matched by '@id', not by position, so reordering the '@graph' produces no changes. Changes are
+    JSON-Patch style operations whose paths address entities by '@id':
+
+    - {"op": "add", "path": "/@graph/<@id>", "value": entity}: a new entity;
+    - {"op": "remove", "path": "/@graph/<@id>"}: a deleted entity;
+    - {"op": "add" | "replace", "path": "/@graph/<@id>/<property>", "value": ...}: a new or changed property;
+    - {"op": "remove", "path": "/@graph/<@id>/<property>"}: a deleted property;
+    - {"op": "add", "path": "/@graph/<@id>/<property>/-", "value": item}: an item added to a set-like list;
+    - {"op": "remove", "path": "/@graph/<@id>/<property>", "value": item}: an item removed from a set-like list;
+    - {"op": "replace", "path": "/@context", "value": ...}: a changed context.
+
+    '@id's and property names are escaped as JSON pointer tokens ('~' as '~0', '/' as '~1').
+
+    Parameters:
+    - old_crate (dict): the existing (flattened) crate.
+    - new_crate (dict): the regenerated (flattened) crate.
+
+    Returns:
+    - list: the change set. Empty if the crates are equivalent.
+    """
+
+    changes = []
+    if _key(old_crate.get('@context')) != _key(new_crate.get('@context')):
+        changes.append({'op': 'replace', 'path': '/@context', 'value': new_crate.get('@context')})
+
+    old_entities = {e['@id']: e for e in old_crate.get('@graph', [])}
+    new_entities = {e['@id']: e for e in new_crate.get('@graph', [])}
+
+    for entity_id, old in old_entities.items():
+        if entity_id not in new_entities:
+            changes.append({'op': 'remove', 'path': entity_path(entity_id)})
+        else:
+            changes.extend(diff_entity(entity_id, old, new_entities[entity_id]))
+    for entity_id, new in new_entities.items():
+        if entity_id not in old_entities:
+            changes.append({'op': 'add', 'path': entity_path(entity_id), 'value': new})
+    return changes
+
+
+def apply_changes(crate, changes):
+
+    """
+    Applies a change set from diff_crates to a crate and returns the updated crate. The input crate is not modified.
+
+    Entities and properties keep their position; new entities and properties are appended. Raises a ValueError
+    if a change does not apply (e.g. it removes an entity that is not in the crate), so a patch made against a
+    different version of the crate is not applied silently.
+
+    Parameters:
+    - crate (dict): the crate to update.
+    - changes (list): the change set.
+
+    Returns:
+    - dict: the updated crate.
+    """
+
+    crate = copy_json(crate)
+    graph = crate.setdefault('@graph', [])
+    entities = {e['@id']: e for e in graph}
+    removed = set()
+
+    for change in changes:
+        op, path = change['op'], change['path']
+        entity_id, key, append = parse_path(path)
+
+        if entity_id is None:
+            crate['@context'] = copy_json(change['value'])
+            continue
+
+        if key is None:
+            if op == 'add':
+                if entity_id in entities:
+                    raise ValueError(f"Cannot add {path}: the entity already exists")
+                entities[entity_id] = copy_json(change['value'])
+                graph.append(entities[entity_id])
+                removed.discard(entity_id)
+            elif op == 'remove':
+                if entities.pop(entity_id, None) is None:
+                    raise ValueError(f"Cannot remove {path}: the entity does not exist")
+                removed.add(entity_id)
+            else:
+                raise ValueError(f"Unsupported operation {op} on {path}")
+            continue
+
+        entity = entities.get(entity_id)
+        if entity is None:
+            raise ValueError(f"Cannot apply {op} to {path}: the entity does not exist")
+
+        if append:
+            current = entity.get(key)
+            values = [] if current is None else _as_list(current)
+            entity[key] = values + [copy_json(change['value'])]
+        elif op in ('add', 'replace'):
+            entity[key] = copy_json(change['value'])
+        elif op == 'remove' and 'value' in change:
+            if key not in entity:
+                raise ValueError(f"Cannot remove an item from {path}: the property does not exist")
+            target = _key(change['value'])
+            values = _as_list(entity[key])
+            kept = [v for v in values if _key(v) != target]
+            if len(kept) == len(values):
+                raise ValueError(f"Cannot remove an item from {path}: the item is not present")
+            entity[key] = kept
+        elif op == 'remove':
+            if entity.pop(key, None) is None:
+                raise ValueError(f"Cannot remove {path}: the property does not exist")
+        else:
+            raise ValueError(f"Unsupported operation {op} on {path}")
+
+    if removed:
+        crate['@graph'] = [e for e in graph if e['@id'] not in removed or entities.get(e['@id']) is e]
+    return crate
+
+
+def summarise_changes(changes):
+    """
+    Groups a change set by entity.
+
+    Returns:
+    - dict: maps each changed '@id' ('@context' for the context) to 'added', 'removed', or the sorted list of
+      its changed properties.
+    """
+    summary = {}
+    for change in changes:
+        entity_id, key, _ = parse_path(change['path'])
+        if entity_id is None:
+            summary['@context'] = 'changed'
+        elif key is None:
+            summary[entity_id] = 'added' if change['op'] == 'add' else 'removed'
+        elif isinstance(summary.setdefault(entity_id, []), list) and key not in summary[entity_id]:
+            summary[entity_id].append(key)
+    return {k: sorted(v) if isinstance(v, list) else v for k, v in summary.items()}
+
+
+def format_changes(changes):
+    """
+    Formats a change set as a markdown list of the changed entities, for commit messages and reports.
+    """
+    summary = summarise_changes(changes)
+    if not summary:
+        return "No changes to the RO-Crate. \n"
+    lines = []
+    for entity_id, change in summary.items():
+        if isinstance(change, list):
+            change = "changed " + ", ".join(f"`{key}`" for key in change)
+        lines.append(f"* `{entity_id}`: {change} \n")
+    return "".join(lines)
+
+
+if __name__ == "__main__":
+    #python3 crate_diff.py diff old.json new.json > changes.json
+    #python3 crate_diff.py apply crate.json changes.json > updated.json
+    if len(sys.argv) == 4 and sys.argv[1] in ("diff", "apply"):
+        with open(sys.argv[2]) as f:
+            first = json.load(f)
+        with open(sys.argv[3]) as f:
+            second = json.load(f)
+        if sys.argv[1] == "diff":
+            result = diff_crates(first, second)
+            print(format_changes(result), file=sys.stderr)
+        else:
+            result = apply_changes(first, second)
+        print(json.dumps(result, indent=2))
+    else:
+        print("usage: crate_diff.py diff old.json new.json | crate_diff.py apply crate.json changes.json")
@@ -0,0 +1,261 @@
+import json
+import os
+import copy
+from collections import Counter
+from template_store import copy_json
+from crate_graph import new_allocator
+
+
+#selects the flatten/compact implementation used by flatten_and_compact:
+# 'native' - the native flattener only
+# 'pyld'   - the pyld expand/flatten/compact round trip only
+# 'verify' - run both, diff the results and print any differences, return the pyld result (opt-in, for checking)
+FLATTEN_MODE = os.getenv("MATE_FLATTEN_MODE", "native")
+
+
+def _value_key(value):
+    #hashable key used to drop duplicate values of a property, as JSON-LD flattening does
+    if isinstance(value, dict):
+        if len(value) == 1 and '@id' in value:
+            return ('@id', value['@id'])
+        return ('@value', json.dumps(value, sort_keys=True))
+    return (type(value).__name__, value)
+
+
+def flatten_compact(crate, compact_arrays=True, blank_ids=None, allocator=None):
+
+    """
+    Flattens and compacts an RO-Crate in a single pass over its '@graph', without a JSON-LD processor.
+
+    Produces the same graph as the pyld expand -> flatten -> compact round trip for the M@TE RO-Crate profile
+    (a context using plain schema.org terms), but keeps '@id' and '@type' keys and the crate's own identifiers
+    as they are, so no key rewriting or base-IRI handling is required afterwards:
+
+    - every nested entity is moved to the top level of the '@graph' and replaced by an {"@id": ...} reference;
+    - entities without an '@id' get a new id from the allocator (existing ids are kept);
+    - entities that appear several times with the same '@id' are merged, property values are unioned;
+    - None values and empty dictionaries are dropped, nested lists are flattened, and duplicate values removed;
+    - if compact_arrays is True, single-valued lists are replaced by their value;
+    - entities that are only ever referenced (an '@id' and nothing else) are not added to the '@graph'.
+
+    The input crate is not modified.
+
+    Parameters:
+    - crate (dict): the nested RO-Crate with '@context' and '@graph' keys.
+    - compact_arrays (bool, optional): replace single-valued lists by their value. Defaults to True.
+    - blank_ids (set, optional): if given, the blank node ids generated for the crate are added to it.
+    - allocator (BlankNodeAllocator, optional): allocator to draw new ids from, e.g. one shared with other
+      crate builders. By default a new allocator for crate_graph.BLANK_ID_MODE is used, which never
+      reuses an id already in the crate.
+
+    Returns:
+    - dict: the flattened and compacted RO-Crate.
+    """
+
+    if allocator is None:
+        allocator = new_allocator()
+    #register the existing ids, so that new ids cannot collide with them
+    allocator.collect(crate['@graph'])
+    nodes = {}
+    seen = {}
+
+    def new_id(obj):
+        new = allocator.allocate(obj)
+        if blank_ids is not None:
+            blank_ids.add(new)
+        return new
+
+    def add_node(obj):
+        entity_id = obj.get('@id') or new_id(obj)
+        node = nodes.get(entity_id)
+        if node is None:
+            node = nodes[entity_id] = {'@id': entity_id}
+            seen[entity_id] = {}
+        node_seen = seen[entity_id]
+        for key, value in obj.items():
+            if key == '@id' or value is None:
+                continue
+            values = to_values(value)
+            if not values and isinstance(value, dict):
+                continue
+            target = node.setdefault(key, [])
+            keys = node_seen.setdefault(key, set())
+            for v in values:
+                k = _value_key(v)
+                if k not in keys:
+                    keys.add(k)
+                    target.append(v)
+        return entity_id
+
+    def to_values(value):
+        if value is None:
+            return []
+        if isinstance(value, (list, tuple)):
+            out = []
+            for item in value:
+                out.extend(to_values(item))
+            return out
+        if isinstance(value, dict):
+            if '@value' in value:
+                return [value]
+            if not value:
+                return []
+            if len(value) == 1 and '@id' in value:
+                return [{'@id': value['@id']}] if value['@id'] else []
+            return [{'@id': add_node(value)}]
+        return [value]
+
+    for entity in crate['@graph']:
+        add_node(entity)
+
+    graph = []
+    for node in nodes.values():
+        if len(node) == 1:
+            continue
+        if compact_arrays:
+            for key, value in node.items():
+                if isinstance(value, list) and len(value) == 1:
+                    node[key] = value[0]
+        graph.append(node)
+
+    return {'@context': copy_json(crate['@context']), '@graph': graph}
+
+
+def pyld_flatten_compact(crate):
+    """
+    Flattens and compacts an RO-Crate with the pyld expand -> flatten -> compact round trip,
+    and restores the '@id' / '@type' keys. The input crate is not modified.
+    """
+    from pyld import jsonld
+    from ro_crate_utils import replace_keys_recursive
+
+    default_context_list = copy.deepcopy(crate['@context'])
+    expanded = jsonld.expand(crate)
+    flattened = jsonld.flatten(expanded)
+    flat_crate = {'@context': crate['@context'], '@graph': flattened}
+    #this strips the @ from the @ids,
+    flatcompact = jsonld.compact(flat_crate, ctx=default_context_list)
+    #add the @ back to type, id
+    return replace_keys_recursive(flatcompact)
+
+
+def _normalise(flat_crate, is_blank, rename):
+    #puts a flattened crate in a form where the two implementations can be compared:
+    #named entities keyed by (renamed) @id, blank entities as a multiset of their content,
+    #references to blank nodes replaced by a placeholder and list order ignored
+    entities = {e['@id']: e for e in flat_crate['@graph']}
+
+    def norm_values(value):
+        values = value if isinstance(value, list) else [value]
+        out = []
+        for v in values:
+            if isinstance(v, dict) and len(v) == 1 and '@id' in v:
+                target = v['@id']
+                if is_blank(target):
+                    if target not in entities:
+                        #dangling blank node (pyld's rendering of an empty dictionary)
+                        continue
+                    out.append('{"@id": "_:"}')
+                else:
+                    out.append(json.dumps({'@id': rename(target)}))
+            else:
+                out.append(json.dumps(v, sort_keys=True))
+        return sorted(out)
+
+    named = {}
+    blanks = Counter()
+    for entity_id, entity in entities.items():
+        props = {}
+        for key, value in entity.items():
+            if key == '@id':
+                continue
+            values = norm_values(value)
+            if values:
+                props[key] = values
+        if is_blank(entity_id):
+            blanks[json.dumps(props, sort_keys=True)] += 1
+        else:
+            named[rename(entity_id)] = props
+    return named, blanks
+
+
+def diff_flattened(native, reference, native_blank_ids=()):
+
+    """
+    Compares the output of flatten_compact with the output of pyld_flatten_compact.
+
+    Blank node labels, the order of entities and of list values, and pyld's resolution of relative '@id's
+    against its default base IRI are ignored.
+
+    Parameters:
+    - native (dict): crate returned by flatten_compact.
+    - reference (dict): crate returned by pyld_flatten_compact.
+    - native_blank_ids (set): the blank node ids generated by flatten_compact.
+
+    Returns:
+    - list: human readable descriptions of the differences; empty if the crates are equivalent.
+    """
+    from pyld import jsonld
+    base = jsonld.DEFAULT_BASE_IRI
+
+    def rename_pyld(entity_id):
+        if isinstance(entity_id, str) and entity_id.startswith(base):
+            return entity_id[len(base):] or './'
+        return entity_id
+
+    native_named, native_blanks = _normalise(native, lambda i: i in native_blank_ids, lambda i: i)
+    pyld_named, pyld_blanks = _normalise(reference, lambda i: isinstance(i, str) and i.startswith('_:'), rename_pyld)
+
+    differences = []
+    for entity_id in native_named.keys() - pyld_named.keys():
+        differences.append(f"entity {entity_id} only in native output")
+    for entity_id in pyld_named.keys() - native_named.keys():
+        differences.append(f"entity {entity_id} only in pyld output")
+    for entity_id in native_named.keys() & pyld_named.keys():
+        a, b = native_named[entity_id], pyld_named[entity_id]
+        for key in sorted(a.keys() | b.keys()):
+            if a.get(key) != b.get(key):
+                differences.append(f"entity {entity_id} property {key}: native {a.get(key)} != pyld {b.get(key)}")
+    for props, count in (native_blanks - pyld_blanks).items():
+        differences.append(f"{count} blank entity/entities only in native output: {props}")
+    for props, count in (pyld_blanks - native_blanks).items():
+        differences.append(f"{count} blank entity/entities only in pyld output: {props}")
+    return differences
+
+
+def flatten_and_compact(crate, mode=None):
+
+    """
+    Flattens and compacts a nested RO-Crate using the implementation selected by mode.
+
+    Parameters:
+    - crate (dict): the nested RO-Crate. It is not modified.
+    - mode (str, optional): 'native', 'pyld' or 'verify' (see FLATTEN_MODE). Defaults to FLATTEN_MODE.
+
+    Returns:
+    - dict: the flattened and compacted RO-Crate. In 'verify' mode the pyld result is returned (or the native
+      result if pyld fails) and any differences between the two are printed.
+    """
+    mode = mode or FLATTEN_MODE
+    if mode == 'pyld':
+        return pyld_flatten_compact(crate)
+
+    blank_ids = set()
+    native = flatten_compact(crate, blank_ids=blank_ids)
+    if mode == 'native':
+        return native
+
+    try:
+        reference = pyld_flatten_compact(crate)
+    except Exception as err:
+        print(f"Flatten verification: pyld failed, using native output. Error: {err}")
+        return native
+
+    differences = diff_flattened(native, reference, blank_ids)
+    if differences:
+        print(f"Flatten verification: {len(differences)} difference(s) between native and pyld output")
+        for difference in differences:
+            print(f"  - {difference}")
+    else:
+        print("Flatten verification: native and pyld output match")
+    return reference
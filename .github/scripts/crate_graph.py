@@ -0,0 +1,398 @@
+import hashlib
+import json
+import os
+import re
+from collections import defaultdict
+from functools import lru_cache
+
+
+#alias used by the NCI/ISO tools for the root data entity
+ROOT_ALIAS = 'root'
+ROOT_ID = './'
+METADATA_DESCRIPTOR = 'ro-crate-metadata.json'
+
+#returned by the NestedDict-style accessors when a key is missing
+_MISSING = object()
+
+#how entities without an '@id' are named:
+# 'sequential' - '#b1', '#b2', ... in traversal order (BlankNodeAllocator)
+# 'content'    - '#' + a hash of the entity's content (ContentIdAllocator), so the same entity gets the same
+#                id in every build, however the rest of the crate changes
+BLANK_ID_MODE = os.getenv("MATE_BLANK_ID_MODE", "sequential")
+
+
+@lru_cache(maxsize=None)
+def compile_path(path):
+    """
+    Compiles a dotted property path (e.g. "license.description") into an accessor function.
+
+    Paths are split once and cached, so repeated lookups of the same path (as happens for every crate
+    in the NCI export) do not re-parse the string.
+
+    Parameters:
+    - path (str): dot-separated property path. An empty string selects the entity itself.
+
+    Returns:
+    - function: accessor(value, graph=None, default={}) returning the value at the end of the path.
+      If a graph is given, pure references ({"@id": ...}) are dereferenced while walking the path.
+      When a list is met part way along the path, the remainder of the path is applied to each item.
+    """
+    keys = tuple(k for k in path.split('.') if k)
+
+    def accessor(value, graph=None, default=_MISSING):
+        if default is _MISSING:
+            default = {}
+        return _walk(value, keys, 0, graph, default)
+
+    accessor.keys = keys
+    return accessor
+
+
+def _walk(value, keys, position, graph, default):
+    for i in range(position, len(keys)):
+        if graph is not None:
+            value = graph.deref(value)
+        if isinstance(value, dict):
+            value = value.get(keys[i], _MISSING)
+            if value is _MISSING:
+                return default
+        elif isinstance(value, (list, tuple)):
+            values = [_walk(item, keys, i, graph, _MISSING) for item in value]
+            return [v for v in values if v is not _MISSING]
+        else:
+            return default
+    return value
+
+
+class CrateGraph:
+
+    """
+    Indexed view over the '@graph' array of an RO-Crate.
+
+    The graph list is wrapped, not copied: entities returned by lookups are the same dictionaries stored
+    in the crate, so in-place edits are reflected in the crate. Lookups by '@id' and by '@type' are O(1).
+
+    The index is built when the object is created. Entities added through `append` are indexed as they are
+    added; if the '@graph' list (or any '@id') is modified by other code, call `reindex()`.
+
+    Parameters:
+    - graph (list | dict): the '@graph' list, or a crate dictionary containing an '@graph' key.
+    """
+
+    def __init__(self, graph):
+        if isinstance(graph, dict):
+            graph = graph['@graph']
+        self.graph = graph
+        self.reindex()
+
+    def reindex(self):
+        """
+        Rebuilds the '@id' and '@type' indexes from the wrapped '@graph' list.
+        """
+        self._by_id = {}
+        self._index = {}
+        self._by_type = defaultdict(list)
+        self._root_id = None
+        for index, entity in enumerate(self.graph):
+            self._add(entity, index)
+
+    def _add(self, entity, index):
+        if not isinstance(entity, dict):
+            return
+        entity_id = entity.get('@id')
+        #keep the first occurrence, matching the previous linear-scan behaviour
+        if entity_id is not None and entity_id not in self._by_id:
+            self._by_id[entity_id] = entity
+            self._index[entity_id] = index
+            self._root_id = None
+        entity_type = entity.get('@type')
+        if isinstance(entity_type, (list, tuple)):
+            for t in entity_type:
+                self._by_type[t].append(entity)
+        elif entity_type is not None:
+            self._by_type[entity_type].append(entity)
+
+    def append(self, entity):
+        """
+        Appends an entity to the wrapped '@graph' list and indexes it.
+        """
+        self.graph.append(entity)
+        self._add(entity, len(self.graph) - 1)
+
+    def _resolve_alias(self, entity_id):
+        return self.root_id if entity_id == ROOT_ALIAS else entity_id
+
+    @property
+    def root_id(self):
+        """
+        The '@id' of the root data entity: './', or else the entity the metadata descriptor is 'about'. A crate
+        flattened by pyld has its ids resolved against pyld's base IRI (e.g. 'http://example.org/base/').
+        """
+        if self._root_id is None:
+            self._root_id = ROOT_ID
+            if ROOT_ID not in self._by_id:
+                for entity_id, entity in self._by_id.items():
+                    about = entity.get('about')
+                    if (isinstance(entity_id, str) and entity_id.rsplit('/', 1)[-1] == METADATA_DESCRIPTOR
+                            and isinstance(about, dict) and about.get('@id') in self._by_id):
+                        self._root_id = about['@id']
+                        break
+        return self._root_id
+
+    def __contains__(self, entity_id):
+        return self._resolve_alias(entity_id) in self._by_id
+
+    def __getitem__(self, entity_id):
+        return self._by_id[self._resolve_alias(entity_id)]
+
+    def __len__(self):
+        return len(self.graph)
+
+    def __iter__(self):
+        return iter(self.graph)
+
+    def ids(self):
+        """
+        Returns a view of the '@id' values present in the graph.
+        """
+        return self._by_id.keys()
+
+    def get(self, entity_id, default=None):
+        """
+        Returns the entity with the given '@id' ('root' is accepted as an alias for the root entity), or default.
+        """
+        return self._by_id.get(self._resolve_alias(entity_id), default)
+
+    def index_of(self, entity_id):
+        """
+        Returns the position of the entity in the '@graph' list, or None if the '@id' is not present.
+        """
+        return self._index.get(self._resolve_alias(entity_id))
+
+    def of_type(self, entity_type):
+        """
+        Returns the list of entities whose '@type' is (or includes) entity_type.
+        """
+        return self._by_type.get(entity_type, [])
+
+    @property
+    def root(self):
+        return self._by_id.get(self.root_id)
+
+    def deref(self, value):
+        """
+        Follows a reference to a top-level entity.
+
+        A dictionary holding only an '@id' that is present in the graph is replaced by the entity it points to.
+        Lists are dereferenced item by item. Any other value is returned unchanged.
+        """
+        if isinstance(value, dict):
+            if len(value) == 1 and '@id' in value:
+                return self._by_id.get(value['@id'], value)
+            return value
+        if isinstance(value, list):
+            return [self.deref(item) for item in value]
+        return value
+
+    def value(self, entity_id, path, default=None):
+        """
+        Returns the value at a dotted property path of an entity, dereferencing references on the way.
+
+        Parameters:
+        - entity_id (str): '@id' of the starting entity ('root' is accepted as an alias for './').
+        - path (str): dot-separated property path, e.g. "license.description".
+        - default: returned if the entity or a key along the path is missing.
+        """
+        entity = self.get(entity_id)
+        if entity is None:
+            return default
+        return compile_path(path)(entity, self, default)
+
+    def get_nested(self, keys):
+        """
+        NestedDict-compatible accessor: the first segment of the dotted string is the entity '@id'
+        (usually 'root') and the remainder is the property path. Missing values are returned as {}.
+        """
+        entity_id, _, path = keys.partition('.')
+        entity = self.get(entity_id)
+        if entity is None:
+            return {}
+        return compile_path(path)(entity, self)
+
+
+class BlankNodeAllocator:
+
+    """
+    Allocates '#bN' blank node ids with a running high-water mark.
+
+    Existing '#bN' ids are registered with `observe` (or while walking a structure with `assign`), so new ids are
+    always above every id seen and never collide with them. Allocating an id is O(1). One allocator can be shared
+    by several crate builders (e.g. ro_crate_utils.update_blank_node_ids and crate_flatten.flatten_compact)
+    working on the same crate.
+
+    Parameters:
+    - start (int, optional): the highest id number already in use. Defaults to 0, so the first id is '#b1'.
+    """
+
+    pattern = re.compile(r'^#b(\d+)$')
+
+    def __init__(self, start=0):
+        self.high = start
+        self.allocated = []
+
+    def observe(self, entity_id):
+        """
+        Registers an existing id; '#bN' ids raise the high-water mark, other ids are ignored.
+        """
+        if isinstance(entity_id, str):
+            match = self.pattern.match(entity_id)
+            if match:
+                n = int(match.group(1))
+                if n > self.high:
+                    self.high = n
+
+    def allocate(self, entity=None):
+        """
+        Returns a new, unused '#bN' id. The entity the id is for is not used.
+        """
+        self.high += 1
+        new_id = f'#b{self.high}'
+        self.allocated.append(new_id)
+        return new_id
+
+    def collect(self, obj, missing=None):
+        """
+        Walks a nested structure once, registering existing ids, and returns the dictionaries
+        (in traversal order) whose '@id' is missing or empty. A dictionary that is referenced from
+        several places in the structure is only returned once.
+        """
+        if missing is None:
+            missing = []
+        queued = set()
+        stack = [obj]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, dict):
+                entity_id = item.get('@id')
+                if entity_id:
+                    self.observe(entity_id)
+                elif id(item) not in queued:
+                    queued.add(id(item))
+                    missing.append(item)
+                stack.extend(reversed(list(item.values())))
+            elif isinstance(item, (list, tuple)):
+                stack.extend(reversed(item))
+        return missing
+
+    def assign(self, obj):
+        """
+        Gives every dictionary in a nested structure that has a missing or empty '@id' a new '#bN' id.
+        Existing ids, including existing '#bN' ids, are kept. Modifies obj in place.
+
+        Returns:
+        - list: the dictionaries that were given new ids.
+        """
+        missing = self.collect(obj)
+        for entity in missing:
+            entity['@id'] = self.allocate()
+        return missing
+
+
+#ids given to entities without one: '#b1' (sequential), '#<12 hex digits>' (content) and '_:b0' (pyld)
+_blank_id = re.compile(r'^(?:#b\d+|#[0-9a-f]{12}(?:-\d+)?|_:.*)$')
+
+
+def is_blank_id(entity_id):
+    """
+    Returns True if an '@id' is one allocated to an entity that had none (see BLANK_ID_MODE), rather than an
+    identifier of the entity itself.
+    """
+    return isinstance(entity_id, str) and _blank_id.match(entity_id) is not None
+
+
+def _strip_blank_ids(obj):
+    #drops missing/empty '@id' keys, so content is hashed the same before and after other ids are assigned
+    if isinstance(obj, dict):
+        return {k: _strip_blank_ids(v) for k, v in obj.items() if not (k == '@id' and not v)}
+    if isinstance(obj, (list, tuple)):
+        return [_strip_blank_ids(v) for v in obj]
+    return obj
+
+
+def content_hash(entity):
+    """
+    Returns the SHA-256 hex digest of the canonical JSON form (sorted keys, no whitespace) of an entity,
+    including any nested entities. Empty or missing '@id' keys are ignored.
+    """
+    canonical = json.dumps(_strip_blank_ids(entity), sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ContentIdAllocator(BlankNodeAllocator):
+
+    """
+    Allocates content-derived '#<hash>' ids, a drop-in replacement for BlankNodeAllocator.
+
+    The id of an entity is the first `length` hex digits of its content_hash, so identical input always gives
+    identical ids, and adding or removing other entities does not renumber it. Collisions (entities with the same
+    content, or an id already in use) are resolved by appending '-2', '-3', ... in traversal order, which is stable
+    for the same input.
+
+    Parameters:
+    - length (int, optional): number of hex digits of the hash used in the id. Defaults to 12.
+    """
+
+    def __init__(self, length=12):
+        super().__init__()
+        self.length = length
+        self.used = set()
+
+    def observe(self, entity_id):
+        """
+        Registers an existing id, so that it is never allocated.
+        """
+        if isinstance(entity_id, str):
+            self.used.add(entity_id)
+
+    def allocate(self, entity=None):
+        """
+        Returns a new, unused id derived from the content of entity.
+        """
+        return self._allocate('#' + content_hash(entity)[:self.length])
+
+    def _allocate(self, base):
+        new_id = base
+        n = 2
+        while new_id in self.used:
+            new_id = f'{base}-{n}'
+            n += 1
+        self.used.add(new_id)
+        self.allocated.append(new_id)
+        return new_id
+
+    def assign(self, obj):
+        """
+        Gives every dictionary in a nested structure that has a missing or empty '@id' a content-derived id.
+        All hashes are taken before any id is assigned, so an entity's id does not depend on the ids of the
+        entities nested in it. Modifies obj in place.
+
+        Returns:
+        - list: the dictionaries that were given new ids.
+        """
+        missing = self.collect(obj)
+        bases = ['#' + content_hash(entity)[:self.length] for entity in missing]
+        for entity, base in zip(missing, bases):
+            entity['@id'] = self._allocate(base)
+        return missing
+
+
+def new_allocator(mode=None):
+    """
+    Returns a new id allocator for the given mode ('sequential' or 'content', see BLANK_ID_MODE).
+    """
+    mode = mode or BLANK_ID_MODE
+    if mode == 'content':
+        return ContentIdAllocator()
+    if mode == 'sequential':
+        return BlankNodeAllocator()
+    raise ValueError(f"Unknown blank id mode: {mode}")
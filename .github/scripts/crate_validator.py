@@ -0,0 +1,194 @@
+import re
+from functools import lru_cache
+
+
+ROCRATE_CONTEXT = "https://w3id.org/ro/crate/1.1/context"
+METADATA_DESCRIPTOR = "ro-crate-metadata.json"
+ROOT_ID = "./"
+
+#properties the RO-Crate 1.1 specification requires on the metadata descriptor and the root data entity
+REQUIRED_PROPERTIES = {
+    METADATA_DESCRIPTOR: ("conformsTo", "about"),
+    ROOT_ID: ("name", "description", "datePublished", "license"),
+}
+
+#properties whose values must be literals (strings or numbers), never entities or references
+LITERAL_PROPERTIES = frozenset(["name", "description", "abstract", "alternateName", "givenName", "familyName",
+                                "datePublished", "dateCreated", "dateModified", "termCode", "version"])
+
+#properties whose values must be ISO 8601 dates or date-times
+DATE_PROPERTIES = frozenset(["datePublished", "dateCreated", "dateModified"])
+
+_iso_date = re.compile(r"^\d{4}(-\d{2}(-\d{2}([T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?)?)?)?$")
+#'@id's that name something outside the crate, and so need no entity in the '@graph'
+_absolute_iri = re.compile(r"^[A-Za-z][A-Za-z0-9+.-]*:")
+
+
+def context_terms(context):
+    """
+    Returns the set of terms defined by a JSON-LD context (a dict, or a list of dicts and URLs; URLs are skipped).
+    """
+    terms = set()
+    if isinstance(context, dict):
+        context = context.get('@context', context)
+    for item in context if isinstance(context, list) else [context]:
+        if isinstance(item, dict):
+            terms.update(k for k in item if not k.startswith('@'))
+    return terms
+
+
+class CrateValidator:
+
+    """
+    Checks a flattened RO-Crate against the M@TE entity templates and the RO-Crate context.
+
+    The templates and context are compiled once into lookup tables (the set of known terms, and the known
+    properties of each templated '@type'), and a crate is then checked in a single pass over its '@graph':
+
+    - every entity is a dictionary with an '@id' (not repeated) and an '@type';
+    - the metadata descriptor and the root data entity (the descriptor's 'about', also when a flattener has
+      rewritten their ids against a base IRI) have the properties the RO-Crate specification requires;
+    - other entities of a templated '@type' have at least one property of their template besides '@id' and '@type';
+    - every property is a term of the RO-Crate context, the crate's own context, or the entity's template,
+      or is an absolute IRI;
+    - values have the shape of a flattened crate: nested dictionaries are references ({"@id": ...}) or value
+      objects ({"@value": ...}); literal properties (e.g. name) hold strings or numbers, and dates are ISO 8601;
+    - every reference to a local '@id' (one that is not an absolute IRI) points to an entity in the '@graph'.
+
+    Parameters:
+    - entity_template (dict, optional): maps '@type' values to lists of keys, as returned by load_entity_template.
+    - context (dict | list, optional): the RO-Crate JSON-LD context document (or its '@context' value).
+    """
+
+    def __init__(self, entity_template=None, context=None):
+        self.type_properties = {entity_type: frozenset(keys) for entity_type, keys in (entity_template or {}).items()}
+        self.terms = frozenset(context_terms(context or {}))
+
+    def validate(self, crate):
+        """
+        Validates a flattened RO-Crate.
+
+        Parameters:
+        - crate (dict): the flattened crate, with '@context' and '@graph' keys.
+
+        Returns:
+        - list: warning messages (str). Empty if no problems were found.
+        """
+        warnings = []
+        graph = crate.get('@graph')
+        if not isinstance(graph, list):
+            return ["Warning: the crate has no '@graph' list."]
+
+        required_properties = self._required_properties(graph)
+        terms = self.terms | context_terms(crate.get('@context', []))
+        unknown_terms = {}
+        ids = set()
+        references = []
+
+        for position, entity in enumerate(graph):
+            if not isinstance(entity, dict):
+                warnings.append(f"Warning: '@graph' item {position} is not an entity: `{entity!r}`")
+                continue
+            entity_id = entity.get('@id')
+            if not isinstance(entity_id, str) or not entity_id:
+                warnings.append(f"Warning: '@graph' item {position} has no '@id'.")
+                entity_id = f"@graph[{position}]"
+            elif entity_id in ids:
+                warnings.append(f"Warning: `{entity_id}` appears more than once in the '@graph'.")
+            ids.add(entity_id)
+
+            entity_types = entity.get('@type')
+            if entity_types is None:
+                warnings.append(f"Warning: `{entity_id}` has no '@type'.")
+                entity_types = ()
+            elif not isinstance(entity_types, list):
+                entity_types = (entity_types,)
+
+            required = required_properties.get(entity_id)
+            for key in required or ():
+                if entity.get(key) in (None, '', [], {}):
+                    warnings.append(f"Warning: `{entity_id}` is missing the required property `{key}`.")
+
+            known = terms
+            templated = [self.type_properties[t] for t in entity_types if t in self.type_properties]
+            if templated:
+                known = terms.union(*templated)
+                if required is None and not any(k in keys and k not in ('@id', '@type') for keys in templated for k in entity):
+                    warnings.append(f"Warning: `{entity_id}` has none of the properties of its type `{'/'.join(entity_types)}`.")
+
+            for key, value in entity.items():
+                if key.startswith('@'):
+                    continue
+                if key not in known and not _absolute_iri.match(key):
+                    unknown_terms.setdefault(key, entity_id)
+                self._check_values(entity_id, key, value, references, warnings)
+
+        for entity_id, key, target in references:
+            if target not in ids and not _absolute_iri.match(target):
+                warnings.append(f"Warning: `{entity_id}` property `{key}` refers to `{target}`, which is not in the crate.")
+
+        for key, entity_id in unknown_terms.items():
+            warnings.append(f"Warning: unknown property `{key}` (first used on `{entity_id}`).")
+
+        return warnings
+
+    @staticmethod
+    def _required_properties(graph):
+        #pyld's flattening rewrites the ids of the metadata descriptor and the root data entity against its base
+        #IRI, so they are found through the descriptor (the entity whose id ends in ro-crate-metadata.json) and
+        #its 'about'
+        required = dict(REQUIRED_PROPERTIES)
+        for entity in graph:
+            entity_id = entity.get('@id') if isinstance(entity, dict) else None
+            if isinstance(entity_id, str) and entity_id.endswith('/' + METADATA_DESCRIPTOR):
+                required[entity_id] = REQUIRED_PROPERTIES[METADATA_DESCRIPTOR]
+                about = entity.get('about')
+                if isinstance(about, dict) and isinstance(about.get('@id'), str):
+                    required[about['@id']] = REQUIRED_PROPERTIES[ROOT_ID]
+                break
+        return required
+
+    def _check_values(self, entity_id, key, value, references, warnings):
+        for v in value if isinstance(value, list) else (value,):
+            if isinstance(v, dict):
+                if '@value' in v:
+                    continue
+                target = v.get('@id')
+                if len(v) != 1 or not isinstance(target, str):
+                    warnings.append(f"Warning: `{entity_id}` property `{key}` holds a nested entity; "
+                                    f"a flattened crate should only hold references.")
+                elif key in LITERAL_PROPERTIES:
+                    warnings.append(f"Warning: `{entity_id}` property `{key}` should be text, not a reference.")
+                else:
+                    references.append((entity_id, key, target))
+            elif isinstance(v, list):
+                warnings.append(f"Warning: `{entity_id}` property `{key}` holds a nested list.")
+            elif key in DATE_PROPERTIES and not (isinstance(v, str) and _iso_date.match(v)):
+                warnings.append(f"Warning: `{entity_id}` property `{key}` is not an ISO 8601 date: `{v!r}`")
+
+
+@lru_cache(maxsize=1)
+def load_validator():
+    """
+    Returns a CrateValidator compiled from the M@TE entity template and the bundled RO-Crate context.
+    The validator is built once per process.
+    """
+    from ro_crate_utils import load_entity_template
+    from jsonld_loader import document_loader
+    return CrateValidator(load_entity_template(), document_loader.document(ROCRATE_CONTEXT))
+
+
+def validate_crate(crate, validator=None):
+    """
+    Validates a flattened RO-Crate with validator (default: load_validator()) and returns the list of warnings.
+    """
+    return (validator or load_validator()).validate(crate)
+
+
+def format_warnings(warnings):
+    """
+    Formats validation warnings as a markdown section body for the issue report.
+    """
+    if not warnings:
+        return "No problems found in the generated RO-Crate. \n"
+    return "".join(f"{warning} \n" for warning in warnings)
@@ -0,0 +1,387 @@
+import copy
+from crate_graph import CrateGraph, is_blank_id
+
+
+#compiled plans, keyed by the id of the mapping table they were compiled from.
+#the mapping tables (see crosswalk_mappings.py) are treated as constants: call clear_plans() after modifying one
+_plans = {}
+
+
+def clear_plans():
+    """
+    Drops all compiled plans, so they are recompiled from the mapping tables on next use.
+    """
+    _plans.clear()
+
+
+def _cached(kind, mapping, compile_function):
+    key = (kind, id(mapping))
+    cached = _plans.get(key)
+    if cached is None or cached[0] is not mapping:
+        cached = _plans[key] = (mapping, compile_function(mapping))
+    return cached[1]
+
+
+def _retrieve(source, keys):
+    #navigate_and_retrieve semantics: None if a key or index is missing, dictionaries and lists are
+    #indexed, any other value is returned as is once reached
+    for key in keys:
+        if isinstance(source, dict):
+            if key not in source:
+                return None
+            source = source[key]
+        elif isinstance(source, list) and isinstance(key, int):
+            if key >= len(source):
+                return None
+            source = source[key]
+    return source
+
+
+def _assign(target, keys, value):
+    #navigate_and_assign semantics, for keys already split into names (str) and list indices (int)
+    last = len(keys) - 1
+    for i in range(last):
+        key = keys[i]
+        if isinstance(key, int):
+            if len(target) <= key:
+                target.extend({} for _ in range(key + 1 - len(target)))
+            target = target[key]
+        elif i < last - 1 and isinstance(keys[i + 1], int):
+            target = target.setdefault(key, [])
+        else:
+            target = target.setdefault(key, {})
+    key = keys[last]
+    if isinstance(key, int):
+        if len(target) <= key:
+            target.extend([None] * (key + 1 - len(target)))
+    target[key] = value
+
+
+def _list_position(source, keys):
+    #position at which to insert a list index into keys: after the first key (followed by another key)
+    #whose value in source is a list. Missing keys raise, as yaml_utils.get_value does
+    for i in range(len(keys) - 1):
+        source = source[int(keys[i])] if isinstance(source, list) else source[keys[i]]
+        if isinstance(source, list):
+            return i + 1
+    return None
+
+
+class YamlPlan:
+
+    """
+    Execution plan for a dictionary-to-dictionary mapping table such as crosswalk_mappings.issue_yaml_mapping.
+
+    Each 'target.path': 'source.path' entry is split once into key tuples. When applied, each source path is
+    walked once; if a list is met part way along it, the mapping fans out to one entry per list item (inserting
+    the item index into both paths, see yaml_utils.expand_mapping_for_lists), and the remainder of the path is
+    resolved from each item rather than from the root. Values are then assigned in the same order, with the
+    same warnings and defaults, as yaml_utils.apply_mapping.
+
+    Parameters:
+    - mapping (dict): maps dotted target paths to dotted source paths. Paths must not contain list indices.
+    """
+
+    def __init__(self, mapping):
+        self.entries = []
+        for target_path, source_path in mapping.items():
+            target_keys = tuple(target_path.split('.'))
+            source_keys = tuple(source_path.split('.'))
+            if any(k.isdigit() for k in target_keys + source_keys):
+                raise ValueError(f"Paths with list indices are not supported: {target_path}: {source_path}")
+            self.entries.append((target_keys, source_keys))
+
+    def resolve(self, source):
+        """
+        Resolves the plan against a source dictionary.
+
+        Returns:
+        - dict: maps target key tuples to (source path string, value), in assignment order.
+        """
+        resolved = {}
+        for target_keys, source_keys in self.entries:
+            current = source
+            for position, key in enumerate(source_keys):
+                if isinstance(current, list):
+                    break
+                current = current.get(key, {})
+            else:
+                resolved[target_keys] = ('.'.join(source_keys), _retrieve(source, source_keys))
+                continue
+
+            #fan out over the list met at `position` in the source path
+            if not current:
+                continue
+            insert_at = _list_position(source, target_keys)
+            head, tail = source_keys[:position], source_keys[position:]
+            for i, item in enumerate(current):
+                if insert_at is None:
+                    expanded_target = target_keys
+                else:
+                    expanded_target = target_keys[:insert_at] + (i,) + target_keys[insert_at:]
+                source_path = '.'.join(head + (str(i),) + tail)
+                resolved[expanded_target] = (source_path, _retrieve(item, tail))
+        return resolved
+
+    def apply(self, target, source):
+        """
+        Maps values from source into target (in place). Missing source values are assigned as empty strings.
+        """
+        for target_keys, (source_path, value) in self.resolve(source).items():
+            if value is None:
+                target_path = '.'.join(str(k) for k in target_keys)
+                print(f"Warning: Key '{source_path}' not found in B. Assigning empty string to '{target_path}' in A.")
+                value = ''
+            _assign(target, target_keys, value)
+
+
+def _nested_value(source, keys):
+    #apply_entity_mapping_extended semantics: missing keys give {}, and empty values are returned as None
+    for key in keys:
+        source = source.get(key, {})
+    return source if source else None
+
+
+def compile_entity_rules(mapping):
+    """
+    Compiles one entity mapping (e.g. crosswalk_mappings.root_node_mapping) into a list of
+    (target key, key tuple | list of key tuples) rules. Entries mapped to None are dropped.
+    """
+    rules = []
+    for target_key, issue_keys in mapping.items():
+        if issue_keys is None:
+            continue
+        if isinstance(issue_keys, list):
+            rules.append((target_key, [tuple(k.split('.')) for k in issue_keys]))
+        else:
+            rules.append((target_key, tuple(issue_keys.split('.'))))
+    return rules
+
+
+def apply_entity_rules(entity, rules, issue_dict):
+    """
+    Updates an entity dictionary (in place) with values from issue_dict, following compiled entity rules.
+    """
+    for target_key, keys in rules:
+        if isinstance(keys, list):
+            values = [v for v in (_nested_value(issue_dict, k) for k in keys) if v is not None]
+            if values:
+                entity[target_key] = values
+        else:
+            value = _nested_value(issue_dict, keys)
+            if value is not None:
+                entity[target_key] = value
+
+
+class CratePlan:
+
+    """
+    Execution plan for an RO-Crate mapping list such as crosswalk_mappings.default_issue_entity_mapping_list.
+
+    Each entity mapping is compiled once into rules with pre-split key paths. When applied, the crate's '@graph'
+    is indexed once and each mapping is applied to the entity with its '@id' (mappings whose '@id' is None, or
+    not in the crate, are skipped).
+
+    Parameters:
+    - mapping_list (list): a list of entity mappings, each with an '@id' key.
+    """
+
+    def __init__(self, mapping_list):
+        self.entities = [(mapping['@id'], compile_entity_rules(mapping))
+                         for mapping in mapping_list if '@id' in mapping]
+
+    def apply(self, crate, issue_dict):
+        """
+        Applies the mappings to the crate (in place).
+        """
+        crate_graph = CrateGraph(crate)
+        for entity_id, rules in self.entities:
+            if entity_id is None:
+                continue
+            entity = crate_graph.get(entity_id)
+            if entity is not None:
+                apply_entity_rules(entity, rules, issue_dict)
+
+
+def _references(value, counts):
+    #counts the {'@id': ...} references held in a value
+    if isinstance(value, list):
+        for item in value:
+            _references(item, counts)
+    elif isinstance(value, dict):
+        if len(value) == 1 and '@id' in value:
+            counts[value['@id']] = counts.get(value['@id'], 0) + 1
+        else:
+            for item in value.values():
+                _references(item, counts)
+    return counts
+
+
+def _held(value, held):
+    #indexes the dictionaries with an '@id' in a value of the issue dictionary, by '@id'
+    if isinstance(value, list):
+        for item in value:
+            _held(item, held)
+    elif isinstance(value, dict):
+        if value.get('@id'):
+            held.setdefault(value['@id'], value)
+        for item in value.values():
+            _held(item, held)
+    return held
+
+
+def _embed(value, crate_graph, shared=frozenset(), held=None, seen=()):
+    #replaces references to top-level entities by (copies of) the entities, recursively, as in a nested crate,
+    #and drops the blank node ids given when the crate was built. An entity already being embedded further up
+    #is left as a reference.
+    #flattening merges every entity with the same '@id' into one (e.g. a computer_resource with the NCI ROR and
+    #the NCI publisher record), so a reference to an entity referenced from several places is replaced by the
+    #value held for that '@id' in the issue dictionary, if there is one, rather than by the merged entity
+    if isinstance(value, list):
+        return [_embed(item, crate_graph, shared, held, seen) for item in value]
+    if not isinstance(value, dict):
+        return value
+    entity_id = value.get('@id')
+    if len(value) == 1 and entity_id in crate_graph and entity_id not in seen:
+        if held and entity_id in shared and entity_id in held:
+            return copy.deepcopy(held[entity_id])
+        value = crate_graph[entity_id]
+        seen = seen + (entity_id,)
+    return {key: _embed(item, crate_graph, shared, held, seen) for key, item in value.items()
+            if not (key == '@id' and is_blank_id(item) and len(value) > 1)}
+
+
+def _shaped(value, like):
+    #a compacted crate holds one-item lists as the item itself: values are turned back into lists wherever
+    #`like` (the value already held, or the default) has a list
+    if isinstance(like, list):
+        if not isinstance(value, list):
+            value = [value]
+        return [_shaped(item, like[0]) for item in value] if like else value
+    if isinstance(like, dict) and isinstance(value, dict):
+        return {key: _shaped(item, like.get(key)) for key, item in value.items()}
+    return value
+
+
+def _merged(value, current):
+    #an entity read from the crate only has the properties kept by the entity templates, so it is merged into
+    #the value already held (e.g. from .metadata_trail/issue_dict.json) rather than replacing it
+    if isinstance(value, dict) and isinstance(current, dict):
+        return {**current, **value}
+    return value
+
+
+def _default_type(defaults, keys):
+    default = _retrieve(defaults, keys)
+    return default.get('@type') if isinstance(default, dict) else None
+
+
+def _path_for(item, paths, defaults):
+    #the first path whose default value has the item's @type, else the first path without a default @type,
+    #else the first path
+    item_type = item.get('@type') if isinstance(item, dict) else None
+    for keys in paths:
+        if item_type is not None and _default_type(defaults, keys) == item_type:
+            return keys
+    for keys in paths:
+        if _default_type(defaults, keys) is None:
+            return keys
+    return paths[0]
+
+
+class CrateInversePlan:
+
+    """
+    Inverse of a CratePlan: reads the properties of the mapped RO-Crate entities back into an issue dictionary.
+
+    Each entity mapping is compiled once (see compile_entity_rules). When applied, every 'property': 'issue.path'
+    rule of an entity present in the crate assigns the property's value to the issue path. A path is only
+    assigned once, by the first mapping that has a value for it (so 'creators' is read from the root entity
+    rather than from '.website_material'). References to other entities (flattened crates) are followed, and
+    single values of a compacted crate are turned back into lists where the issue dictionary holds lists. A
+    flattened crate merges the entities that share an '@id', so a reference to an entity referenced from several
+    places is read as the value the issue dictionary already holds for that '@id', when it holds one.
+
+    Properties mapped to a list of issue paths (e.g. 'instrument') hold one value per non-empty path. Values are
+    matched to paths by their '@type' (the '@type' of the path's default value), and the others are given to
+    the remaining paths in order.
+
+    Parameters:
+    - mapping_list (list): a list of entity mappings, each with an '@id' key.
+    """
+
+    def __init__(self, mapping_list):
+        self.entities = [(mapping['@id'], compile_entity_rules(mapping))
+                         for mapping in mapping_list if mapping.get('@id') is not None]
+
+    def apply(self, issue_dict, crate, defaults):
+        """
+        Assigns the values read from the crate to issue_dict (in place).
+
+        Parameters:
+        - issue_dict (dict): the issue dictionary to update.
+        - crate (dict): the RO-Crate, nested or flattened.
+        - defaults (dict): the default value and shape of each issue field (see crosswalk_mappings.issue_dict_shapes).
+        """
+        crate_graph = CrateGraph(crate)
+        shared = {entity_id for entity_id, count in _references(crate_graph.graph, {}).items() if count > 1}
+        assigned = set()
+
+        def assign(keys, value):
+            if keys in assigned or value in (None, '', [], {}):
+                return
+            assigned.add(keys)
+            current = _retrieve(issue_dict, keys)
+            value = _shaped(_shaped(value, _retrieve(defaults, keys)), current)
+            _assign(issue_dict, keys, _merged(value, current))
+
+        for entity_id, rules in self.entities:
+            entity = crate_graph.get(entity_id)
+            if entity is None:
+                continue
+            for crate_key, keys in rules:
+                if crate_key not in entity:
+                    continue
+                #only the values held at the rule's own issue paths stand in for shared entities
+                held = {}
+                for path in (keys if isinstance(keys, list) else [keys]):
+                    _held(_retrieve(issue_dict, path), held)
+                value = _embed(entity[crate_key], crate_graph, shared, held)
+                if not isinstance(keys, list):
+                    assign(keys, value)
+                    continue
+                remaining = list(keys)
+                for item in (value if isinstance(value, list) else [value]):
+                    if not remaining:
+                        break
+                    target = _path_for(item, remaining, defaults)
+                    remaining.remove(target)
+                    assign(target, item)
+
+
+def yaml_plan(mapping):
+    """
+    Returns the cached YamlPlan for a mapping table, compiling it on first use.
+    """
+    return _cached('yaml', mapping, YamlPlan)
+
+
+def crate_plan(mapping_list):
+    """
+    Returns the cached CratePlan for an RO-Crate mapping list, compiling it on first use.
+    """
+    return _cached('crate', mapping_list, CratePlan)
+
+
+def crate_inverse_plan(mapping_list):
+    """
+    Returns the cached CrateInversePlan for an RO-Crate mapping list, compiling it on first use.
+    """
+    return _cached('inverse', mapping_list, CrateInversePlan)
+
+
+def entity_rules(mapping):
+    """
+    Returns the cached compiled rules for a single entity mapping.
+    """
+    return _cached('entity', mapping, compile_entity_rules)
@@ -82,6 +82,45 @@ default_issue_entity_mapping_list = [root_node_mapping,
                 dataset_creation_node_mapping]
 
 
+#the values parse_issue gives the fields of the issue dictionary when the issue has no answer for them.
+#these are the starting point when an issue dictionary is rebuilt from an RO-Crate (crosswalks.metadata_to_dict),
+#and tell which fields hold lists and which entity @type each field holds
+issue_dict_defaults = {"publication": {},
+            "software": {"@type": "SoftwareApplication"},
+            "submitter": {"@type": "Person", "givenName": "", "familyName": ""},
+            "creators": [],
+            "proposed_slug": "",
+            "slug": "",
+            "for_codes": {},
+            "license": {"@type": "CreativeWork"},
+            "model_category": [],
+            "model_status": [],
+            "title": "",
+            "abstract": "",
+            "description": "",
+            "scientific_keywords": [],
+            "funder": [],
+            "funding": [],
+            "embargo": [False, "0001-01-01"],
+            "include_model_code": False,
+            "model_code_inputs": {"doi": "", "notes": ""},
+            "include_model_output": False,
+            "model_output_data": {"creators": [], "doi": "", "notes": "", "size": None},
+            "computer_resource": {},
+            "landing_image": {"filename": "", "url": ""},
+            "animation": {"filename": "", "url": ""},
+            "graphic_abstract": {"filename": "", "url": ""},
+            "model_setup_figure": {"filename": "", "url": ""}
+            }
+
+#the shape of the issue dictionary, for reading it back from a compacted RO-Crate (which holds a one-item list as
+#the item itself): the defaults, and the lists held inside issue fields
+issue_dict_shapes = {**issue_dict_defaults,
+            "publication": {"author": [{"affiliation": []}], "isPartOf": []},
+            "software": {"@type": "SoftwareApplication", "author": [], "keywords": []},
+            }
+
+
 #a limitation of the mapping is that where lists are present as values, the key needs to be the same on the both sides.
 issue_yaml_mapping = {
     'templateKey':'foo',
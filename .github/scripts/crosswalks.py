@@ -2,17 +2,13 @@ import json
 from ro_crate_utils import *
 from crosswalk_mappings import *
 from nci_iso_tools import *
+from crate_graph import BLANK_ID_MODE
 from yaml_utils import *
-import ruamel.yaml
+from report_sections import render_report
+from crosswalk_engine import crate_inverse_plan
 import copy
-from pyld import jsonld
-import pandas as pd
-from config import MATE_GADI
+import io
 
-Ryaml = ruamel.yaml.YAML(typ=['rt', 'string'])
-Ryaml.preserve_quotes = True
-#control the indentation...
-Ryaml.indent(mapping=2, sequence=4, offset=2)
 
 
 
@@ -29,245 +25,9 @@ def dict_to_report(issue_dict, verbose = False):
         str: A string containing the complete report in Markdown format.
     """
 
-    #############
-    # Section 1
-    #############
-    report = "## Section 1: Summary of your model   \n\n"
-    # contributor
-    report += "**Model Submitter:**  \n\n"
-    report += f"{issue_dict['submitter']['givenName']} {issue_dict['submitter']['familyName']} "
-    if "@id" in issue_dict["submitter"]:
-        report += f"([{issue_dict['submitter']['@id'].split('/')[-1]}]({issue_dict['submitter']['@id']}))"
-
-    report += "\n\n"
-
-    # model creators(s)
-    report += "**Model Creator(s):**  \n\n"
-    for creator in issue_dict["creators"]:
-        report += f"- {creator['givenName']} {creator['familyName']} "
-        if "@id" in creator:
-            report += f"([{creator['@id'].split('/')[-1]}]({creator['@id']}))"
-        report += "  \n"
-    report += "  \n"
-
-    # model contributors(s)
-    #report += "**Model Contributor(s):**  \n\n"
-    #for contributor in issue_dict["contributors"]:
-    #    report += f"- {contributor['givenName']} {contributor['familyName']} "
-    #    if "@id" in contributor:
-    #        report += f"([{contributor['@id'].split('/')[-1]}]({contributor['@id']}))"
-    #    report += "  \n"
-    #report += "  \n"
-
-
-
-    # slug, this gets mapped to name. This is what the model is called on NCI
-    report += "**Model slug:**  \n\n"
-    report += f"`{issue_dict['slug']}` \n\n" + "(this will be the name of the model repository when created) \n\n"
-
-
-    # title. Note title doesn't appear in CreativeWorks. This gets mapped to alternateName.
-    report += "**Model name:**  \n\n"
-    report += f"_{issue_dict['title']}_  \n\n"
-
-    # license
-    report += "**License:**  \n\n"
-    if "url" in issue_dict["license"]:
-        report += f"[{issue_dict['license']['description']}]({issue_dict['license']['url']})\n\n"
-    else:
-        report += f"{issue_dict['license']['description']}\n\n"
-
-    # model category
-    report += "**Model Category:**  \n\n"
-    for category in issue_dict["model_category"]:
-        report += f"- {category}   \n"
-    report += "  \n"
-
-    # model category
-    report += "**Model Status:**  \n\n"
-    for status in issue_dict["model_status"]:
-        report += f"- {status}   \n"
-    report += "  \n"
-
-    # associated publication DOI
-    if "@id" in issue_dict["publication"]:
-        report += "**Associated Publication title:**  \n\n"
-        report += f"_[{issue_dict['publication']['name']}]({issue_dict['publication']['@id']})_ \n\n"
-
-    # description
-    report += "**Short description:**  \n\n"
-    report += issue_dict["description"] + "\n\n"
-
-    # abstract
-    report += "**Abstract:**  \n\n"
-    report += issue_dict["abstract"] + "\n\n"
-
-
-
-    # scientific keywords
-    if issue_dict["scientific_keywords"]:
-        report += "**Scientific Keywords:**  \n\n"
-        for keyword in issue_dict["scientific_keywords"]:
-            report += f"- {keyword}   \n"
-        report += "  \n"
-
-    # funder
-    report += "**Funder(s):**  \n"
-    for funder in issue_dict["funder"]:
-        report += f"- {funder['name']} "
-        if "@id" in funder:
-            report += f"({funder['@id']})"
-        elif "url" in funder:
-            report += f"({funder['url']})"
-        report += "  \n"
-    report += "  \n"
-
-
-    #############
-    # Section 2
-    #############
-
-    report += "## Section 2: your model code, output data  \n\n"
-
-    # include model code
-    if "embargo" in issue_dict:
-        if issue_dict["embargo"][0] is True:
-            report += "**Embargo on model contents requested until:**   \n\n"
-            report += f"{issue_dict['embargo'][1]} \n\n"
-        else:
-            report +=  "**No embargo on model contents requested** \n\n"
-
-
-    # include model code
-    if "include_model_code" in issue_dict:
-        report += "**Include model code:**   \n\n"
-        report += f"{str(issue_dict['include_model_code'])} \n\n"
-
-    # model code URI/DOI
-    if issue_dict["model_code_inputs"]["doi"]:
-        report += "**Model code existing URL/DOI:**   \n\n"
-        report += f"{issue_dict['model_code_inputs']['doi']} \n\n"
-
-    # model code notes
-    if issue_dict["model_code_inputs"]["notes"]:
-        report += "**Model code notes:**   \n\n"
-        report += f"{issue_dict['model_code_inputs']['notes']} \n\n"
-
-    # include model output data
-    if "include_model_output" in issue_dict:
-        report += "**Include model output data:**   \n\n"
-        report += f"{str(issue_dict['include_model_output'])} \n\n"
-
-    # model output URI/DOI
-    if issue_dict["model_output_data"]["doi"]:
-        report += "**Model output data, existing URL/DOI:**   \n\n"
-        report += f"{issue_dict['model_output_data']['doi']} \n\n"
-
-    # model output notes
-    if issue_dict["model_output_data"]["notes"]:
-        report += "**Model output data notes:**   \n\n"
-        report += f"{issue_dict['model_output_data']['notes']} \n\n"
-
-
-    #############
-    # Section 3
-    #############
-    report += "## Section 3: software framework and compute details   \n"
-    # software framework DOI/URI
-    if "@id" in issue_dict["software"]:
-        report += "**Software Framework DOI/URL:**  \n\n"
-        report += f"Found software: _[{issue_dict['software']['name']}]({issue_dict['software']['@id']})_ \n\n"
-
-    # software framework source repository
-    if "codeRepository" in issue_dict["software"]:
-        report += "**Software Repository:**   \n\n"
-        report += f"{issue_dict['software']['codeRepository']} \n\n"
-
-    # name of primary software framework
-    if "name" in issue_dict["software"]:
-        report += "**Name of primary software framework:**  \n\n"
-        report += f"{issue_dict['software']['name']} \n\n"
-
-    if verbose is True:
-        #software framework authors
-        if "author" in issue_dict["software"]:
-            report += "**Software framework authors:**  \n"
-            for author in issue_dict["software"]["author"]:
-                if "givenName" in author:
-                    report += f"- {author['givenName']} {author['familyName']} "
-                elif "name" in author:
-                    report += f"- {author['name']} "
-                if "@id" in author:
-                    report += f"([{author['@id'].split('/')[-1]}]({author['@id']}))"
-                report += "  \n"
-            report += "  \n"
-
-
-    # software & algorithm keywords
-    if "keywords" in issue_dict["software"]:
-        report += "**Software & algorithm keywords:**  \n\n"
-        for keyword in issue_dict["software"]["keywords"]:
-            report += f"- {keyword}   \n"
-        report += "  \n"
-
-    # computer URI/DOI
-    if "computer_uri" in issue_dict:
-        report += "**Computer DOI/URL:**   \n\n"
-        report += f"{issue_dict['computer_uri']} \n\n"
-
-    #############
-    # Section 4
-    #############
-    report += "## Section 4: web material (for mate.science)   \n"
-    # landing page image and caption
-    if "landing_image" in issue_dict:
-        report += "**Landing page image:**  \n\n"
-        if "filename" in issue_dict["landing_image"]:
-            report += f"Filename: [{issue_dict['landing_image']['filename']}]({issue_dict['landing_image']['url']})  \n"
-        if "caption" in issue_dict["landing_image"]:
-            report += f"Caption: {issue_dict['landing_image']['caption']}  \n"
-        report += '  \n'
-
-    # animation
-    if "animation" in issue_dict:
-        report += "**Animation:**  \n\n"
-        if "filename" in issue_dict["animation"]:
-            report += f"Filename: [{issue_dict['animation']['filename']}]({issue_dict['animation']['url']})  \n"
-        if "caption" in issue_dict["animation"]:
-            report += f"Caption: {issue_dict['animation']['caption']}  \n"
-        report += '  \n'
-
-    # graphic abstract
-    if "graphic_abstract" in issue_dict:
-        report += "**Graphic abstract:**  \n\n"
-        if "filename" in issue_dict["graphic_abstract"]:
-            report += f"Filename: [{issue_dict['graphic_abstract']['filename']}]({issue_dict['graphic_abstract']['url']})  \n"
-        if "caption" in issue_dict["graphic_abstract"]:
-            report += f"Caption: {issue_dict['graphic_abstract']['caption']}  \n"
-        report += '  \n'
-
-    # model setup figure
-    if "model_setup_figure" in issue_dict:
-        report += "**Model setup figure:**  \n\n"
-        if "filename" in issue_dict["model_setup_figure"]:
-            report += f"Filename: [{issue_dict['model_setup_figure']['filename']}]({issue_dict['model_setup_figure']['url']})  \n"
-        if "caption" in issue_dict["model_setup_figure"]:
-            report += f"Caption: {issue_dict['model_setup_figure']['caption']}  \n"
-        if "model_setup_description" in issue_dict:
-                #report += "**Model setup description:**  \n"
-                report += f"Description:  {issue_dict['model_setup_description']}\n\n"
-        report += '  \n'
-
-    # description
-    #if "model_setup_description" in issue_dict:
-    #    report += "**Model setup description:**  \n"
-    #    report += f"{issue_dict['model_setup_description']}\n\n"
-
-    #if verbose is True:
-    #    report += "  \n ** Dumping dictionary during testing **  \n"
-    #    report += str(issue_dict)
-
-    return report
+    #each section of the report is rendered from its own fields of issue_dict and cached under a hash of them,
+    #so a rebuild only re-renders the sections whose fields changed (see report_sections.py)
+    return render_report(issue_dict, verbose=verbose)
 
 
 def dict_to_metadata(issue_dict, mapping_list=default_issue_entity_mapping_list, filter_entities=True, flat_compact_crate=True, timestamp = False):
@@ -298,14 +58,14 @@ def dict_to_metadata(issue_dict, mapping_list=default_issue_entity_mapping_list,
 
 
 
-    # Perform a deep copy of the issue_dict to avoid modifying the input dictionary
-    issue_dict_copy = copy.deepcopy(issue_dict)
-
     #this takes the issue_dict and simplifies entities (e.g. @Type=Person) using templates defined at:
     #https://github.com/ModelAtlasofTheEarth/metadata_schema/blob/main/mate_ro_crate/type_templates.json
+    #the filtered copy is built in a single pass, so the input dictionary is not modified
     if filter_entities is True:
         entity_template = load_entity_template()
-        recursively_filter_key(issue_dict_copy, entity_template)
+        issue_dict_copy = filtered_copy(issue_dict, compile_entity_template(entity_template))
+    else:
+        issue_dict_copy = copy.deepcopy(issue_dict)
 
     #load the RO-Crate template as a Python dictionary
     #$print(ro_crate.keys())
@@ -318,6 +78,14 @@ def dict_to_metadata(issue_dict, mapping_list=default_issue_entity_mapping_list,
     #Add any further direct changes to the RO-Crate based on issue_dict
     defaults_and_customise_ro_crate(issue_dict_copy, ro_crate, timestamp=timestamp)
 
+    #with content-derived ids, name every entity now, so the nested crate and any flattened form of it
+    #(native or pyld) carry the same ids, and identical input gives byte-identical output.
+    #Person records are reconciled first (assign_ids only names Persons without an @id), so a person
+    #that matches a known ORCID gets it rather than a content id
+    if BLANK_ID_MODE == 'content':
+        assign_ids(ro_crate['@graph'])
+        update_blank_node_ids(ro_crate)
+
 
     #flatten the crate (brings nested entities to the top level)
     if flat_compact_crate is True:
@@ -331,6 +99,35 @@ def dict_to_metadata(issue_dict, mapping_list=default_issue_entity_mapping_list,
 
     return metadata_out
 
+def metadata_to_dict(ro_crate, issue_dict=None, mapping_list=default_issue_entity_mapping_list):
+
+    """
+    Rebuilds an issue dictionary from an RO-Crate, the inverse of dict_to_metadata. No network access is needed,
+    so dict_to_yaml, dict_to_report and metadata_to_nci can be re-run offline for a published model.
+
+    The crate only holds the issue fields mapped in mapping_list (title, creators, license, funders...). The
+    other fields (submitter, images, embargo, notes...) are taken from issue_dict if given (e.g. the model's
+    .metadata_trail/issue_dict.json), and otherwise get the values parse_issue gives unanswered questions.
+    Values in the crate take precedence, as the crate may have been edited since the issue was parsed.
+
+    Parameters:
+    - ro_crate (dict): the RO-Crate, nested (as built by dict_to_metadata) or flattened (ro-crate-metadata.json).
+    - issue_dict (dict, optional): an issue dictionary to start from. It is not modified.
+    - mapping_list (list, optional): the mappings the crate was built with.
+
+    Returns:
+    - dict: the issue dictionary.
+    """
+
+    rebuilt = copy.deepcopy(issue_dict_defaults)
+    if issue_dict:
+        rebuilt.update(copy.deepcopy(issue_dict))
+    crate_inverse_plan(mapping_list).apply(rebuilt, ro_crate, issue_dict_shapes)
+    if not rebuilt["proposed_slug"]:
+        rebuilt["proposed_slug"] = rebuilt["slug"]
+    return rebuilt
+
+
 def dict_to_yaml(issue_dict, timestamp = False):
     '''
 
@@ -359,63 +156,10 @@ def dict_to_yaml(issue_dict, timestamp = False):
 
 def metadata_to_nci(ro_crate):
 
-    #put the @graph array into a dictionary/nested format, where the @id field becomes the key
-    ro_crate_nested = graph_to_nested_dict(ro_crate["@graph"])
-    #extract funders and authors into a NCI/ISO format
-    funders = extract_funder_details(ro_crate_nested)
-    authors = extract_creator_details(ro_crate_nested)
-    root = 'root'  # Key for root element
-
-    #build up any composite values
-    nci_file_path =  MATE_GADI + ro_crate_nested.get_nested(f"{root}.alternateName")
-
-    fields_data = {
-        "Title*": list_to_string(ro_crate_nested.get_nested(f"{root}.name")),
-        "Dataset version*": list_to_string(ro_crate_nested.get_nested(f"{root}.version")),
-        "Abstract*": list_to_string(ro_crate_nested.get_nested(f"{root}.abstract")),
-        "Topic category*": "geoscientificInformation",
-        "Field of research (FOR)*": list_to_string(ro_crate_nested.get_nested(f"{root}.about.@id")),
-        "License*": ro_crate_nested.get_nested(f"{root}.license.description"),
-        "Dataset lineage information*": list_to_string(ro_crate_nested.get_nested(f"{root}.description")),
-        "Dataset format*": "",
-        "Dataset status": list_to_string(ro_crate_nested.get_nested(f"{root}.creativeWorkStatus")),
-        "Maintenance frequency*": "as needed",
-        "Temporal extents* (if applicable)": "",
-        "Spatial extents* (if applicable)": "",
-        "Owner* (if applicable)": "",
-        "Credit": "",
-        "Supplemental or supporting material": "",
-        "Local NCI file path": nci_file_path,
-        "DOI (NCI Internal Field)": list_to_string(ro_crate_nested.get_nested(f"{root}.identifier")),
-        "Keyword/s": list_to_string(ro_crate_nested.get_nested(f"{root}.keywords"))
-    }
-
-    fields_df = pd.DataFrame(list(fields_data.items()), columns=["Field", "Value"])
-
-    #update specific fields that need tailoring
-    #ro_crate_data['@graph'][1]['alternateName']
-
-    #fields_df
-    #nci_file_path = ro_crate_nested.get_nested(f"{root}.alternateName")
-    #"Local NCI file path": "",
-
-
-
-    # Handling authors as before
-    authors_rows = [
-        {"Field": f"Author {i}", "Value": f"{author['Last name']}, {author['First name']}, {author['Organization']}, {author['Email']}, {author['ORCID ID']}"}
-        for i, author in enumerate(authors, start=1)
-    ]
-    authors_df = pd.DataFrame(authors_rows)
-
-    # Handling funders
-    funder_rows = []
-    for funder in funders:
-        funder_rows.append({"Field": "Organisation/funding agency name", "Value": funder['name']})
-        funder_rows.append({"Field": "Funding/award description or title", "Value": funder['grant_id']})
-        funder_rows.append({"Field": "Email address for the organisation/agency (if applicable)", "Value": funder['email']})
-    funders_df = pd.DataFrame(funder_rows)
-
-    # Concatenate all parts into a single DataFrame
-    result_df = pd.concat([fields_df, authors_df, funders_df ], ignore_index=True)
-    return result_df
+    """
+    Returns the NCI/ISO record of an RO-Crate as a Field,Value CSV string (see nci_iso_tools.nci_rows).
+    """
+
+    stream = io.StringIO()
+    write_nci_csv(ro_crate, stream)
+    return stream.getvalue()
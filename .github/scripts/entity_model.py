@@ -0,0 +1,207 @@
+import sys
+
+
+class Node:
+
+    """
+    Compact, immutable form of a JSON object (an RO-Crate entity, reference or nested dictionary).
+
+    A Node holds its keys and values in two tuples instead of a dict. The key tuple ("shape") is shared by every
+    node with the same keys, so a thousand Person entities with the same properties store their keys once.
+    Nodes are hashable and compare by content, which lets a NodeStore share one object between all the places
+    (and crates) an identical entity appears.
+
+    Nodes are read-only: use to_dict() (or dump()) to get an editable dictionary, and NodeStore.load to convert back.
+    """
+
+    __slots__ = ('shape', 'values', '_hash')
+
+    def __init__(self, shape, values):
+        self.shape = shape
+        self.values = values
+        self._hash = hash((shape, values))
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        return (isinstance(other, Node) and self._hash == other._hash
+                and self.shape == other.shape and self.values == other.values)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def __len__(self):
+        return len(self.shape)
+
+    def __contains__(self, key):
+        return key in self.shape
+
+    def __iter__(self):
+        return iter(self.shape)
+
+    def __getitem__(self, key):
+        try:
+            return self.values[self.shape.index(key)]
+        except ValueError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        try:
+            return self.values[self.shape.index(key)]
+        except ValueError:
+            return default
+
+    def keys(self):
+        return self.shape
+
+    def items(self):
+        return zip(self.shape, self.values)
+
+    @property
+    def id(self):
+        return self.get('@id')
+
+    @property
+    def type(self):
+        return self.get('@type')
+
+    def to_dict(self):
+        """
+        Returns the node as plain dictionaries and lists (a new, editable copy).
+        """
+        return dump(self)
+
+
+class Entity(Node):
+    """
+    A Node with an '@type'. Subclasses registered in ENTITY_CLASSES are used for common types.
+    """
+    __slots__ = ()
+
+
+class Person(Entity):
+    __slots__ = ()
+
+    @property
+    def name(self):
+        return self.get('name') or " ".join(str(n) for n in (self.get('givenName'), self.get('familyName')) if n)
+
+
+class Organization(Entity):
+    __slots__ = ()
+
+    @property
+    def name(self):
+        return self.get('name')
+
+
+class CreativeWork(Entity):
+    __slots__ = ()
+
+    @property
+    def name(self):
+        return self.get('name')
+
+
+#classes used for nodes by '@type' (the first '@type' that has a class, if '@type' is a list)
+ENTITY_CLASSES = {
+    'Person': Person,
+    'Organization': Organization,
+    'CreativeWork': CreativeWork,
+    'ScholarlyArticle': CreativeWork,
+}
+
+
+def node_class(entity_type):
+    """
+    Returns the Node subclass for an '@type' value (a string or list of strings).
+    """
+    if entity_type is None:
+        return Node
+    for t in entity_type if isinstance(entity_type, (list, tuple)) else (entity_type,):
+        cls = ENTITY_CLASSES.get(t)
+        if cls is not None:
+            return cls
+    return Entity
+
+
+def dump(value):
+    """
+    Converts a value loaded by a NodeStore back to plain JSON types: Nodes to dictionaries, tuples to lists.
+    """
+    if isinstance(value, Node):
+        return {k: dump(v) for k, v in zip(value.shape, value.values)}
+    if isinstance(value, tuple):
+        return [dump(v) for v in value]
+    return value
+
+
+def _signature(values):
+    #identity of a tuple of loaded values for sharing: child nodes are already shared, so they are compared by
+    #identity, and scalars are tagged with their type so that True, 1 and 1.0 (equal in Python) are kept apart
+    return tuple(id(v) if isinstance(v, Node) else _signature(v) if isinstance(v, tuple) else (type(v), v)
+                 for v in values)
+
+
+class NodeStore:
+
+    """
+    Loads crates, issue dictionaries and other JSON data into shared, compact Nodes.
+
+    - dictionaries become Nodes (Person, Organization, CreativeWork, Entity or Node, by '@type'), lists become tuples;
+    - keys, '@type' and '@id' values are interned with sys.intern, other strings are shared through the store;
+    - identical nodes are stored once: an entity repeated within a crate, or across all the crates loaded into the
+      same store (e.g. the same Person, Organization or license in every crate of the catalog), is one object.
+      Entities with the same '@id' but different content are kept apart, so loading is lossless:
+      dump(store.load(obj)) == obj for any JSON value obj.
+
+    Use one store for a whole batch (e.g. every model crate of the website) to get the most sharing.
+    """
+
+    #strings that are interned process-wide, not only within the store
+    INTERNED_VALUES = frozenset(['@id', '@type'])
+
+    def __init__(self):
+        self._nodes = {}
+        self._shapes = {}
+        self._strings = {}
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def _string(self, value):
+        return self._strings.setdefault(value, value)
+
+    def load(self, value):
+        """
+        Returns the compact form of a JSON value (see the class docstring).
+        """
+        if isinstance(value, dict):
+            keys = tuple(sys.intern(k) if isinstance(k, str) else k for k in value)
+            shape = self._shapes.setdefault(keys, keys)
+            values = tuple(
+                sys.intern(v) if k in self.INTERNED_VALUES and isinstance(v, str) else self.load(v)
+                for k, v in zip(shape, value.values()))
+            key = (shape, _signature(values))
+            node = self._nodes.get(key)
+            if node is None:
+                node = self._nodes[key] = node_class(value.get('@type'))(shape, values)
+            return node
+        if isinstance(value, list):
+            return tuple(self.load(v) for v in value)
+        if isinstance(value, str):
+            return self._string(value)
+        return value
+
+    def load_crate(self, crate):
+        """
+        Loads an RO-Crate (or any JSON object). Same as load, named for readability in batch jobs.
+        """
+        return self.load(crate)
+
+    def stats(self):
+        """
+        Returns the number of distinct nodes, key shapes and strings held by the store.
+        """
+        return {'nodes': len(self._nodes), 'shapes': len(self._shapes), 'strings': len(self._strings)}
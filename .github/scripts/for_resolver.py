@@ -0,0 +1,214 @@
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from functools import lru_cache
+from resource_bundle import load_bundle
+
+
+FOR_BASE_IRI = "https://linked.data.gov.au/def/anzsrc-for/2020/"
+
+#used when the issue gives no FoR codes (the field is optional, and issues filed before it was added have no heading)
+DEFAULT_FOR_CODE = os.getenv("MATE_DEFAULT_FOR_CODE", "370401")
+
+#minimum similarity (Dice coefficient of character trigrams, 0-1) for a free-text name to match a FoR name
+FUZZY_THRESHOLD = float(os.getenv("MATE_FOR_FUZZY_THRESHOLD", "0.6"))
+
+#trigrams shared by more names than this are not used to find candidates (they still count in the score)
+_COMMON_GRAM = 200
+#number of candidates scored for each fuzzy lookup
+_CANDIDATES = 20
+
+_code = re.compile(r"(?<!\d)(\d{2,8})(?!\d)")
+_separators = re.compile(r"[\n;]+")
+
+
+def normalise_name(name):
+    """
+    Returns the form of a FoR name used for matching: accents removed, lower case, punctuation as single spaces.
+    """
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]+", " ", name.lower()).strip()
+
+
+def trigrams(name):
+    """
+    Returns the set of character trigrams of a normalised name, padded so word starts count.
+    """
+    padded = f"  {name} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def defined_term(code, name):
+    """
+    Returns the RO-Crate DefinedTerm record of a FoR code.
+    """
+    return {"@id": FOR_BASE_IRI + code, "@type": "DefinedTerm", "name": name, "termCode": code}
+
+
+class ForResolver:
+
+    """
+    Resolves ANZSRC Field of Research codes and names (as written in an issue) to DefinedTerm records.
+
+    The FoR table (2-digit divisions, 4-digit groups and 6-digit fields) is indexed once:
+    - a digit trie over the codes, so exact codes, truncated codes and unknown codes are resolved with one walk;
+    - a name index of normalised names;
+    - an inverted index of name trigrams, so free-text names are matched by similarity without comparing them
+      to every name.
+
+    Parameters:
+    - for_codes (dict): maps codes (str) to names, e.g. resource_bundle.load_bundle().for_codes.
+    - threshold (float, optional): the minimum similarity for a fuzzy name match.
+    """
+
+    def __init__(self, for_codes, threshold=FUZZY_THRESHOLD):
+        self.names = for_codes
+        self.threshold = threshold
+
+        #trie nodes are [children by digit, code ending at the node or None]
+        self.trie = [{}, None]
+        for code in for_codes:
+            node = self.trie
+            for digit in code:
+                node = node[0].setdefault(digit, [{}, None])
+            node[1] = code
+
+        self.by_name = {}
+        self.grams = {}
+        self.postings = defaultdict(list)
+        for code, name in for_codes.items():
+            key = normalise_name(name)
+            #names used at more than one level resolve to the broadest code (the first in the table)
+            self.by_name.setdefault(key, code)
+            self.grams[code] = trigrams(key)
+            for gram in self.grams[code]:
+                self.postings[gram].append(code)
+
+    def parents(self, code):
+        """
+        Returns the division and group codes above a code, broadest first.
+        """
+        return [code[:i] for i in range(2, len(code), 2) if code[:i] in self.names]
+
+    def resolve_code(self, digits):
+        """
+        Resolves a string of digits to a code.
+
+        - an exact code is returned as is;
+        - digits that extend a code (an unknown or mistyped field) resolve to the longest code they start with;
+        - digits that only start codes (e.g. '370') resolve to the narrowest code above all of those codes.
+
+        Returns:
+        - str: the code, or None if no code starts with the same two digits.
+        """
+        node, deepest = self.trie, None
+        for digit in digits:
+            node = node[0].get(digit)
+            if node is None:
+                return deepest
+            if node[1] is not None:
+                deepest = node[1]
+        return node[1] or deepest
+
+    def match_name(self, text):
+        """
+        Matches a free-text name to a code: exactly (after normalisation), or else by trigram similarity.
+
+        Returns:
+        - tuple: (code, score), with score 1.0 for an exact match, or (None, best score) if nothing is close enough.
+        """
+        key = normalise_name(text)
+        if key in self.by_name:
+            return self.by_name[key], 1.0
+        if not key:
+            return None, 0.0
+        query = trigrams(key)
+
+        counts = defaultdict(int)
+        rare = [g for g in query if len(self.postings.get(g, ())) <= _COMMON_GRAM] or query
+        for gram in rare:
+            for code in self.postings.get(gram, ()):
+                counts[code] += 1
+        candidates = sorted(counts, key=counts.get, reverse=True)[:_CANDIDATES]
+
+        best, best_score = None, 0.0
+        for code in candidates:
+            grams = self.grams[code]
+            score = 2 * len(query & grams) / (len(query) + len(grams))
+            if score > best_score:
+                best, best_score = code, score
+        if best_score < self.threshold:
+            return None, best_score
+        return best, best_score
+
+    def resolve(self, text, with_parents=True):
+
+        """
+        Resolves the FoR entry of an issue to DefinedTerm records.
+
+        Entries are separated by new lines or semicolons, and by commas unless the whole line is a FoR name
+        (division names contain commas). Each entry may be a code, a truncated code, a FoR IRI, a code followed by
+        its name, or a name (matched approximately).
+
+        Parameters:
+        - text (str): the issue entry.
+        - with_parents (bool, optional): also include the group and division of each code.
+
+        Returns:
+        - tuple: (list of DefinedTerm records, without duplicates, broadest first for each code; log string)
+        """
+
+        codes, log = [], ""
+        for line in _separators.split(text):
+            line = line.strip()
+            if not line:
+                continue
+            entries = [line] if normalise_name(line) in self.by_name else line.split(",")
+            for entry in entries:
+                entry = entry.strip()
+                if not entry:
+                    continue
+                #FoR IRIs end with the code (after the '2020' of the vocabulary version)
+                match = _code.search(entry.rsplit("/", 1)[-1] if "anzsrc-for" in entry else entry)
+                if match:
+                    code = self.resolve_code(match.group(1))
+                    if code is None:
+                        log += f"Warning: `{entry}` is not an ANZSRC FoR code. \n"
+                    elif code != match.group(1):
+                        log += f"Warning: FoR code `{match.group(1)}` not found, using `{code}` ({self.names[code]}). \n"
+                else:
+                    code, score = self.match_name(entry)
+                    if code is None:
+                        log += f"Warning: no FoR code found for `{entry}`. \n"
+                    elif score < 1.0:
+                        log += f"Warning: `{entry}` matched to FoR code `{code}` ({self.names[code]}). \n"
+                if code is not None:
+                    codes.extend(self.parents(code) if with_parents else [])
+                    codes.append(code)
+
+        records = [defined_term(code, self.names[code]) for code in dict.fromkeys(codes)]
+        return records, log
+
+    def term(self, code):
+        """
+        Returns the DefinedTerm record of a code (which must be in the table).
+        """
+        return defined_term(code, self.names[code])
+
+
+@lru_cache(maxsize=1)
+def load_resolver():
+    """
+    Returns the ForResolver for the FoR table of the resource bundle, built once per process.
+    """
+    return ForResolver(load_bundle().for_codes)
+
+
+def term_codes(for_codes):
+    """
+    Returns the termCodes of a DefinedTerm record or a list of records (e.g. issue_dict['for_codes']).
+    """
+    records = for_codes if isinstance(for_codes, list) else [for_codes]
+    return [record["termCode"] for record in records if isinstance(record, dict) and "termCode" in record]
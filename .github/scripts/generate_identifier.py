@@ -1,8 +1,8 @@
 import json
 import subprocess
 import os
-import re
-from github import Github, Auth
+from request_utils import session, TIMEOUT
+from issue_sections import scan_sections
 
 def run_command_check_output(cmd):
 	return subprocess.check_output(cmd, shell=True, stderr=open(os.devnull))
@@ -29,6 +29,15 @@ def exists(model_id):
 	else:
 		return True
 
+def get_issue_body(issue_number, token=None, repository="ModelAtlasofTheEarth/model_submission"):
+	#a single REST call, so this script doesn't need to import PyGithub (which takes longer to import than the script takes to run)
+	headers = {"Accept": "application/vnd.github+json"}
+	if token:
+		headers["Authorization"] = f"Bearer {token}"
+	response = session.get(f"https://api.github.com/repos/{repository}/issues/{issue_number}", headers=headers, timeout=TIMEOUT)
+	response.raise_for_status()
+	return response.json().get("body") or ""
+
 def choice(name):
 	i = 0
 	while True:
@@ -42,16 +51,12 @@ if __name__ == "__main__":
 	token = os.environ.get("GITHUB_TOKEN")
 	issue_number = int(os.environ.get("ISSUE_NUMBER"))
 
-	# Get issue
-	auth = Auth.Token(token)
-	g = Github(auth=auth)
-	repo = g.get_repo("ModelAtlasofTheEarth/model_submission")
-	issue = repo.get_issue(number = issue_number)
+	# Get issue body
+	issue_body = get_issue_body(issue_number, token)
 
 	# Parse issue body
 	# Identify headings and subsequent text
-	regex = r"### *(?P<key>.*?)\s*[\r\n]+(?P<value>[\s\S]*?)(?=###|$)"
-	data = dict(re.findall(regex, issue.body))
+	data, _ = scan_sections(issue_body)
 
 	slug = data["-> slug"].strip()
 	print(choice(slug))
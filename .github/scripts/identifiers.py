@@ -0,0 +1,135 @@
+import re
+
+
+ORCID = "orcid"
+DOI = "doi"
+ROR = "ror"
+ATTACHMENT = "attachment"
+URL = "url"
+
+ORCID_BASE_URL = "https://orcid.org/"
+DOI_BASE_URL = "https://doi.org/"
+ROR_BASE_URL = "https://ror.org/"
+
+#every kind of identifier in one alternation, so a string is scanned once whatever it holds.
+#at a given position the first alternative that matches wins: ROR and ORCID URLs before other URLs, and a URL
+#holding a DOI (doi.org, dx.doi.org or a publisher's /doi/ path) is a DOI
+_identifier = re.compile(r"""
+    (?<![\w.])(?:https?://)?(?:www\.)?ror\.org/(?P<ror>[0-9a-z]{9})(?![0-9a-z])
+  | (?:https?://(?:www\.)?orcid\.org/)?(?<!\d)(?P<orcid>\d{4}-\d{4}-\d{4}-\d{3}[\dXx])(?!\d)
+  | (?P<attachment>https://github\.com/(?:ModelAtlasofTheEarth/[^/\s]+/(?:assets|files)/|user-attachments/(?:assets|files)/)[^\s<>"()\[\]]+)
+  | (?P<url>https?://(?:[^\s<>"]*?/(?P<url_doi>10\.\d+/[^\s<>"]+)|[^\s<>"]+))
+  | (?:doi:\s*)?(?<![\d.])(?P<doi>10\.\d+/[^\s<>"]+)
+""", re.VERBOSE | re.IGNORECASE)
+
+#characters that end a sentence or a URL rather than a DOI
+_doi_trailing = re.compile(r'[\s,.:;|\/\?:@&=+\$,]+$')
+
+#a DOI anywhere in a string, also where the alternation above doesn't look for one (e.g. in a query string,
+#https://example.com/?id=10.1234/abc)
+_doi_anywhere = re.compile(r'10\.\d+/\S+')
+
+
+class Identifier:
+
+    """
+    An identifier found in a string.
+
+    Parameters:
+    - kind (str): ORCID, DOI, ROR, ATTACHMENT (a file uploaded to a GitHub issue) or URL.
+    - value (str): the normalised identifier: a bare ORCID iD ('0000-0002-1825-0097', upper case X), a bare DOI
+      ('10.5281/zenodo.7455999'), a bare ROR id ('04yx6dh41', lower case), or the URL.
+    - url (str): the canonical URL of the identifier (https://orcid.org/..., https://doi.org/..., https://ror.org/...),
+      or the URL.
+    - valid (bool): False for an ORCID iD whose check digit is wrong; True otherwise.
+    """
+
+    __slots__ = ('kind', 'value', 'url', 'valid')
+
+    def __init__(self, kind, value, url, valid=True):
+        self.kind = kind
+        self.value = value
+        self.url = url
+        self.valid = valid
+
+    def __eq__(self, other):
+        return isinstance(other, Identifier) and (self.kind, self.value, self.valid) == (other.kind, other.value, other.valid)
+
+    def __repr__(self):
+        return f"Identifier({self.kind!r}, {self.value!r})"
+
+
+def orcid_checksum(orcid):
+    """
+    Returns the check digit (ISO 7064 MOD 11-2) of the first 15 digits of an ORCID iD, as '0'-'9' or 'X'.
+    """
+    total = 0
+    for digit in orcid.replace("-", "")[:15]:
+        total = (total + int(digit)) * 2
+    result = (12 - total % 11) % 11
+    return "X" if result == 10 else str(result)
+
+
+def _identifier_of(match):
+    if match.group(ROR):
+        value = match.group(ROR).lower()
+        return Identifier(ROR, value, ROR_BASE_URL + value)
+    if match.group(ORCID):
+        value = match.group(ORCID).upper()
+        return Identifier(ORCID, value, ORCID_BASE_URL + value, orcid_checksum(value) == value[-1])
+    if match.group(ATTACHMENT):
+        return Identifier(ATTACHMENT, match.group(ATTACHMENT), match.group(ATTACHMENT))
+    doi = match.group("url_doi") or match.group(DOI)
+    if doi:
+        value = _doi_trailing.sub('', doi)
+        return Identifier(DOI, value, DOI_BASE_URL + value)
+    return Identifier(URL, match.group(URL), match.group(URL))
+
+
+def scan(text):
+    """
+    Yields the identifiers found in a string, in order, in a single pass.
+    """
+    for match in _identifier.finditer(text):
+        yield _identifier_of(match)
+
+
+def find(text, kind=None):
+    """
+    Returns the first identifier of a kind (or of any kind) found in a string, or None.
+    """
+    for identifier in scan(text):
+        if kind is None or identifier.kind == kind:
+            return identifier
+    return None
+
+
+def search_doi(text):
+    """
+    Returns the first DOI found anywhere in a string (as an Identifier), or None.
+    """
+    match = _doi_anywhere.search(text)
+    if match is None:
+        return None
+    value = _doi_trailing.sub('', match.group(0))
+    return Identifier(DOI, value, DOI_BASE_URL + value)
+
+
+def prefix(text):
+    """
+    Returns the identifier a string starts with (e.g. an ORCID iD followed by a name), or None.
+    """
+    match = _identifier.match(text)
+    return _identifier_of(match) if match else None
+
+
+def classify(text):
+    """
+    Classifies a string that should be a single identifier (e.g. an issue answer or an @id).
+
+    Returns:
+    - Identifier: the identifier, if the whole string (without surrounding whitespace) is one; otherwise None,
+      e.g. for a name or free text.
+    """
+    match = _identifier.fullmatch(text.strip())
+    return _identifier_of(match) if match else None
@@ -0,0 +1,127 @@
+import ast
+import json
+import os
+import re
+import subprocess
+import sys
+
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BUDGET_FILE = os.path.join(SCRIPTS_DIR, "..", "resources", "import_budget.json")
+
+#the scripts run as workflow steps (see .github/workflows)
+ENTRY_POINTS = ["write_report.py", "write_repo_contents.py", "generate_identifier.py", "approval_authorization.py"]
+
+#number of runs per entry point; the fastest run is kept, as the others only add noise from the machine
+RUNS = int(os.getenv("MATE_IMPORT_RUNS", "3"))
+
+#budgets are recorded as the measured time times this factor, to allow for slower CI runners
+HEADROOM = float(os.getenv("MATE_IMPORT_HEADROOM", "1.5"))
+
+#a line of `python -X importtime` output: self time and cumulative time in microseconds, then the (indented) module
+_importtime_line = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$")
+
+
+def import_statements(script_path):
+    """
+    Returns the source of the module-level import statements of a script (including those under
+    `if __name__ == "__main__":`), so its start-up imports can be timed without running it.
+    """
+    with open(script_path) as f:
+        tree = ast.parse(f.read(), filename=script_path)
+    statements = []
+    for node in tree.body:
+        if isinstance(node, ast.If):
+            nodes = node.body
+        else:
+            nodes = [node]
+        statements.extend(ast.unparse(n) for n in nodes if isinstance(n, (ast.Import, ast.ImportFrom)))
+    return "\n".join(statements)
+
+
+def measure(script, runs=RUNS):
+
+    """
+    Measures the import time of a script's start-up imports with `python -X importtime`.
+
+    Parameters:
+    - script (str): the script file name, in .github/scripts.
+    - runs (int, optional): the number of runs; the fastest is returned.
+
+    Returns:
+    - tuple: (total import time in ms, dict mapping each top-level module imported to its cumulative time in ms).
+    """
+
+    code = import_statements(os.path.join(SCRIPTS_DIR, script))
+    best = None
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=SCRIPTS_DIR,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing the modules of {script} failed:\n{result.stderr[-2000:]}")
+        modules = {}
+        for line in result.stderr.splitlines():
+            match = _importtime_line.match(line)
+            #top-level imports are the ones that are not indented
+            if match and match.group(3) == " ":
+                modules[match.group(4)] = int(match.group(2)) / 1000
+        total = sum(modules.values())
+        if best is None or total < best[0]:
+            best = (total, modules)
+    return best
+
+
+def load_budgets(path=BUDGET_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def check(scripts=ENTRY_POINTS, record=False, path=BUDGET_FILE, top=5):
+
+    """
+    Measures the import time of each entry point and compares it with its recorded budget.
+
+    Parameters:
+    - scripts (list, optional): the entry points to measure.
+    - record (bool, optional): write the measured times (times HEADROOM) as the new budgets instead of checking.
+    - path (str, optional): the budget file.
+    - top (int, optional): the number of heaviest imports listed for each entry point.
+
+    Returns:
+    - bool: True if every entry point is within its budget (always True when recording).
+    """
+
+    budgets = load_budgets(path)
+    within = True
+    for script in scripts:
+        total, modules = measure(script)
+        heaviest = sorted(modules.items(), key=lambda item: -item[1])[:top]
+        budget = budgets.get(script)
+        if record:
+            budgets[script] = round(total * HEADROOM)
+            status = f"budget recorded: {budgets[script]} ms"
+        elif budget is None:
+            status = "no budget recorded"
+        elif total > budget:
+            status = f"OVER BUDGET ({budget} ms)"
+            within = False
+        else:
+            status = f"within budget ({budget} ms)"
+        print(f"{script}: {total:.0f} ms, {status}")
+        print("    " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in heaviest))
+    if record:
+        with open(path, "w") as f:
+            json.dump(budgets, f, indent=2)
+            f.write("\n")
+    return within
+
+
+if __name__ == "__main__":
+    #python3 .github/scripts/import_budget.py [--record] [script.py ...]
+    args = sys.argv[1:]
+    record = "--record" in args
+    scripts = [a for a in args if a != "--record"] or ENTRY_POINTS
+    sys.exit(0 if check(scripts, record=record) else 1)
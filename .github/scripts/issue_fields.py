@@ -0,0 +1,242 @@
+import hashlib
+import json
+import os
+import sys
+from functools import lru_cache
+from parse_utils import parse_yes_no_choice, separate_string
+from identifiers import classify
+
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_FILE = os.path.join(SCRIPTS_DIR, "..", "ISSUE_TEMPLATE", "new_model_request.yml")
+SPEC_FILE = os.path.join(SCRIPTS_DIR, "..", "resources", "issue_fields.json")
+
+#answers GitHub writes for a field left empty
+NO_RESPONSE = ("_No response_", "")
+
+#field types the form elements can't tell apart (other inputs and textareas are 'text', single-choice dropdowns
+#are 'choice', multiple-choice dropdowns are 'csv' and checkboxes are 'checkbox')
+#identifier fields hold a DOI, URL, ORCID iD or ROR id (the submitter may also be a name, so it is text)
+FIELD_TYPES = {
+    "alt_licence_url": "identifier",
+    "status_metadata_tags": "csv",
+    "pub_doi": "identifier",
+    "model_creators": "list",
+    "keywords": "csv",
+    "funder_ROR_URI": "list",
+    "request_embargo": "date",
+    "code_doi": "identifier",
+    "data_creators": "list",
+    "data_doi": "identifier",
+    "software_framework_doi_uri": "identifier",
+    "software_framework_repository": "identifier",
+    "software_framework_authors": "list",
+    "software_keywords": "csv",
+    "compute_doi": "identifier",
+}
+
+#where parse_issue looks for a value when a field is left empty
+FALLBACKS = {
+    "model_creators": "publication.author",
+    "title": "publication.name",
+    "abstract": "publication.abstract",
+    "software_framework": "software.name",
+    "software_framework_authors": "software.author",
+    "data_creators": "creators",
+}
+
+#optional fields parse_issue gives a default when left empty, so issues filed before they were added to the form
+#are read without a warning about the missing heading
+DEFAULTED = {"for_codes"}
+
+
+class IssueFormError(ValueError):
+
+    """
+    Raised when an issue body doesn't match the issue form: the heading of a required field is missing (e.g.
+    renamed in the form), its answer is empty, or its dropdown answer is not one of its options. The message lists
+    every problem found.
+    """
+
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__("The issue does not match the issue form:\n" + "".join(f"- {p}\n" for p in problems))
+
+
+def _sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def compile_field_spec(template_path=TEMPLATE_FILE):
+
+    """
+    Compiles the issue form into a field spec, one entry per form field with an id.
+
+    Parameters:
+    - template_path (str, optional): the issue form YAML file.
+
+    Returns:
+    - dict: the sha256 of the form ('template') and the list of fields ('fields'). Each field is a dict with
+      - id (str): the id of the form field;
+      - key (str): its label, i.e. the '### ' heading of its answer in the issue body;
+      - type (str): one of text, choice, csv, list, checkbox, date and identifier;
+      - required (bool): the form requires an answer (checkboxes always have one);
+      - fallback (str): where an empty answer is taken from, or None;
+      - options (list): the options of a dropdown, or None.
+    """
+
+    from ruamel.yaml import YAML
+    with open(template_path) as f:
+        form = YAML(typ="safe").load(f)
+
+    fields = []
+    for element in form["body"]:
+        field_id = element.get("id")
+        if element["type"] == "markdown" or field_id is None:
+            continue
+        attributes = element.get("attributes", {})
+        if element["type"] == "checkboxes":
+            field_type = "checkbox"
+        elif element["type"] == "dropdown":
+            field_type = "csv" if attributes.get("multiple") else "choice"
+        else:
+            field_type = "text"
+        field_type = FIELD_TYPES.get(field_id, field_type)
+        fields.append({
+            "id": field_id,
+            "key": attributes["label"].strip(),
+            "type": field_type,
+            "required": bool((element.get("validations") or {}).get("required")) and field_type != "checkbox",
+            "fallback": FALLBACKS.get(field_id),
+            "options": [str(o) for o in attributes["options"]] if field_type == "choice" else None,
+        })
+    return {"template": _sha256(template_path), "fields": fields}
+
+
+@lru_cache(maxsize=1)
+def load_field_spec(spec_path=SPEC_FILE, template_path=TEMPLATE_FILE):
+    """
+    Returns the field spec, loaded once per process from .github/resources/issue_fields.json.
+
+    If the file is missing or older than the issue form, the spec is compiled from the form instead, so a changed
+    form is never read with stale headings.
+    """
+    try:
+        with open(spec_path) as f:
+            spec = json.load(f)
+        if spec["template"] == _sha256(template_path):
+            return spec
+        print("issue_fields.json is out of date, compiling the issue form. Run `python3 .github/scripts/issue_fields.py build`.")
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Could not load issue_fields.json ({e}), compiling the issue form.")
+    return compile_field_spec(template_path)
+
+
+def _parse_date(value):
+    from dateutil import parser
+    return parser.parse(value).strftime('%Y-%m-%d')
+
+
+def read_fields(data, spec=None):
+
+    """
+    Reads the answers of an issue into typed values, checking every field before anything is looked up.
+
+    Empty answers ('_No response_') are read as "" (text, choice, date and identifier fields) or [] (csv and list
+    fields). Otherwise:
+    - text, choice and identifier answers are stripped; an identifier answer that is not a single identifier
+      (identifiers.classify) is a warning, and kept as it is;
+    - csv answers are split by commas or lines (parse_utils.separate_string);
+    - list answers are split into their non-empty lines;
+    - checkbox answers are True if ticked;
+    - date answers are returned as 'YYYY-MM-DD' (an unreadable date is a warning, and read as "").
+
+    Parameters:
+    - data (dict): the issue answers by heading, as returned by issue_sections.scan_sections.
+    - spec (dict, optional): the field spec; load_field_spec() by default.
+
+    Returns:
+    - tuple: (dict mapping field ids to values, log string with a line for each unreadable answer)
+
+    A missing heading, or a dropdown answer that is not one of its options, is a warning for an optional field (the
+    answer is read as '_No response_', or kept as it is), so issues filed with an earlier version of the form can
+    still be read. Fields in DEFAULTED are read as '_No response_' without a warning.
+
+    Raises:
+    - IssueFormError: if the heading of a required field is missing, its answer is empty, or its dropdown answer is
+      not one of its options.
+    """
+
+    spec = spec or load_field_spec()
+    fields, problems, log = {}, [], ""
+    for field in spec["fields"]:
+        key, field_type = field["key"], field["type"]
+        if key not in data:
+            #issues filed with an earlier version of the form may not have the newer, optional, fields
+            if field["required"]:
+                problems.append(f"no `### {key}` heading")
+                continue
+            if field["id"] not in DEFAULTED:
+                log += f"Warning: no `### {key}` heading, read as {NO_RESPONSE[0]}. \n"
+            value = NO_RESPONSE[0]
+        else:
+            value = data[key].strip()
+        if value in NO_RESPONSE:
+            if field["required"]:
+                problems.append(f"`{key}` is required")
+                continue
+            fields[field["id"]] = [] if field_type in ("csv", "list") else (False if field_type == "checkbox" else "")
+            continue
+
+        if field_type == "choice":
+            if value not in field["options"]:
+                if field["required"]:
+                    problems.append(f"`{value}` is not an option of `{key}`")
+                else:
+                    log += f"Warning: `{value}` is not an option of `{key}`. \n"
+        elif field_type == "identifier":
+            if classify(value) is None:
+                log += f"Warning: `{value}` of `{key}` is not a DOI, URL, ORCID iD or ROR id. \n"
+        elif field_type == "csv":
+            value = separate_string(value)
+        elif field_type == "list":
+            value = [line.strip() for line in value.splitlines() if line.strip()]
+        elif field_type == "checkbox":
+            value = parse_yes_no_choice(value)
+        elif field_type == "date":
+            try:
+                value = _parse_date(value)
+            except (ValueError, OverflowError):
+                log += f"Warning: could not read the date `{value}` of `{key}`, expected e.g. 1964-02-29. \n"
+                value = ""
+        fields[field["id"]] = value
+
+    if problems:
+        raise IssueFormError(problems)
+    return fields, log
+
+
+def write_field_spec(spec_path=SPEC_FILE, template_path=TEMPLATE_FILE):
+    """
+    Compiles the issue form into .github/resources/issue_fields.json.
+
+    Run with `python3 .github/scripts/issue_fields.py build` after changing the issue form, and commit the result.
+    """
+    spec = compile_field_spec(template_path)
+    with open(spec_path, "w") as f:
+        json.dump(spec, f, indent=2)
+        f.write("\n")
+    print(f"Wrote {spec_path}: {len(spec['fields'])} fields")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "build":
+        write_field_spec()
+    elif len(sys.argv) >= 2 and sys.argv[1] == "check":
+        with open(SPEC_FILE) as f:
+            current = json.load(f)["template"] == _sha256(TEMPLATE_FILE)
+        print(f"issue_fields.json is {'up to date' if current else 'out of date'}")
+        sys.exit(0 if current else 1)
+    else:
+        print("usage: issue_fields.py build | issue_fields.py check")
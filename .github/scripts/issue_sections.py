@@ -0,0 +1,60 @@
+import os
+import re
+
+
+#size limits, in characters. Larger bodies are cut at MAX_BODY, larger fields at MAX_FIELD, with a warning
+MAX_BODY = int(os.getenv("MATE_ISSUE_MAX_BODY", "1000000"))
+MAX_FIELD = int(os.getenv("MATE_ISSUE_MAX_FIELD", "65536"))
+
+#a heading is a line starting with exactly three '#' ('####' headings inside a field are part of its value)
+_heading = re.compile(r"^###(?!#)[ \t]*([^\r\n]*)", re.MULTILINE)
+_whitespace = re.compile(r"\s*")
+
+
+def scan_sections(issue_body, max_body=MAX_BODY, max_field=MAX_FIELD):
+
+    """
+    Splits the markdown body of an issue into its '### heading' sections, in a single pass.
+
+    Each heading line ('### key') starts a section whose value is the text up to the next heading line, without
+    the blank lines after the heading. Text before the first heading is ignored, and a repeated heading keeps its
+    last value. Headings are only recognised at the start of a line, so '###' elsewhere in a value (or a '####'
+    heading) does not cut the value short.
+
+    Parameters:
+    - issue_body (str): the markdown content of the issue.
+    - max_body (int, optional): the maximum body length; a longer body is cut and only its start is scanned.
+    - max_field (int, optional): the maximum value length; longer values are cut.
+
+    Returns:
+    - tuple: (dict mapping headings to values, log string with a warning for each limit applied)
+    """
+
+    log = ""
+    if len(issue_body) > max_body:
+        log += f"Warning: the issue body is {len(issue_body)} characters long, only the first {max_body} were read. \n"
+        issue_body = issue_body[:max_body]
+
+    data = {}
+    headings = list(_heading.finditer(issue_body))
+    for i, heading in enumerate(headings):
+        key = heading.group(1).strip()
+        #the value starts after the last line break of the whitespace following the heading
+        start = heading.end()
+        blank = issue_body[start:_whitespace.match(issue_body, start).end()]
+        line_break = max(blank.rfind('\n'), blank.rfind('\r'))
+        if line_break < 0:
+            #a heading on the last line, with no line break after it, has no value
+            continue
+        start += line_break + 1
+        if i + 1 < len(headings):
+            end = headings[i + 1].start()
+        else:
+            #as with the '$' of the previous regular expression, the last value doesn't keep a final line break
+            end = len(issue_body) - 1 if issue_body.endswith('\n') else len(issue_body)
+        value = issue_body[start:max(start, end)]
+        if len(value) > max_field:
+            log += f"Warning: `{key}` is {len(value)} characters long, only the first {max_field} were read. \n"
+            value = value[:max_field]
+        data[key] = value
+    return data, log
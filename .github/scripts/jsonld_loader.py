@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+from template_store import copy_json
+from resource_bundle import RESOURCES_DIR, load_bundle
+
+
+#context URLs that are served from the files in .github/resources rather than the network
+BUNDLED_CONTEXTS = {
+    "https://w3id.org/ro/crate/1.1/context": "rocrate_context.jsonld",
+    "https://w3id.org/codemeta/3.0": "codemeta_context.jsonld",
+    "https://raw.githubusercontent.com/codemeta/codemeta/master/codemeta.jsonld": "codemeta_context.jsonld",
+}
+
+#on-disk cache for any other remote context
+CACHE_DIR = os.getenv("MATE_JSONLD_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "mate", "jsonld"))
+
+
+def _normalise_url(url):
+    #treat http/https and a trailing slash as the same document
+    if url.startswith("http://"):
+        url = "https://" + url[len("http://"):]
+    return url.rstrip("/")
+
+
+class CachingDocumentLoader:
+
+    """
+    pyld document loader that serves the bundled contexts from disk and caches any other remote document.
+
+    Documents are looked up in memory, then in the bundled resources, then in the on-disk cache, and are only
+    fetched (with pyld's requests loader) if all of those miss. Every document is returned with the 'static' tag,
+    which lets pyld keep the processed (resolved) context in its shared cache, so a context is only processed once
+    per process however many expand/flatten/compact calls use it.
+
+    Parameters:
+    - bundled (dict): maps context URLs to file names in resources_dir.
+    - resources_dir (str): directory holding the bundled context files.
+    - cache_dir (str): directory for the on-disk cache, or None to disable it.
+    - offline (bool): never use the network; unknown URLs raise an error.
+    """
+
+    def __init__(self, bundled=BUNDLED_CONTEXTS, resources_dir=RESOURCES_DIR, cache_dir=CACHE_DIR, offline=False):
+        self.bundled = {_normalise_url(url): filename for url, filename in bundled.items()}
+        self.resources_dir = resources_dir
+        self.cache_dir = cache_dir
+        self.offline = offline
+        self._documents = {}
+        self._remote_loader = None
+
+    def __call__(self, url, options=None):
+        return {
+            "contextUrl": None,
+            "documentUrl": url,
+            #pyld may modify the context it is given, so hand out a copy
+            "document": copy_json(self.document(url)),
+            "tag": "static",
+        }
+
+    def document(self, url):
+        """
+        Returns the parsed JSON document for url. The returned object is shared and must not be modified.
+        """
+        key = _normalise_url(url)
+        if key not in self._documents:
+            self._documents[key] = self._load(url, key)
+        return self._documents[key]
+
+    def _load(self, url, key):
+        if key in self.bundled:
+            #the default resources are read from the compiled resource bundle
+            text = load_bundle().file_text(self.bundled[key]) if self.resources_dir == RESOURCES_DIR else None
+            if text is not None:
+                return json.loads(text)
+            with open(os.path.join(self.resources_dir, self.bundled[key])) as f:
+                return json.load(f)
+
+        cache_path = None
+        if self.cache_dir:
+            cache_path = os.path.join(self.cache_dir, hashlib.sha256(key.encode()).hexdigest()[:32] + ".json")
+            try:
+                with open(cache_path) as f:
+                    return json.load(f)
+            except (OSError, ValueError):
+                pass
+
+        #pyld is only imported when a document has to be fetched (or the loader installed)
+        from pyld import jsonld
+        if self.offline:
+            raise jsonld.JsonLdError(
+                f"Document {url} is not bundled or cached, and the loader is offline.",
+                "jsonld.LoadDocumentError", {"url": url}, code="loading document failed")
+
+        if self._remote_loader is None:
+            self._remote_loader = jsonld.requests_document_loader()
+        document = self._remote_loader(url, {})["document"]
+
+        if cache_path:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(cache_path + ".tmp", "w") as f:
+                    json.dump(document, f)
+                os.replace(cache_path + ".tmp", cache_path)
+            except OSError as e:
+                print(f"Could not write JSON-LD cache: {e}")
+        return document
+
+
+#shared loader
+document_loader = CachingDocumentLoader()
+
+
+def install_document_loader(loader=None):
+    """
+    Makes `loader` (default: the shared CachingDocumentLoader) pyld's default document loader.
+    """
+    from pyld import jsonld
+    jsonld.set_document_loader(loader or document_loader)
+    return loader or document_loader
@@ -1,16 +1,19 @@
-class NestedDict(dict):
-    def get_nested(self, keys):
-        current = self
-        for key in keys.split('.'):
-            current = current.get(key, {})
-        return current
+import csv
+import json
+import sys
+from crate_graph import CrateGraph, is_blank_id
+from config import MATE_GADI
+
+
+#columns of the NCI/ISO record, and of the combined batch spreadsheet (one block of rows per model)
+NCI_COLUMNS = ("Field", "Value")
+NCI_BATCH_COLUMNS = ("Model", "Field", "Value")
+
 
 def graph_to_nested_dict(graph):
-    nested_dict = NestedDict()
-    for item in graph:
-        key = 'root' if item["@id"] == './' else item["@id"]
-        nested_dict[key] = item
-    return nested_dict
+    #the CrateGraph indexes the @graph by @id (with 'root' as an alias for './'),
+    #and provides the get_nested accessor previously implemented by NestedDict
+    return CrateGraph(graph)
 
 def list_to_string(value):
     if isinstance(value, list):
@@ -18,17 +21,27 @@ def list_to_string(value):
     return value
 
 
+def _as_list(value):
+    #compacted crates hold single values (e.g. one funder) as the value itself rather than a one-item list
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
 
 def extract_creator_details(ro_crate_nested):
     creators = ro_crate_nested.get('root', {}).get('creator', [])
     creator_details = []
-    for creator in creators:
+    for creator in ro_crate_nested.deref(_as_list(creators)):
+        #in a flattened crate the affiliation is a reference to an Organization entity
+        affiliation = ro_crate_nested.deref(creator.get("affiliation", {}))
         details = {
             "Last name": creator.get("familyName", "Unknown"),  # Default to "Unknown" if not provided
             "First name": creator.get("givenName", "Unknown"),  # Default to "Unknown" if not provided
-            "Organization": creator.get("affiliation", {}).get("name", "Unknown") if "affiliation" in creator else "Unknown",
+            "Organization": affiliation.get("name", "Unknown") if isinstance(affiliation, dict) else "Unknown",
             "Email": creator.get("email", "Unknown"),  # Default to "Unknown" if not provided
-            "ORCID ID": creator.get("@id", "Unknown")  # Default to "Unknown" if not provided
+            #ids given to entities without one when the crate was built are not ORCIDs
+            "ORCID ID": "Unknown" if is_blank_id(creator.get("@id")) else creator.get("@id", "Unknown")  # Default to "Unknown" if not provided
         }
         creator_details.append(details)
     return creator_details
@@ -40,13 +53,10 @@ def extract_funder_details(ro_crate_nested):
     funders = []
 
     # Extract 'funder' entries directly using NestedDict indexing
-    root_funders = ro_crate_nested.get_nested('root.funder') or []
+    root_funders = _as_list(ro_crate_nested.get_nested('root.funder') or [])
     for funder in root_funders:
-        # Use the funder record directly if it doesn't have an '@id'
-        if "@id" in funder:
-            funder_details = ro_crate_nested.get(funder["@id"], {})
-        else:
-            funder_details = funder
+        # Follow a reference to the funder record (flattened crate), or use the record itself (nested crate)
+        funder_details = ro_crate_nested.deref(funder)
         funders.append({
             "name": funder_details.get("name", "Unknown"),
             "grant_id": "No grant ID provided",  # Default text for missing grant IDs
@@ -54,25 +64,158 @@ def extract_funder_details(ro_crate_nested):
         })
 
     # Extract 'funding' entries, which are typically grants
-    root_fundings = ro_crate_nested.get_nested('root.funding') or []
+    root_fundings = _as_list(ro_crate_nested.get_nested('root.funding') or [])
     for funding in root_fundings:
-        if "@id" in funding:
-            funding_details = ro_crate_nested.get(funding["@id"], {})
-            # Handle nested 'funder' information within 'funding'
-            if "funder" in funding_details:
-                if "@id" in funding_details["funder"]:
-                    funder_info = ro_crate_nested.get(funding_details["funder"]["@id"], {})
-                else:
-                    funder_info = funding_details["funder"]
-                funder_name = funder_info.get("name", "Unknown")
-            else:
-                funder_name = "Unknown"  # Default text if funder name is not available
-            funders.append({
-                "name": funder_name,
-                "grant_id": funding_details.get("identifier", "No grant ID provided"),
-                "email": "Email not provided"  # Default text assuming no email provided
-            })
+        #a reference in a flattened crate, or the grant itself in a nested one
+        funding_details = ro_crate_nested.deref(funding)
+        # Handle nested 'funder' information within 'funding'
+        if "funder" in funding_details:
+            funder_info = ro_crate_nested.deref(funding_details["funder"])
+            funder_name = funder_info.get("name", "Unknown") if isinstance(funder_info, dict) else "Unknown"
+        else:
+            funder_name = "Unknown"  # Default text if funder name is not available
+        funders.append({
+            "name": funder_name,
+            "grant_id": funding_details.get("identifier", "No grant ID provided"),
+            "email": "Email not provided"  # Default text assuming no email provided
+        })
 
     # Deduplicate funders based on 'name'
     unique_funders = {funder['name']: funder for funder in funders if funder['name'] != "Unknown"}
     return list(unique_funders.values())
+
+
+
+def nci_rows(ro_crate):
+
+    """
+    Generates the NCI/ISO record of an RO-Crate, row by row.
+
+    The record holds the dataset fields (title, abstract, license, NCI file path...), then one row per author and
+    three rows per funder or grant.
+
+    Parameters:
+    - ro_crate (dict | CrateGraph): the RO-Crate, nested or flattened.
+
+    Returns:
+    - generator: (field, value) tuples.
+    """
+
+    #index the @graph array by @id, 'root' is accepted as an alias for the root entity (found through the
+    #metadata descriptor when it isn't './', as in a crate flattened by pyld)
+    crate_graph = ro_crate if isinstance(ro_crate, CrateGraph) else CrateGraph(ro_crate)
+    root = 'root'  # Key for root element
+
+    #build up any composite values (missing values are returned as {})
+    nci_file_path =  MATE_GADI + (list_to_string(crate_graph.get_nested(f"{root}.alternateName")) or '')
+
+    yield "Title*", list_to_string(crate_graph.get_nested(f"{root}.name"))
+    yield "Dataset version*", list_to_string(crate_graph.get_nested(f"{root}.version"))
+    yield "Abstract*", list_to_string(crate_graph.get_nested(f"{root}.abstract"))
+    yield "Topic category*", "geoscientificInformation"
+    yield "Field of research (FOR)*", list_to_string(crate_graph.get_nested(f"{root}.about.@id"))
+    yield "License*", crate_graph.get_nested(f"{root}.license.description")
+    yield "Dataset lineage information*", list_to_string(crate_graph.get_nested(f"{root}.description"))
+    yield "Dataset format*", ""
+    yield "Dataset status", list_to_string(crate_graph.get_nested(f"{root}.creativeWorkStatus"))
+    yield "Maintenance frequency*", "as needed"
+    yield "Temporal extents* (if applicable)", ""
+    yield "Spatial extents* (if applicable)", ""
+    yield "Owner* (if applicable)", ""
+    yield "Credit", ""
+    yield "Supplemental or supporting material", ""
+    yield "Local NCI file path", nci_file_path
+    yield "DOI (NCI Internal Field)", list_to_string(crate_graph.get_nested(f"{root}.identifier"))
+    yield "Keyword/s", list_to_string(crate_graph.get_nested(f"{root}.keywords"))
+
+    for i, author in enumerate(extract_creator_details(crate_graph), start=1):
+        yield f"Author {i}", f"{author['Last name']}, {author['First name']}, {author['Organization']}, {author['Email']}, {author['ORCID ID']}"
+
+    for funder in extract_funder_details(crate_graph):
+        yield "Organisation/funding agency name", funder['name']
+        yield "Funding/award description or title", funder['grant_id']
+        yield "Email address for the organisation/agency (if applicable)", funder['email']
+
+
+def nci_writer(stream):
+    #the csv dialect of the NCI/ISO spreadsheets: minimal quoting, '\n' line endings, None written as empty
+    return csv.writer(stream, lineterminator='\n')
+
+
+def write_nci_csv(ro_crate, stream):
+    """
+    Writes the NCI/ISO record of an RO-Crate to a text stream as a Field,Value CSV.
+    """
+    writer = nci_writer(stream)
+    writer.writerow(NCI_COLUMNS)
+    writer.writerows(nci_rows(ro_crate))
+
+
+def write_nci_batch(crates, stream, errors=None):
+
+    """
+    Writes the NCI/ISO records of many RO-Crates to one Model,Field,Value CSV for NCI.
+
+    Crates are read from the iterable one at a time and their rows are written straight to the stream, so only
+    one crate is held in memory at once (pass a generator, e.g. one that loads each crate file in turn).
+
+    Parameters:
+    - crates (iterable): RO-Crates (dicts), or (model name, RO-Crate) tuples. By default the model name is the
+      root entity's alternateName (the model slug). A crate given as None (e.g. a file that couldn't be read) is
+      a failure.
+    - stream: a text stream, opened with newline=''.
+    - errors (list, optional): if given, a crate whose record can't be built is skipped (none of its rows are
+      written) and (position in crates, from 1, model name or None, message) is appended; otherwise the error
+      is raised.
+
+    Returns:
+    - int: the number of crates written.
+    """
+
+    writer = nci_writer(stream)
+    writer.writerow(NCI_BATCH_COLUMNS)
+    count = 0
+    for position, item in enumerate(crates, start=1):
+        model, ro_crate = item if isinstance(item, tuple) else (None, item)
+        try:
+            if ro_crate is None:
+                raise ValueError("no RO-Crate")
+            crate_graph = CrateGraph(ro_crate)
+            if model is None:
+                model = list_to_string(crate_graph.get_nested('root.alternateName')) or None
+            #the rows of one crate are built before any is written, so a failing crate leaves no partial record
+            rows = [(model, field, value) for field, value in nci_rows(crate_graph)]
+        except Exception as err:
+            if errors is None:
+                raise
+            errors.append((position, model, f"{type(err).__name__}: {err}"))
+            continue
+        writer.writerows(rows)
+        count += 1
+    return count
+
+
+def _load_crates(paths):
+    #an unreadable file is passed on as None, so write_nci_batch records it and carries on
+    for path in paths:
+        try:
+            with open(path) as f:
+                yield json.load(f)
+        except (OSError, ValueError) as err:
+            print(f"Unable to read {path}: {err}")
+            yield None
+
+
+if __name__ == "__main__":
+    #python3 nci_iso_tools.py nci_batch.csv model_a/ro-crate-metadata.json model_b/ro-crate-metadata.json ...
+    if len(sys.argv) < 3:
+        print("usage: nci_iso_tools.py output.csv ro-crate-metadata.json [ro-crate-metadata.json ...]")
+        sys.exit(1)
+    paths = sys.argv[2:]
+    errors = []
+    with open(sys.argv[1], 'w', newline='') as f:
+        written = write_nci_batch(_load_crates(paths), f, errors=errors)
+    print(f"Wrote the NCI/ISO records of {written} crates to {sys.argv[1]}")
+    for position, model, message in errors:
+        print(f"Failed: {paths[position - 1]}{f' ({model})' if model else ''}: {message}")
+    sys.exit(1 if errors else 0)
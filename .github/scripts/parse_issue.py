@@ -1,17 +1,19 @@
-import re
-import pandas as pd
 from collections import defaultdict
 from request_utils import get_record, check_uri
 from parse_metadata_utils import parse_publication, parse_software, parse_organization
-from parse_utils import parse_name_or_orcid, parse_yes_no_choice, get_authors, get_funders, process_funding_data, parse_image_and_caption, validate_slug, extract_doi_parts, extract_orcid, remove_duplicates, parse_size, identify_separator, separate_string
-from dateutil import parser
+from parse_utils import parse_name_or_orcid, get_authors, get_funders, process_funding_data, parse_image_and_caption, validate_slug, extract_doi_parts, extract_orcid, remove_duplicates, parse_size, identify_separator
 from datetime import datetime
+from resource_bundle import load_bundle
+from for_resolver import load_resolver, defined_term, DEFAULT_FOR_CODE
+from issue_sections import scan_sections
+from issue_fields import read_fields
+from identifiers import classify, DOI, ROR
 
 def read_issue_body(issue_body):
     """
     Parses the markdown content of a GitHub issue body and extracts structured data.
 
-    This function uses regular expressions to identify markdown headings (formatted as '### Heading') and the text that follows them up to the next heading or the end of the document. It constructs a dictionary where each heading is a key and the associated text is the corresponding value.
+    This function uses issue_sections.scan_sections to identify markdown headings (formatted as '### Heading' at the start of a line) and the text that follows them up to the next heading or the end of the document, in a single pass. It constructs a dictionary where each heading is a key and the associated text is the corresponding value. Bodies and values longer than the limits of issue_sections are cut.
 
     Parameters:
     - issue_body (str): The markdown content of a GitHub issue body.
@@ -23,8 +25,7 @@ def read_issue_body(issue_body):
     - The function assumes that the issue body uses '###' markdown syntax for headings.
     - Headings are used as dictionary keys and should be unique within the issue body for the resulting dictionary to capture all data correctly.
     """
-    regex = r"### *(?P<key>.*?)\s*[\r\n]+(?P<value>[\s\S]*?)(?=###|$)"
-    data = dict(re.findall(regex, issue_body))
+    data, _ = scan_sections(issue_body)
     return data
 
 
@@ -47,7 +48,7 @@ def null_response_check(string):
     return result
 
 
-def parse_issue(issue):
+def parse_issue(issue, check_repo_name=True):
 
     """
     Parses issue data to extract and structure relevant information into a dictionary format suitable for metadata representation.
@@ -56,9 +57,10 @@ def parse_issue(issue):
 
     Parameters:
     - issue (object): An object representing the GitHub issue, containing at least a 'body' attribute with the issue's content.
+    - check_repo_name (bool, optional): check that a model repository can be created with the proposed slug (see `validate_slug`). If False, the proposed slug is used as the slug.
 
     Processing Steps:
-    1. Extract key-value pairs from the issue body using regular expressions, where keys are derived from headings and values from the subsequent text.
+    1. Extract key-value pairs from the issue body, where keys are derived from headings and values from the subsequent text, and read them into typed values with the field spec compiled from the issue form (issue_fields.read_fields). A body that doesn't match the form raises an IssueFormError here, before any metadata is looked up.
     2. Initialize an empty data dictionary to hold structured metadata and an error log string.
     3. For each expected piece of information (e.g., creator, slug, license), perform the following:
        - Extract and clean the relevant data from the extracted key-value pairs.
@@ -80,10 +82,14 @@ def parse_issue(issue):
     """
 
     #read in the issue markdown as a dictionary
-    data = read_issue_body(issue.body)
+    data, body_log = scan_sections(issue.body)
+    #check every field of the form and read it into a typed value (see issue_fields.py), before any lookups
+    fields, fields_log = read_fields(data)
 
 
     error_log = ""
+    if body_log or fields_log:
+        error_log += "**Issue body**\n" + body_log + fields_log
 
 
     data_dict = {}
@@ -93,10 +99,10 @@ def parse_issue(issue):
     #############
 
     # associated publication DOI
-    publication_doi = data["-> associated publication DOI"].strip()
+    publication_doi = fields["pub_doi"]
     publication_record = {}
 
-    if publication_doi == "_No response_":
+    if not publication_doi:
         error_log += "**Associated Publication**\n"
         error_log += "Warning: No DOI provided. \n"
     else:
@@ -116,13 +122,13 @@ def parse_issue(issue):
     # Fill in 'software' record next as it may be required by other items
     #############
     # software framework DOI/URI
-    software_doi = data["-> software framework DOI/URI"].strip()
+    software_doi = fields["software_framework_doi_uri"]
 
     software_doi_only = extract_doi_parts(software_doi)
 
     software_record={"@type": "SoftwareApplication"}
 
-    if software_doi == "_No response_":
+    if not software_doi:
         error_log += "**Software Framework DOI/URI**\n"
         error_log += "Warning: no DOI/URI provided.\n"
 
@@ -140,9 +146,9 @@ def parse_issue(issue):
             #error_log += "**Software Framework DOI/URI**\n Non-Zenodo software dois not yet supported\n"
 
     # software framework source repository
-    software_repo = data["-> software framework source repository"].strip()
+    software_repo = fields["software_framework_repository"]
 
-    if software_repo == "_No response_":
+    if not software_repo:
         error_log += "**Software Repository**\n"
         error_log += "Warning: no repository URL provided. \n"
     else:
@@ -153,9 +159,9 @@ def parse_issue(issue):
             error_log += "**Software Repository**\n" + response + "\n"
 
     # name of primary software framework
-    software_name = data["-> name of primary software framework (e.g. Underworld, ASPECT, Badlands, OpenFOAM)"].strip()
+    software_name = fields["software_framework"]
 
-    if software_name == "_No response_":
+    if not software_name:
         try:
             software_name = software_record['name']
         except:
@@ -165,10 +171,9 @@ def parse_issue(issue):
         software_record["name"] = software_name     # N.B. this will overwrite any name obtained from the DOI
 
     # software framework authors
-    authors = data['-> software framework authors'].strip().split('\r\n')
+    authors = fields["software_framework_authors"]
 
-    #if authors[0] == "_No response_":
-    if null_response_check(authors[0]):
+    if not authors:
         try:
             software_author_list = software_record["author"]
         except:
@@ -182,11 +187,9 @@ def parse_issue(issue):
             error_log += "**Software framework authors**\n" + log
 
     # software & algorithm keywords
-    #software_keywords = [x.strip() for x in data["-> software & algorithm keywords"].split(",")]
-    software_keywords = separate_string(data["-> software & algorithm keywords"])
+    software_keywords = fields["software_keywords"]
 
-    #if software_keywords[0] == "_No response_":
-    if null_response_check(software_keywords[0]):
+    if not software_keywords:
         error_log += "**Software & algorithm keywords**\n"
         error_log += "Warning: no keywords given. \n"
     else:
@@ -201,19 +204,19 @@ def parse_issue(issue):
     # The following fields get added to the data_dict: submitter, creator, contributor, data_creator.
 
     # submitter (individual). Not necessarily the creator of the original model.
-    submitter = data["-> submitter ORCID (or name)"].strip()
+    submitter = fields["submitter"]
     submitter_record, log = parse_name_or_orcid(submitter)
     data_dict["submitter"] = submitter_record
     if log:
         error_log += "**Submitter**\n" + log +"\n"
 
     # model creators
-    creators = data['-> model creators'].strip().split('\r\n')
+    creators = fields["model_creators"]
     #test if the input has an orcid type, and if so, make sure only the orcid id is present
 
 
     #first check for null response, and try to use publication record
-    if null_response_check(creators[0]):
+    if not creators:
         try:
             creators_list = publication_record["author"]
         except:
@@ -266,50 +269,53 @@ def parse_issue(issue):
 
 
     # slug
-    proposed_slug = data["-> slug"].strip()
+    proposed_slug = fields["slug"]
     data_dict["proposed_slug"] = proposed_slug
 
-    slug, log = validate_slug(proposed_slug)
+    slug, log = validate_slug(proposed_slug, check_repo_name=check_repo_name)
     data_dict["slug"] = slug
     if log:
         error_log += "**Model Repository Slug**\n" + log + '\n'
 
     # FoR codes
-    about_record = {
-        "@id": "https://linked.data.gov.au/def/anzsrc-for/2020/370401",
-        "@type": "DefinedTerm",
-        "name": "Computational modelling and simulation in earth sciences",
-        "termCode": "370401"
-        }
+    #codes, names or FoR IRIs are resolved to DefinedTerm records (with their groups and divisions).
+    #the default term is used if the issue has no FoR entry
+    for_entry = fields["for_codes"]
+    about_record = defined_term(DEFAULT_FOR_CODE, load_bundle().for_codes[DEFAULT_FOR_CODE])
+    if for_entry:
+        for_records, log = load_resolver().resolve(for_entry)
+        if for_records:
+            about_record = for_records
+        else:
+            log += f"Warning: using the default FoR code `{DEFAULT_FOR_CODE}`. \n"
+        if log:
+            error_log += "**Field of Research (FoR) codes**\n" + log
 
     data_dict["for_codes"] = about_record
 
     # license
-    license = data["-> license"].strip()
-    try:
-        license_lut = pd.read_csv("../.github/resources/licenses.csv", dtype=str)
-    except:
-        license_lut = pd.read_csv(".github/resources/licenses.csv", dtype=str)
+    license = fields["model-license"]
     #e.g. https://www.researchobject.org/ro-crate/1.1/contextual-entities.html#licensing-access-control-and-copyright
     #license,name,url,text,website_path
     license_record={"@type": "CreativeWork"}
-    if license != "alternative":
-        license_record["@id"] = license_lut[license_lut.license == license].url.values[0]
-        license_record["description"] = license_lut[license_lut.license == license].name.values[0]
-        license_record["website_path"] = license_lut[license_lut.license == license].website_path.values[0]
-        license_record["url"] = license_lut[license_lut.license == license].text.values[0]
-        license_record["name"] = license_lut[license_lut.license == license].license.values[0]
+    if not license:
+        #no license chosen, already reported as a required field
+        pass
+    elif license != "alternative":
+        license_row = load_bundle().licenses[license]
+        license_record["@id"] = license_row["url"]
+        license_record["description"] = license_row["name"]
+        license_record["website_path"] = license_row["website_path"]
+        license_record["url"] = license_row["text"]
+        license_record["name"] = license_row["license"]
     else:
         license_record["name"] = "alternative"
     data_dict["license"] = license_record
 
     # model category
-    #model_category = [x.strip() for x in data["-> model category"].split(",")]
-    model_category = separate_string(data["-> model category"])
+    model_category = fields["about_metadata_tags"]
 
-    #if model_category[0] == "_No response_":
-    if null_response_check(model_category[0]):
-        model_category = []
+    if not model_category:
         error_log += "**Model category**\n"
         error_log += "Warning: No category selected \n"
 
@@ -317,25 +323,18 @@ def parse_issue(issue):
 
 
     # model status
-    model_status = []
-    try:
-        #model_status = [x.strip() for x in data["-> model status"].split(",")]
-        model_status = separate_string(data["-> model status"])
-
-        #if model_status[0] == "_No response_":
-        if null_response_check(model_status[0]):
-            error_log += "**Model status**\n"
-            error_log += "Warning: No model status selected \n"
-    except:
-        error_log += "Warning: No model status enrty found \n"
+    model_status = fields["status_metadata_tags"]
+
+    if not model_status:
+        error_log += "**Model status**\n"
+        error_log += "Warning: No model status selected \n"
     data_dict["model_status"] = model_status
 
 
     # title
-    title = data["-> title"].strip()
+    title = fields["title"]
 
-    #if title == "_No response_":
-    if null_response_check(title):
+    if not title:
         try:
             title = publication_record['name']
         except:
@@ -346,10 +345,9 @@ def parse_issue(issue):
     data_dict["title"] = title
 
     # abstract
-    abstract = data["-> abstract"].strip()
+    abstract = fields["abstract"]
 
-    #if abstract == "_No response_":
-    if null_response_check(abstract):
+    if not abstract:
         try:
             abstract = publication_record['abstract']
         except:
@@ -360,25 +358,21 @@ def parse_issue(issue):
     data_dict["abstract"] = abstract
 
     # description - brief plain langauge summary.
-    description = data["-> description"].strip()
+    description = fields["description"]
     data_dict["description"] = description
 
     # scientific keywords
-    #keywords = [x.strip() for x in data["-> scientific keywords"].split(",")]
-    keywords = separate_string(data["-> scientific keywords"])
+    keywords = fields["keywords"]
 
-    #if keywords[0] == "_No response_":
-    if null_response_check(keywords[0]):
-        keywords = []
+    if not keywords:
         error_log += "**Scientific keywords**\n"
         error_log += "Warning: No keywords given \n"
 
     data_dict["scientific_keywords"] = keywords
 
     # funder
-    #funders = [x.strip() for x in data["-> funder"].split(",")]
-
-    funders_string = data["-> funder"]
+    #one funder per line, as "funding body, grant_id"
+    funders_string = "\n".join(fields["funder_ROR_URI"])
     funders_dict = process_funding_data(funders_string)
 
     #if funders[0] == "_No response_":
@@ -402,22 +396,10 @@ def parse_issue(issue):
     #############
 
     # embargo, record as a Tuple with a Boolean, and a date
+    #the date is read (and checked) by read_fields, an unreadable date is read as no embargo
     model_embargo = (False, datetime.min.strftime('%Y-%m-%d'))
-    try:
-        embargo = data["-> model embargo?"].strip()
-        #if model_embargo[0] == "_No response_":
-        if null_response_check(model_embargo[0]):
-            pass
-        else:
-            try:
-                date_input = parser.parse(embargo )
-                #calling the dateutil parser simply provides the error checking.
-                #leading/trailing whitespaces are okay, and get removed.
-                model_embargo = (True, date_input.strftime('%Y-%m-%d') )
-            except:
-                error_log += "Could not parse Embargo date. Check format is  \n"
-    except:
-        error_log += "Warning: No model embargo entry found \n"
+    if fields["request_embargo"]:
+        model_embargo = (True, fields["request_embargo"])
 
     data_dict["embargo"] = model_embargo
 
@@ -427,17 +409,14 @@ def parse_issue(issue):
 
 
     # include model code
-    model_code = data["-> include model code ?"].strip()
-    data_dict["include_model_code"] = parse_yes_no_choice(model_code)
+    data_dict["include_model_code"] = fields["code_include"]
 
     # model code/inputs
     model_code_record = {}
     # model code/inputs DOI
-    model_code_doi = data["-> model code/inputs DOI"].strip()
+    model_code_doi = fields["code_doi"]
 
-    #if model_code_doi == "_No response_":
-    if null_response_check(model_code_doi):
-        model_code_doi = ""
+    if not model_code_doi:
         error_log += "**Model code/inputs DOI**\n"
         error_log += "Warning: No DOI/URI provided. \n"
     else:
@@ -449,11 +428,9 @@ def parse_issue(issue):
     model_code_record["doi"] = model_code_doi
 
     # model code/inputs notes
-    model_code_notes = data["-> model code/inputs notes"].strip()
+    model_code_notes = fields["code_notes"]
 
-    #if model_code_notes == "_No response_":
-    if null_response_check(model_code_notes):
-        model_code_notes = ""
+    if not model_code_notes:
         error_log += "**Model code/inputs notes**\n"
         error_log += "Warning: No notes provided.\n"
 
@@ -464,10 +441,9 @@ def parse_issue(issue):
 
 
     # include model output data
-    model_output = data["-> include model output data?"].strip()
     #having this outside the record
     #anticipates that we might choose not to build the record if False
-    data_dict["include_model_output"] = parse_yes_no_choice(model_output)
+    data_dict["include_model_output"] = fields["data_include"]
 
 
 
@@ -475,14 +451,12 @@ def parse_issue(issue):
     model_output_record = {}
 
     # model creators
-    data_creators = data['-> data creators'].strip().split('\r\n')
+    data_creators = fields["data_creators"]
 
     #test if the input has an orcid type, and if so, make sure only the orcid id is present
-    orcid_id = extract_orcid(data_creators[0])
-    if orcid_id:
+    if data_creators and extract_orcid(data_creators[0]):
         data_creators = [extract_orcid(p) for p in data_creators]
-    #if data_creators[0] == "_No response_":
-    if null_response_check(data_creators[0]):
+    if not data_creators:
         #if no respones, add the root entity creators
         data_creators_list = data_dict["creators"]
         error_log += "**Model creators**\n"
@@ -496,12 +470,9 @@ def parse_issue(issue):
 
 
     # model output URI/DOI
-    model_output_doi = data["-> model output data DOI"].strip()
+    model_output_doi = fields["data_doi"]
 
-    #if model_output_doi == "_No response_":
-    if null_response_check(model_output_doi):
-    #data_creators[0]
-        model_output_doi = ""
+    if not model_output_doi:
         error_log += "**Model output DOI**\n"
         error_log += "Warning: No DOI/URI provided. \n"
     else:
@@ -513,23 +484,19 @@ def parse_issue(issue):
     model_output_record["doi"] = model_output_doi
 
     # model output notes
-    model_output_notes = data["-> model output data notes"].strip()
+    model_output_notes = fields["data_notes"]
 
-    #if model_output_notes == "_No response_":
-    if null_response_check(model_output_notes):
-        model_output_notes = ""
+    if not model_output_notes:
         error_log += "**Model data notes**\n"
         error_log += "Warning: No notes provided.\n"
 
     model_output_record["notes"] = model_output_notes
 
     # model output size
-    model_output_size = data["-> model output data size"].strip()
+    model_output_size = fields["data_size"]
     data_bytes_value = None
 
-    #if model_output_size == "_No response_":
-    if null_response_check(model_output_size):
-            model_output_size = ""
+    if not model_output_size:
             error_log += "**Model data size**\n"
             error_log += "Warning: No notes provided.\n"
 
@@ -553,9 +520,8 @@ def parse_issue(issue):
 
     computer_record = {}
     log1 = ''
-    computer_uri = data["-> computer URI/DOI"].strip()
-    #if computer_uri == "_No response_":
-    if null_response_check(computer_uri):
+    computer_uri = fields["compute_doi"]
+    if not computer_uri:
         error_log += "**Computer URI/DOI**\n"
         error_log += "Warning: No URI/DOI provided. \n"
     else:
@@ -568,16 +534,17 @@ def parse_issue(issue):
             computer_record.update({'name': ''})
             computer_record.update({'url': computer_uri})
             computer_record.update({'@id': computer_uri})
+            identifier = classify(computer_uri)
             try:
                 #check for RoR
-                if "ror.org" in computer_uri:
+                if identifier and identifier.kind == ROR:
                     record, get_log = get_record("organization", computer_uri)
                     compute_org_record, parse_log = parse_organization(record)
                     if get_log or parse_log:
                         log1 += get_log + parse_log
                     computer_record.update({'name': compute_org_record['name']})
                 #check for valid DOI
-                elif extract_doi_parts(computer_uri) != 'No valid DOI found in the input string.':
+                elif identifier and identifier.kind == DOI:
                     computer_record, log1 = get_record('software', computer_uri)
 
             except:
@@ -595,11 +562,10 @@ def parse_issue(issue):
     # Section 4
     #############
     # landing page image and caption
-    img_string = data["-> add landing page image and caption"].strip()
+    img_string = fields["web_landing_page"]
     empty_image_record = {"filename":"", "url": ""}
 
-    #if img_string == "_No response_":
-    if null_response_check(img_string):
+    if not img_string:
         error_log += "**Landing page image**\n"
         error_log += "Error: No image uploaded.\n\n"
         data_dict["landing_image"] = empty_image_record
@@ -610,9 +576,9 @@ def parse_issue(issue):
         data_dict["landing_image"] = landing_image_record
 
     # animation
-    img_string = data["-> add an animation (if relevant)"].strip()
+    img_string = fields["web_animation"]
 
-    if img_string == "_No response_":
+    if not img_string:
         error_log += "**Animation**\n"
         error_log += "Warning: No animation uploaded.\n\n"
         data_dict["animation"] = empty_image_record
@@ -623,9 +589,9 @@ def parse_issue(issue):
         data_dict["animation"] = animation_record
 
     # graphic abstract
-    img_string = data["-> add a graphic abstract figure (if relevant)"].strip()
+    img_string = fields["graphic_abstract"]
 
-    if img_string == "_No response_":
+    if not img_string:
         error_log += "**Graphic abstract**\n"
         error_log += "Warning: No image uploaded.\n\n"
         data_dict["graphic_abstract"] = empty_image_record
@@ -636,9 +602,9 @@ def parse_issue(issue):
         data_dict["graphic_abstract"] = graphic_abstract_record
 
     # model setup figure
-    img_string = data["-> add a model setup figure (if relevant)"].strip()
+    img_string = fields["model_setup"]
 
-    if img_string == "_No response_":
+    if not img_string:
         error_log += "**Model setup figure**\n"
         error_log += "Warning: No image uploaded.\n\n"
         data_dict["model_setup_figure"] = empty_image_record
@@ -649,9 +615,9 @@ def parse_issue(issue):
         data_dict["model_setup_figure"] = model_setup_fig_record
 
     # description
-    model_description = data["-> add a description of your model setup"].strip()
+    model_description = fields["model_setup_description"]
 
-    if model_description == "_No response_":
+    if not model_description:
         error_log += "**Model setup description**\n"
         error_log += "Warning: No description given \n"
     else:
@@ -10,8 +10,20 @@ from filetypes import Svg
 #from improved_request_utils import get_record, search_organization
 from request_utils import get_record, search_organization
 from parse_metadata_utils import parse_author, parse_organization
+from person_index import PersonIndex
+from identifiers import classify, find, prefix, search_doi, ORCID, DOI, ROR, URL, ATTACHMENT
 
-def validate_slug(proposed_slug):
+def validate_slug(proposed_slug, check_repo_name=True):
+    """
+    Checks the format of a proposed slug and, with check_repo_name, that a model repository can be created with it
+    (generate_identifier.py, run from the repository root with ISSUE_NUMBER set).
+
+    Without check_repo_name (e.g. when past issues are re-parsed, whose model repositories already exist), the
+    proposed slug is returned as the slug.
+
+    Returns:
+    - tuple: (slug, or "" if no repo name could be made, error log string)
+    """
     error_log = ""
 
     try:
@@ -24,6 +36,9 @@ def validate_slug(proposed_slug):
     except AssertionError as err:
         error_log += f"{err}\n"
 
+    if not check_repo_name:
+        return proposed_slug.strip(), error_log
+
     #try a workaround for local tests
     cmd = "python3 .github/scripts/generate_identifier.py"
 
@@ -55,10 +70,14 @@ def parse_name_or_orcid(name_or_orcid):
     str: Error log.
     """
     error_log = ""
-    orcid_id = extract_orcid(name_or_orcid)
-
-    if orcid_id:
-        orcid_record, log1 = get_record("author", orcid_id)
+    orcid = find(name_or_orcid, ORCID)
+
+    if orcid and not orcid.valid:
+        #a mistyped iD, don't look it up
+        error_log += f"- Error: `{orcid.value}` is not a valid ORCID iD (wrong check digit).\n"
+        author_record = {}
+    elif orcid:
+        orcid_record, log1 = get_record("author", orcid.value)
         author_record, log2 = parse_author(orcid_record)
         if log1 or log2:
             error_log += log1 + log2
@@ -93,13 +112,8 @@ def parse_yes_no_choice(input):
         return False
 
 def is_orcid_format(author):
-
-    orcid_pattern = re.compile(r'\d{4}-\d{4}-\d{4}-\d{3}[0-9X]')
-
-    if orcid_pattern.fullmatch(author):
-        return True
-    else:
-        return False
+    identifier = classify(author)
+    return identifier is not None and identifier.kind == ORCID and identifier.value == author.strip()
 
 
 def get_authors(author_list):
@@ -134,7 +148,8 @@ def get_funders(funder_list):
     funders = []
 
     for funder in funder_list:
-        if "ror.org" not in funder:
+        ror = find(funder, ROR)
+        if not ror:
             ror_id, get_log = search_organization(funder)
             log += get_log
 
@@ -142,8 +157,9 @@ def get_funders(funder_list):
                 funders.append({"@type": "Organization", "name": funder, "url": funder})
             else:
                 funder = ror_id
+                ror = find(funder, ROR)
 
-        if "ror.org" in funder:
+        if ror:
             record, get_log = get_record("organization", funder)
             funder_record, parse_log = parse_organization(record)
             if get_log or parse_log:
@@ -317,9 +333,6 @@ def parse_image_and_caption(img_string, default_filename):
     # Precompile regex patterns for Markdown image links
     md_regex = re.compile(r"\[(?P<filename>[^]]+)\]\((?P<url>https?://[^\s)]+)\)")
     
-    # Combined pattern to match both old and new GitHub URL structures
-    pattern = re.compile(r"https://github.com/(?:ModelAtlasofTheEarth/[^/]+/(?:assets|files)/|user-attachments/assets/)")
-
     # Adding support for SVG files
     filetype.add_type(Svg())
 
@@ -333,7 +346,7 @@ def parse_image_and_caption(img_string, default_filename):
             # Extract filename and URL
             image_record["filename"] = md_match.group("filename").strip()  # Strip whitespace
             image_record["url"] = md_match.group("url").strip()  # Strip whitespace
-        elif pattern.search(line):
+        elif find(line, ATTACHMENT):
             # Fallback for direct URL parsing (though this shouldn't be necessary now)
             if line.startswith("https://"):
                 image_record["filename"] = default_filename
@@ -373,29 +386,11 @@ def parse_image_and_caption(img_string, default_filename):
     return image_record, log
 
 def extract_doi_parts(doi_string):
-    # Regular expression to match a DOI within a string or URL
-    # It looks for a string starting with '10.' followed by any non-whitespace characters
-    # and optionally includes common URL prefixes
-    # the DOI
-    doi_pattern = re.compile(r'(10\.[0-9]+/[^ \s]+)')
-
-    # Search for DOI pattern in the input string
-    match = doi_pattern.search(doi_string)
-
-    # If a DOI is found in the string
-    if match:
-        # Extract the DOI
-        doi = match.group(1)
+    # The DOI anywhere within a string or URL (see identifiers.py), without trailing punctuation
+    doi = search_doi(doi_string)
 
-        # Clean up the DOI by removing any trailing characters that are not part of a standard DOI
-        # This includes common punctuation and whitespace that might be accidentally included
-        #doi = re.sub(r'[\s,.:;]+$', '', doi)
-        doi = re.sub(r'[\s,.:;|\/\?:@&=+\$,]+$', '', doi)
-
-        # Split the DOI into prefix and suffix at the first "/"
-        #prefix, suffix = doi.split('/', 1)
-
-        return doi
+    if doi:
+        return doi.value
     else:
         # Return an error message if no DOI is found
         return "No valid DOI found in the input string."
@@ -429,56 +424,53 @@ def extract_orcid(input_str):
     None
     """
 
-    orcid_pattern = re.compile(r'\d{4}-\d{4}-\d{4}-\d{3}[0-9X]')
-    match = orcid_pattern.search(input_str)
-    if match:
-        return match.group(0)
+    orcid = find(input_str, ORCID)
+    if orcid:
+        return orcid.value
     return None
 
 
 def is_orcid(input_str):
     """
-    Checks if the given string matches the ORCiD pattern.
+    Checks if the given string starts with an ORCiD ID or ORCiD URL.
 
     Parameters:
     - input_str (str): A string to be checked against the ORCiD pattern.
 
     Returns:
-    - bool: True if the string matches the ORCiD pattern, False otherwise.
+    - bool: True if the string starts with an ORCiD ID or URL, False otherwise.
     """
-    orcid_pattern = re.compile(r'(?:https?://orcid\.org/)?([0-9]{4}-[0-9]{4}-[0-9]{4}-[0-9]{3}[0-9X])')
-    return bool(orcid_pattern.match(input_str))
+    identifier = prefix(input_str)
+    return identifier is not None and identifier.kind == ORCID
 
 def remove_duplicates(list_a, list_b):
     """
-    Removes items from list_b that have an @id matching any @id in list_a. If an @id is an ORCiD pattern,
-    it is first normalized using extract_orcid. Otherwise, the @id is used as is.
+    Removes items from list_b that match a person in list_a. Items match if their @id is the same (ORCiD @ids are
+    first normalized using extract_orcid, other @ids are used as is), or if they are Person records whose names
+    reconcile to a person in list_a.
 
     Parameters:
     - list_a (list): List of dictionaries potentially containing ORCiD IDs in their '@id' keys.
-    - list_b (list): List of dictionaries from which items should be removed if their '@id' matches any in list_a.
+    - list_b (list): List of dictionaries from which items should be removed if they match an item in list_a.
 
     Returns:
-    - list: A new list derived from list_b with items removed that have matching @id keys in list_a.
+    - list: A new list derived from list_b with items removed that match items in list_a.
     """
-    # Normalize and collect @id values from list_a
-    a_ids = set()
-    for item in list_a:
-        if '@id' in item:
-            id_val = item['@id']
-            if is_orcid(id_val):
-                a_ids.add(extract_orcid(id_val))
-            else:
-                a_ids.add(id_val)
+    def normalize(id_val):
+        return extract_orcid(id_val) if is_orcid(id_val) else id_val
+
+    #@ids of every item in list_a, whatever its type; the person index only holds Person records
+    a_ids = {normalize(item['@id']) for item in list_a if '@id' in item}
+    person_index = PersonIndex.from_people(list_a)
 
-    # Filter list_b based on @id values found in a_ids
     filtered_b_list = []
     for item in list_b:
         if '@id' in item:
-            id_val = item['@id']
-            normalized_id = extract_orcid(id_val) if is_orcid(id_val) else id_val
-            if normalized_id not in a_ids:
-                filtered_b_list.append(item)
+            if normalize(item['@id']) in a_ids or person_index.has_id(item['@id']):
+                continue
+            if item.get('@type') == 'Person' and person_index.match(item):
+                continue
+            filtered_b_list.append(item)
 
     return filtered_b_list
 
@@ -565,10 +557,11 @@ def process_funding_data(input_string):
         grant_number = parts[1].strip() if len(parts) > 1 else None
         #print(funder_info, grant_number)
         # Check if the funder info is a simple name, URL, or ROR address
-        if re.match(r'^https?:\/\/ror\.org\/', funder_info):  # ROR address
-            results, log = get_funders([funder_info])
+        identifier = classify(funder_info)
+        if identifier and identifier.kind == ROR:  # ROR address
+            results, log = get_funders([identifier.url])
             organization = results[0] if isinstance(results, list) and results else {'@type': 'Organization', 'name': ''}
-        elif re.match(r'^https?:\/\/', funder_info):  # URL
+        elif identifier and identifier.kind in (URL, DOI):  # URL
             try:
                 ror= search_organization(funder_info)
                 result, log = get_funders(funder_info)
@@ -0,0 +1,164 @@
+from collections import defaultdict
+from collections.abc import MutableMapping
+from fuzzywuzzy import fuzz, utils
+from identifiers import classify, ORCID
+
+
+def normalise_person_id(entity_id):
+    """
+    Returns the bare ORCiD of an ORCiD @id (URL or bare form); any other @id is returned as is.
+    """
+    identifier = classify(entity_id) if isinstance(entity_id, str) else None
+    return identifier.value if identifier and identifier.kind == ORCID else entity_id
+
+
+def person_key(person):
+    """
+    Returns the name key used to match Person records: "givenName familyName".
+    """
+    return f"{person.get('givenName')} {person.get('familyName')}"
+
+
+def sorted_key(name):
+    """
+    Returns the token-sorted form of a name, as compared by fuzz.token_sort_ratio (which drops non-ASCII characters).
+    """
+    return " ".join(sorted(utils.full_process(name, force_ascii=True).split()))
+
+
+def block_keys(person):
+    """
+    Returns the blocking keys of a Person record: its normalised family name and its (sorted) initials.
+
+    Only records sharing at least one blocking key are compared, so a name is scored against a handful of
+    candidates rather than every person in the crate. The initials key is order independent, so records with
+    given and family names swapped still meet.
+    """
+    keys = []
+    family = utils.full_process(str(person.get('familyName') or ''), force_ascii=True)
+    if family:
+        keys.append(('family', family))
+    tokens = utils.full_process(person_key(person), force_ascii=True).split()
+    if tokens:
+        keys.append(('initials', ''.join(sorted(t[0] for t in tokens))))
+    return keys
+
+
+class PersonIndex:
+
+    """
+    Reconciles Person records by identifier and by fuzzy name matching.
+
+    Records with an '@id' are added to the index, keyed by their name. A query record is first looked up by
+    exact (token-sorted) name, then scored with the token sort ratio against the records in its blocks only.
+    Every fuzzy lookup is recorded in `decisions`, so the matches made (and rejected) can be reported.
+
+    Parameters:
+    - threshold (int): the minimum similarity score (0-100) for a fuzzy match. Defaults to 80.
+    - normalise_id (function, optional): maps an '@id' to the form used to compare identifiers.
+      Defaults to normalise_person_id, so ORCiD URLs and bare ORCiDs compare equal.
+    """
+
+    def __init__(self, threshold=80, normalise_id=None):
+        self.threshold = threshold
+        self.normalise_id = normalise_id or normalise_person_id
+        self.records = {}
+        self.ids = set()
+        self.decisions = []
+        self._exact = {}
+        self._blocks = defaultdict(list)
+
+    @classmethod
+    def from_people(cls, people, threshold=80, normalise_id=None):
+        """
+        Builds an index from a nested structure (dict or list) containing Person records.
+        """
+        index = cls(threshold, normalise_id)
+        index.collect(people)
+        return index
+
+    def add(self, person):
+        """
+        Adds a Person record with an '@id'. The first record seen for a name is kept.
+        """
+        entity_id = person.get('@id')
+        if entity_id is None:
+            return
+        self.ids.add(self.normalise_id(entity_id))
+        key = person_key(person)
+        if key in self.records:
+            return
+        self.records[key] = entity_id
+        candidate = (key, sorted_key(key))
+        self._exact.setdefault(candidate[1], candidate)
+        for block in block_keys(person):
+            self._blocks[block].append(candidate)
+
+    def collect(self, data):
+        """
+        Adds every Person record with an '@id' found in a nested structure (dict or list).
+        """
+        stack = [data]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, list):
+                stack.extend(reversed(item))
+            elif isinstance(item, MutableMapping):
+                if item.get('@type') == 'Person' and '@id' in item:
+                    self.add(item)
+                stack.extend(reversed(list(item.values())))
+
+    def has_id(self, entity_id):
+        """
+        Returns True if a record with this '@id' (after normalisation) is in the index.
+        """
+        return self.normalise_id(entity_id) in self.ids
+
+    def match(self, person):
+        """
+        Finds the indexed record matching a Person record by name.
+
+        Returns:
+        - tuple: (name, score, @id) of the best candidate if its score reaches the threshold, otherwise None.
+        """
+        key = person_key(person)
+        query = sorted_key(key)
+        exact = self._exact.get(query)
+        if exact is not None:
+            best, score = exact, 100
+        else:
+            best, score = None, 0
+            seen = set()
+            for block in block_keys(person):
+                for candidate in self._blocks.get(block, ()):
+                    if candidate[0] in seen:
+                        continue
+                    seen.add(candidate[0])
+                    candidate_score = fuzz.ratio(query, candidate[1]) if query else 0
+                    if candidate_score > score:
+                        best, score = candidate, candidate_score
+
+        matched = best is not None and score >= self.threshold
+        self.decisions.append({
+            'name': key,
+            'candidate': best[0] if best else None,
+            'score': score,
+            '@id': self.records[best[0]] if matched else None,
+        })
+        if not matched:
+            return None
+        return best[0], score, self.records[best[0]]
+
+    def report(self):
+        """
+        Returns a human readable summary of the fuzzy match decisions made so far.
+        """
+        lines = []
+        for decision in self.decisions:
+            if decision['@id']:
+                lines.append(f"Matched '{decision['name']}' to '{decision['candidate']}' ({decision['score']}): {decision['@id']}")
+            elif decision['candidate']:
+                lines.append(f"No match for '{decision['name']}': best candidate '{decision['candidate']}' scored {decision['score']}")
+            else:
+                lines.append(f"No match for '{decision['name']}': no candidates")
+        return "\n".join(lines)
@@ -0,0 +1,304 @@
+import json
+import os
+import sys
+from functools import lru_cache
+from crosswalk_mappings import default_issue_entity_mapping_list, issue_yaml_mapping
+from report_sections import REPORT_SECTIONS
+
+
+#the outputs written to a model repository from the issue dictionary (see write_repo_contents.py), in build order.
+#outputs built from another output (e.g. the flattened crate from the nested one) come after it
+CRATE_OUTPUTS = ("nested_crate", "crate", "nci")
+OUTPUT_FILES = {
+    "nested_crate": (os.path.join(".metadata_trail", "ro-crate-metadata-nested.json"),),
+    "crate": ("ro-crate-metadata.json", os.path.join(".website_material", "ro-crate-metadata.json")),
+    "nci": (os.path.join(".metadata_trail", "nci_iso.csv"),),
+    "index": (os.path.join(".website_material", "index.md"),),
+    "readme": ("README.md",),
+    "code_notes": (os.path.join("model_code_inputs", "README.md"),),
+    "output_notes": (os.path.join("model_output_data", "README.md"),),
+    "license": ("LICENSE", os.path.join(".website_material", "license.txt")),
+    "issue_dict": (os.path.join(".metadata_trail", "issue_dict.json"),),
+    #these are changed through the GitHub API and are not rebuilt by this module
+    "topics": (),
+    "graphics": (os.path.join(".website_material", "graphics"),),
+}
+
+#the timestamp the crate and the website page are dated with
+TIMESTAMP = "timestamp"
+
+#fields read by yaml_utils.configure_yaml_output_dict, besides those of issue_yaml_mapping
+YAML_FIELDS = ("slug", "proposed_slug", "include_model_output", "include_model_code", "for_codes", "publication")
+
+#the header write_repo_contents.py puts above the report, and above the notes of the data README files
+PRE_REPORT = '# New [M@TE](https://mate.science/)! model: \n ' + '_we have provided a summary of your model as a starting point for the README, feel free to edit_' + '\n'
+PRE_NOTES = "## Notes:\n"
+
+
+def _paths(paths):
+    return frozenset(tuple(path.split('.')) for path in paths)
+
+
+def _crate_fields(mapping_list):
+    #the issue paths of every entity mapping applied to the crate (mappings whose @id is None are not applied)
+    fields = set()
+    for mapping in mapping_list:
+        if mapping.get('@id') is None:
+            continue
+        for key, issue_keys in mapping.items():
+            if key == '@id':
+                continue
+            if isinstance(issue_keys, list):
+                fields.update(issue_keys)
+            elif issue_keys is not None:
+                fields.add(issue_keys)
+    return fields
+
+
+@lru_cache(maxsize=1)
+def output_dependencies():
+
+    """
+    Returns the issue dictionary paths each output is built from, derived from the crosswalk mappings.
+
+    - the crates and the NCI/ISO record: the paths of default_issue_entity_mapping_list, and the slug (the
+      crate's urls are built from it) and the timestamp;
+    - the website index.md: the source paths of issue_yaml_mapping, the fields read by
+      configure_yaml_output_dict and the timestamp;
+    - the README: the fields of the report sections (report_sections.REPORT_SECTIONS);
+    - the others: the fields write_repo_contents.py reads for them.
+
+    Returns:
+    - dict: maps output names (see OUTPUT_FILES) to frozensets of paths, each a tuple of keys. The issue_dict
+      output depends on every field, and is given the empty path.
+    """
+
+    crate = _paths(_crate_fields(default_issue_entity_mapping_list) | {"slug", TIMESTAMP})
+    index = _paths({source for source in issue_yaml_mapping.values() if source != 'foo'} | set(YAML_FIELDS) | {TIMESTAMP})
+    readme = _paths({field for section in REPORT_SECTIONS for field in section.fields})
+    return {
+        "nested_crate": crate,
+        "crate": crate,
+        "nci": crate,
+        "index": index,
+        "readme": readme,
+        "code_notes": _paths({"model_code_inputs.notes"}),
+        "output_notes": _paths({"model_output_data.notes"}),
+        "license": _paths({"license.url"}),
+        "issue_dict": frozenset({()}),
+        "topics": _paths({"scientific_keywords", "software.keywords"}),
+        "graphics": _paths({"landing_image", "animation", "graphic_abstract", "model_setup_figure"}),
+    }
+
+
+def changed_paths(old, new, path=()):
+    """
+    Returns the paths (tuples of keys) at which two issue dictionaries differ. Dictionaries are compared key by
+    key, and any other values (lists included) as a whole, so a changed creator gives ('creators',).
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        changed = set()
+        for key in old.keys() | new.keys():
+            if key not in old or key not in new:
+                changed.add(path + (key,))
+            else:
+                changed |= changed_paths(old[key], new[key], path + (key,))
+        return changed
+    return set() if old == new else {path}
+
+
+def _affects(changed, dependency):
+    #a change at a path affects the values below it and the values above it
+    n = min(len(changed), len(dependency))
+    return changed[:n] == dependency[:n]
+
+
+def plan_regeneration(old, new, timestamp_changed=False):
+
+    """
+    Diffs two issue dictionaries and returns the outputs that have to be rebuilt.
+
+    Parameters:
+    - old (dict): the issue dictionary the outputs were built from, or None if there were none.
+    - new (dict): the new issue dictionary.
+    - timestamp_changed (bool, optional): the outputs are to be dated with a new timestamp.
+
+    Returns:
+    - tuple: (list of output names, in build order, sorted list of the changed paths as dotted strings)
+    """
+
+    if old is None:
+        return list(OUTPUT_FILES), ["*"]
+    changed = changed_paths(old, new)
+    if timestamp_changed:
+        changed.add((TIMESTAMP,))
+    dependencies = output_dependencies()
+    outputs = [name for name in OUTPUT_FILES
+               if any(_affects(c, d) for c in changed for d in dependencies[name])]
+    return outputs, sorted('.'.join(str(k) for k in c) for c in changed)
+
+
+def _notes(existing, notes):
+    #write_repo_contents.py appends the notes to the README of the data directories: the notes are replaced
+    #after the last notes header, and the rest of the file is kept
+    head, found, _ = existing.rpartition('\n' + PRE_NOTES)
+    return (head if found else existing) + '\n' + PRE_NOTES + (notes or "")
+
+
+def build_outputs(issue_dict, outputs, timestamp=False, existing=None, yaml_mode=None):
+
+    """
+    Builds the files of the given outputs, as write_repo_contents.py does.
+
+    The topics and graphics are not built. The license text is downloaded (see request_utils.download_license_text).
+
+    Parameters:
+    - issue_dict (dict): the issue dictionary.
+    - outputs (list): output names, see OUTPUT_FILES.
+    - timestamp (str, optional): the datePublished of the crate and the date of the website page.
+    - existing (dict, optional): maps file paths to their current content, for the data READMEs.
+    - yaml_mode (str, optional): the emitter of index.md (see yaml_utils.format_yaml_string).
+
+    Returns:
+    - dict: maps file paths (relative to the model repository) to their content
+    """
+
+    existing = existing or {}
+    files = {}
+    if any(name in outputs for name in CRATE_OUTPUTS):
+        from crosswalks import dict_to_metadata, metadata_to_nci
+        from ro_crate_utils import assign_ids
+        from crate_flatten import flatten_and_compact
+        from jsonld_loader import install_document_loader
+        install_document_loader()
+        nested = dict_to_metadata(issue_dict, flat_compact_crate=False, timestamp=timestamp)
+        crate = json.loads(nested)
+        assign_ids(crate['@graph'])
+        if "nested_crate" in outputs:
+            files[OUTPUT_FILES["nested_crate"][0]] = nested
+        if "nci" in outputs:
+            files[OUTPUT_FILES["nci"][0]] = metadata_to_nci(crate)
+        if "crate" in outputs:
+            try:
+                flat = json.dumps(flatten_and_compact(crate))
+            except Exception:
+                flat = dict_to_metadata(issue_dict, flat_compact_crate=True, timestamp=timestamp)
+            for path in OUTPUT_FILES["crate"]:
+                files[path] = flat
+    if "index" in outputs:
+        from crosswalks import dict_to_yaml
+        from yaml_utils import format_yaml_string
+        files[OUTPUT_FILES["index"][0]] = format_yaml_string(dict_to_yaml(issue_dict, timestamp=timestamp), mode=yaml_mode)
+    if "readme" in outputs:
+        from crosswalks import dict_to_report
+        files[OUTPUT_FILES["readme"][0]] = PRE_REPORT + dict_to_report(issue_dict, verbose=True)
+    for name, key in (("code_notes", "model_code_inputs"), ("output_notes", "model_output_data")):
+        path = OUTPUT_FILES[name][0]
+        if name in outputs and path in existing:
+            files[path] = _notes(existing[path], (issue_dict.get(key) or {}).get('notes'))
+    if "license" in outputs:
+        from request_utils import download_license_text
+        license_txt = download_license_text(str((issue_dict.get('license') or {}).get('url', '')))
+        for path in OUTPUT_FILES["license"]:
+            files[path] = license_txt
+    if "issue_dict" in outputs:
+        files[OUTPUT_FILES["issue_dict"][0]] = json.dumps(issue_dict)
+    return files
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def previous_issue_dict(model_dir):
+    """
+    Returns the issue dictionary the outputs of a model repository checkout were built from: its
+    .metadata_trail/issue_dict.json, or else the dictionary rebuilt from its RO-Crate (or None if it has neither).
+    """
+    content = _read(os.path.join(model_dir, OUTPUT_FILES["issue_dict"][0]))
+    if content is not None:
+        return json.loads(content)
+    from reverse_crosswalk import load_model
+    try:
+        return load_model(model_dir)[0]
+    except FileNotFoundError:
+        return None
+
+
+def crate_timestamp(model_dir):
+    """
+    Returns the datePublished of the RO-Crate of a model repository checkout, or False.
+
+    The root of a crate flattened by pyld has pyld's base IRI rather than ./ as its id, so the nested crate is
+    read if the flattened one has no root.
+    """
+    from crate_graph import CrateGraph
+    for path in OUTPUT_FILES["crate"][:1] + OUTPUT_FILES["nested_crate"]:
+        content = _read(os.path.join(model_dir, path))
+        timestamp = content and (CrateGraph(json.loads(content)).root or {}).get("datePublished")
+        if timestamp:
+            return timestamp
+    return False
+
+
+def regenerate_model(model_dir, issue_dict, timestamp=None, dry_run=False):
+
+    """
+    Rebuilds the outputs of a model repository checkout that are affected by a new issue dictionary, and writes
+    the files whose content changed.
+
+    Parameters:
+    - model_dir (str): the model repository directory.
+    - issue_dict (dict): the new issue dictionary.
+    - timestamp (str, optional): a new datePublished; by default the crate's current datePublished is kept.
+    - dry_run (bool, optional): only plan, don't build or write anything.
+
+    Returns:
+    - tuple: (list of the file paths written (or to be rebuilt, with dry_run), log string)
+    """
+
+    old = previous_issue_dict(model_dir)
+    old_timestamp = crate_timestamp(model_dir)
+    outputs, changed = plan_regeneration(old, issue_dict, timestamp_changed=bool(timestamp) and timestamp != old_timestamp)
+    log = f"Changed: {', '.join(changed) or 'nothing'} \n"
+    log += f"Outputs to rebuild: {', '.join(outputs) or 'none'} \n"
+    for name in ("topics", "graphics"):
+        if name in outputs:
+            log += f"Warning: the {name} of the model repository have to be updated through GitHub. \n"
+    if dry_run:
+        return [path for name in outputs for path in OUTPUT_FILES[name]], log
+
+    existing = {}
+    for name in ("code_notes", "output_notes"):
+        path = OUTPUT_FILES[name][0]
+        content = _read(os.path.join(model_dir, path))
+        if content is not None:
+            existing[path] = content
+    files = build_outputs(issue_dict, outputs, timestamp=timestamp or old_timestamp, existing=existing)
+
+    written = []
+    for path, content in files.items():
+        full_path = os.path.join(model_dir, path)
+        if _read(full_path) == content:
+            continue
+        os.makedirs(os.path.dirname(full_path) or ".", exist_ok=True)
+        with open(full_path, "w") as f:
+            f.write(content)
+        written.append(path)
+    log += f"Wrote: {', '.join(written) or 'nothing'} \n"
+    return written, log
+
+
+if __name__ == "__main__":
+    #python3 .github/scripts/regeneration.py <model repository directory> <new issue_dict.json> [--dry-run]
+    args = [a for a in sys.argv[1:] if a != "--dry-run"]
+    if len(args) != 2:
+        print("usage: regeneration.py MODEL_DIR ISSUE_DICT_JSON [--dry-run]")
+        sys.exit(2)
+    with open(args[1]) as f:
+        new_issue_dict = json.load(f)
+    print(regenerate_model(args[0], new_issue_dict, dry_run="--dry-run" in sys.argv)[1], end="")
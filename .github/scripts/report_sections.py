@@ -0,0 +1,368 @@
+import io
+import json
+import os
+from collections import OrderedDict
+
+
+#maximum number of rendered fragments kept in memory by a process (least recently used fragments are dropped
+#first). 0 disables the cache, so every fragment is rendered each time
+REPORT_CACHE_SIZE = int(os.getenv("MATE_REPORT_CACHE_SIZE", "512"))
+
+#value encoded for issue_dict keys that are missing, so a missing key and an empty value get different fragments
+_MISSING = {"__missing__": True}
+
+
+class Section:
+
+    """
+    One fragment of the markdown report.
+
+    Parameters:
+    - name (str): the section name, used in the cache key.
+    - fields (tuple): the top-level issue_dict keys the fragment is rendered from. The fragment is cached under
+      their values, so it is only re-rendered when one of them changes.
+    - render (callable): render(issue_dict) -> str.
+    - verbose (bool): if True, the fragment is only included in the verbose report (the model README).
+    """
+
+    __slots__ = ('name', 'fields', 'render', 'verbose')
+
+    def __init__(self, name, fields, render, verbose=False):
+        self.name = name
+        self.fields = fields
+        self.render = render
+        self.verbose = verbose
+
+
+class FragmentCache:
+
+    """
+    LRU cache of rendered report fragments, keyed by section name and the JSON text of the section's input fields.
+
+    The cache is held in process memory only, and is not kept between runs: each workflow run (write_report.py,
+    write_repo_contents.py) is a new process, which renders a report from an empty cache. It pays off in batch
+    jobs that render many reports in one process (backfill.py, regeneration), where a fragment is reused by
+    every report whose section inputs are unchanged, e.g. an issue's report and README, or empty optional fields.
+
+    Parameters:
+    - maxsize (int): the maximum number of fragments kept.
+    """
+
+    def __init__(self, maxsize=REPORT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.fragments = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.fragments.clear()
+        self.hits = self.misses = 0
+
+    def info(self):
+        """
+        Returns the cache statistics, as a dictionary with hits, misses and size.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.fragments)}
+
+    def render(self, section, issue_dict, encoded=None):
+        """
+        Returns the fragment of a section for issue_dict, rendering it only if its input fields have changed.
+
+        Parameters:
+        - section (Section): the section to render.
+        - issue_dict (dict): the parsed issue.
+        - encoded (dict, optional): the JSON encodings of issue_dict fields made so far for this report, so a
+          field read by several sections is only encoded once.
+        """
+        if not section.fields:
+            return section.render(issue_dict)
+        if encoded is None:
+            encoded = {}
+        try:
+            key = (section.name,) + tuple(_encoded(issue_dict, field, encoded) for field in section.fields)
+        except (TypeError, ValueError):
+            #values that are not JSON (e.g. dates) can't be compared reliably: render without caching
+            return section.render(issue_dict)
+        fragment = self.fragments.get(key)
+        if fragment is not None:
+            self.hits += 1
+            self.fragments.move_to_end(key)
+            return fragment
+        self.misses += 1
+        fragment = self.fragments[key] = section.render(issue_dict)
+        if len(self.fragments) > self.maxsize:
+            self.fragments.popitem(last=False)
+        return fragment
+
+
+def _encoded(issue_dict, field, encoded):
+    #the JSON text of a field is its cache key: equal text means equal input. Keys are not sorted, as the parser
+    #always builds issue_dict in the same order (a reordered dictionary only costs a re-render)
+    text = encoded.get(field)
+    if text is None:
+        text = encoded[field] = _encoder.encode(issue_dict.get(field, _MISSING))
+    return text
+
+
+_encoder = json.JSONEncoder(ensure_ascii=False, check_circular=False)
+
+
+fragment_cache = FragmentCache() if REPORT_CACHE_SIZE > 0 else None
+
+
+#############
+# fragment templates
+#############
+
+def _static(text):
+    return lambda issue_dict: text
+
+
+def _person(person, prefix=""):
+    text = f"{prefix}{person['givenName']} {person['familyName']} "
+    if "@id" in person:
+        text += f"([{person['@id'].split('/')[-1]}]({person['@id']}))"
+    return text
+
+
+def _bullets(items):
+    return "".join(f"- {item}   \n" for item in items) + "  \n"
+
+
+def _field(title, value):
+    #a bold title followed by a single value
+    return f"**{title}:**   \n\n{value} \n\n"
+
+
+def _submitter(issue_dict):
+    return "**Model Submitter:**  \n\n" + _person(issue_dict['submitter']) + "\n\n"
+
+
+def _creators(issue_dict):
+    return ("**Model Creator(s):**  \n\n"
+            + "".join(_person(creator, "- ") + "  \n" for creator in issue_dict["creators"]) + "  \n")
+
+
+def _slug(issue_dict):
+    #slug, this gets mapped to name. This is what the model is called on NCI
+    return ("**Model slug:**  \n\n"
+            f"`{issue_dict['slug']}` \n\n" + "(this will be the name of the model repository when created) \n\n")
+
+
+def _title(issue_dict):
+    #title doesn't appear in CreativeWorks. This gets mapped to alternateName.
+    return "**Model name:**  \n\n" f"_{issue_dict['title']}_  \n\n"
+
+
+def _license(issue_dict):
+    license = issue_dict["license"]
+    if "url" in license:
+        return "**License:**  \n\n" f"[{license['description']}]({license['url']})\n\n"
+    return "**License:**  \n\n" f"{license['description']}\n\n"
+
+
+def _model_category(issue_dict):
+    return "**Model Category:**  \n\n" + _bullets(issue_dict["model_category"])
+
+
+def _model_status(issue_dict):
+    return "**Model Status:**  \n\n" + _bullets(issue_dict["model_status"])
+
+
+def _publication(issue_dict):
+    publication = issue_dict["publication"]
+    if "@id" not in publication:
+        return ""
+    return ("**Associated Publication title:**  \n\n"
+            f"_[{publication['name']}]({publication['@id']})_ \n\n")
+
+
+def _description(issue_dict):
+    return "**Short description:**  \n\n" + issue_dict["description"] + "\n\n"
+
+
+def _abstract(issue_dict):
+    return "**Abstract:**  \n\n" + issue_dict["abstract"] + "\n\n"
+
+
+def _scientific_keywords(issue_dict):
+    if not issue_dict["scientific_keywords"]:
+        return ""
+    return "**Scientific Keywords:**  \n\n" + _bullets(issue_dict["scientific_keywords"])
+
+
+def _funder(issue_dict):
+    text = "**Funder(s):**  \n"
+    for funder in issue_dict["funder"]:
+        text += f"- {funder['name']} "
+        if "@id" in funder:
+            text += f"({funder['@id']})"
+        elif "url" in funder:
+            text += f"({funder['url']})"
+        text += "  \n"
+    return text + "  \n"
+
+
+def _embargo(issue_dict):
+    if "embargo" not in issue_dict:
+        return ""
+    if issue_dict["embargo"][0] is True:
+        return "**Embargo on model contents requested until:**   \n\n" f"{issue_dict['embargo'][1]} \n\n"
+    return "**No embargo on model contents requested** \n\n"
+
+
+def _include(key, title):
+    def render(issue_dict):
+        if key not in issue_dict:
+            return ""
+        return _field(title, str(issue_dict[key]))
+    return render
+
+
+def _doi_and_notes(key, doi_title, notes_title):
+    def render(issue_dict):
+        inputs = issue_dict[key]
+        text = ""
+        if inputs["doi"]:
+            text += _field(doi_title, inputs['doi'])
+        if inputs["notes"]:
+            text += _field(notes_title, inputs['notes'])
+        return text
+    return render
+
+
+def _software(issue_dict):
+    software = issue_dict["software"]
+    text = ""
+    if "@id" in software:
+        text += ("**Software Framework DOI/URL:**  \n\n"
+                 f"Found software: _[{software['name']}]({software['@id']})_ \n\n")
+    if "codeRepository" in software:
+        text += _field("Software Repository", software['codeRepository'])
+    if "name" in software:
+        text += "**Name of primary software framework:**  \n\n" f"{software['name']} \n\n"
+    return text
+
+
+def _software_authors(issue_dict):
+    software = issue_dict["software"]
+    if "author" not in software:
+        return ""
+    text = "**Software framework authors:**  \n"
+    for author in software["author"]:
+        if "givenName" in author:
+            text += f"- {author['givenName']} {author['familyName']} "
+        elif "name" in author:
+            text += f"- {author['name']} "
+        if "@id" in author:
+            text += f"([{author['@id'].split('/')[-1]}]({author['@id']}))"
+        text += "  \n"
+    return text + "  \n"
+
+
+def _software_keywords(issue_dict):
+    software = issue_dict["software"]
+    if "keywords" not in software:
+        return ""
+    return "**Software & algorithm keywords:**  \n\n" + _bullets(software["keywords"])
+
+
+def _computer(issue_dict):
+    if "computer_uri" not in issue_dict:
+        return ""
+    return _field("Computer DOI/URL", issue_dict['computer_uri'])
+
+
+def _media(key, title):
+    #website images and animations: filename (linked), caption, and for the model setup figure its description
+    def render(issue_dict):
+        if key not in issue_dict:
+            return ""
+        media = issue_dict[key]
+        text = f"**{title}:**  \n\n"
+        if "filename" in media:
+            text += f"Filename: [{media['filename']}]({media['url']})  \n"
+        if "caption" in media:
+            text += f"Caption: {media['caption']}  \n"
+        if key == "model_setup_figure" and "model_setup_description" in issue_dict:
+            text += f"Description:  {issue_dict['model_setup_description']}\n\n"
+        return text + '  \n'
+    return render
+
+
+#the report, in order. Headings have no fields and are not cached
+REPORT_SECTIONS = (
+    Section("section_1", (), _static("## Section 1: Summary of your model   \n\n")),
+    Section("submitter", ("submitter",), _submitter),
+    Section("creators", ("creators",), _creators),
+    Section("slug", ("slug",), _slug),
+    Section("title", ("title",), _title),
+    Section("license", ("license",), _license),
+    Section("model_category", ("model_category",), _model_category),
+    Section("model_status", ("model_status",), _model_status),
+    Section("publication", ("publication",), _publication),
+    Section("description", ("description",), _description),
+    Section("abstract", ("abstract",), _abstract),
+    Section("scientific_keywords", ("scientific_keywords",), _scientific_keywords),
+    Section("funder", ("funder",), _funder),
+
+    Section("section_2", (), _static("## Section 2: your model code, output data  \n\n")),
+    Section("embargo", ("embargo",), _embargo),
+    Section("include_model_code", ("include_model_code",), _include("include_model_code", "Include model code")),
+    Section("model_code_inputs", ("model_code_inputs",),
+            _doi_and_notes("model_code_inputs", "Model code existing URL/DOI", "Model code notes")),
+    Section("include_model_output", ("include_model_output",),
+            _include("include_model_output", "Include model output data")),
+    Section("model_output_data", ("model_output_data",),
+            _doi_and_notes("model_output_data", "Model output data, existing URL/DOI", "Model output data notes")),
+
+    Section("section_3", (), _static("## Section 3: software framework and compute details   \n")),
+    Section("software", ("software",), _software),
+    Section("software_authors", ("software",), _software_authors, verbose=True),
+    Section("software_keywords", ("software",), _software_keywords),
+    Section("computer", ("computer_uri",), _computer),
+
+    Section("section_4", (), _static("## Section 4: web material (for mate.science)   \n")),
+    Section("landing_image", ("landing_image",), _media("landing_image", "Landing page image")),
+    Section("animation", ("animation",), _media("animation", "Animation")),
+    Section("graphic_abstract", ("graphic_abstract",), _media("graphic_abstract", "Graphic abstract")),
+    Section("model_setup_figure", ("model_setup_figure", "model_setup_description"),
+            _media("model_setup_figure", "Model setup figure")),
+)
+
+
+def iter_report(issue_dict, verbose=False, cache=fragment_cache):
+    """
+    Yields the fragments of the markdown report for an issue dictionary, in order.
+
+    Parameters:
+    - issue_dict (dict): the parsed issue.
+    - verbose (bool, optional): include the verbose-only fragments (the model README). The plain and verbose
+      reports share all their common fragments in the cache.
+    - cache (FragmentCache, optional): the fragment cache, or None to render every fragment.
+
+    Returns:
+    - generator: the fragments (str).
+    """
+    encoded = {}
+    for section in REPORT_SECTIONS:
+        if section.verbose and not verbose:
+            continue
+        yield section.render(issue_dict) if cache is None else cache.render(section, issue_dict, encoded)
+
+
+def write_report(issue_dict, stream, verbose=False, cache=fragment_cache):
+    """
+    Writes the markdown report for an issue dictionary to a text stream, fragment by fragment.
+    """
+    for fragment in iter_report(issue_dict, verbose, cache):
+        stream.write(fragment)
+
+
+def render_report(issue_dict, verbose=False, cache=fragment_cache):
+    """
+    Returns the markdown report for an issue dictionary as a string.
+    """
+    stream = io.StringIO()
+    write_report(issue_dict, stream, verbose, cache)
+    return stream.getvalue()
@@ -1,5 +1,8 @@
 import requests
+import copy
 import os
+import threading
+import time
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 
@@ -15,6 +18,36 @@ BASE_URLS = {
 # Default timeout
 TIMEOUT = int(os.getenv("DEFAULT_TIMEOUT", 10))
 
+# Maximum number of requests per second sent through `session`, shared by all threads (0 for no limit)
+RATE_LIMIT = float(os.getenv("MATE_RATE_LIMIT", 0))
+
+
+class RateLimitedAdapter(HTTPAdapter):
+
+    """
+    An HTTPAdapter that spaces the requests it sends at least 1/rate seconds apart, across threads.
+    Retries are made inside a request, and are not spaced.
+
+    Parameters:
+    - rate (float): the maximum number of requests per second, or 0 for no limit.
+    """
+
+    def __init__(self, rate=0, **kwargs):
+        super().__init__(**kwargs)
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def send(self, request, **kwargs):
+        if self.rate > 0:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._next - now
+                self._next = max(now, self._next) + 1 / self.rate
+            if wait > 0:
+                time.sleep(wait)
+        return super().send(request, **kwargs)
+
 # Initialize a requests session
 session = requests.Session()
 
@@ -27,10 +60,30 @@ retry_strategy = Retry(
     allowed_methods=["HEAD", "GET", "OPTIONS"],  # Use `allowed_methods` for urllib3 v1.26.0 or later
     backoff_factor=1  # Defines the delay between retries
 )
-adapter = HTTPAdapter(max_retries=retry_strategy)
+#one adapter for both schemes, so the rate limit is shared
+adapter = RateLimitedAdapter(rate=RATE_LIMIT, max_retries=retry_strategy)
 session.mount("http://", adapter)
 session.mount("https://", adapter)
 
+#records fetched by get_record, when enabled with enable_record_cache (e.g. to share lookups between issues)
+record_cache = None
+
+
+def set_rate_limit(rate):
+    """
+    Sets the maximum number of requests per second sent through `session` (0 for no limit).
+    """
+    adapter.rate = rate
+
+
+def enable_record_cache():
+    """
+    Keeps the records fetched by get_record for the rest of the process, so each is only fetched once.
+    """
+    global record_cache
+    if record_cache is None:
+        record_cache = {}
+
 def get_record(record_type, record_id):
     log = ""
     metadata = {}
@@ -39,6 +92,8 @@ def get_record(record_type, record_id):
         raise ValueError(f"Record type `{record_type}` not supported")
 
     url = BASE_URLS[record_type] + record_id
+    if record_cache is not None and url in record_cache:
+        return copy.deepcopy(record_cache[url]), log
     print(url)
 
     # Define content types to try
@@ -54,6 +109,8 @@ def get_record(record_type, record_id):
             # If the response is successful and contains content, parse and return the metadata
             if response.content:
                 metadata = response.json()
+                if record_cache is not None:
+                    record_cache[url] = copy.deepcopy(metadata)
                 return metadata, log  # Successful fetch, return immediately
 
         except requests.exceptions.RequestException as e:
@@ -82,7 +139,7 @@ def search_organization(org_url):
     headers = {"Content-Type": "application/json"}
 
     try:
-        response = requests.get(url, headers=headers)
+        response = session.get(url, headers=headers, timeout=TIMEOUT)
         response.raise_for_status()  # Raise an exception for HTTP errors
 
         result = response.json()
@@ -110,7 +167,7 @@ def search_organization(org_url):
 
 def check_uri(uri):
     try:
-        response = requests.get(uri)
+        response = session.get(uri, timeout=TIMEOUT)
         response.raise_for_status()  # Raise an exception for HTTP errors
 
         return "OK"
@@ -122,6 +179,11 @@ def check_uri(uri):
 
 
 def download_license_text(url):
+    #license texts are shipped in the resource bundle when it was built with network access
+    from resource_bundle import load_bundle
+    text = load_bundle().license_text(url)
+    if text is not None:
+        return text
     try:
         response = requests.get(url)
         if response.status_code == 200:
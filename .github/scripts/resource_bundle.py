@@ -0,0 +1,251 @@
+import csv
+import hashlib
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+from functools import lru_cache
+
+
+RESOURCES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "resources")
+BUNDLE_FILE = "resources.bundle"
+
+#bump when the layout of the index changes; bundles of another version are rebuilt in memory
+BUNDLE_VERSION = 1
+_MAGIC = b"MATEBNDL"
+#magic, version, length of the JSON index
+_HEADER = struct.Struct(">8sIQ")
+
+LICENSES_CSV = "licenses.csv"
+FOR_CODES_CSV = "for_codes.csv"
+#source files stored whole in the bundle (the JSON-LD contexts served by jsonld_loader)
+FILES = ("rocrate_context.jsonld", "codemeta_context.jsonld")
+
+
+def _sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def source_hashes(resources_dir=RESOURCES_DIR):
+    """
+    Returns the sha256 of each source file of the bundle, as recorded in (and checked against) its index.
+    """
+    return {name: _sha256(os.path.join(resources_dir, name)) for name in (LICENSES_CSV, FOR_CODES_CSV) + FILES}
+
+
+def _read_csv(path):
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def for_code_children(codes):
+    """
+    Builds the prefix tree of FoR codes: 2-digit divisions, 4-digit groups and 6-digit fields.
+
+    Returns:
+    - dict: maps each code to the list of its child codes, in order. The key "" holds the divisions.
+    """
+    children = {"": []}
+    for code in codes:
+        parent = code[:-2] if len(code) > 2 else ""
+        children.setdefault(parent, []).append(code)
+        children.setdefault(code, [])
+    return children
+
+
+def build_bundle(resources_dir=RESOURCES_DIR, license_texts=None):
+
+    """
+    Compiles the resource files into a bundle.
+
+    The bundle is a header, a JSON index and a blob area:
+    - the index holds the license table (by license identifier), the FoR codes (by code) with their prefix tree,
+      the sha256 of every source file, and the offset and length of each blob;
+    - the blobs are the JSON-LD context files and the license texts, read only when asked for.
+
+    Parameters:
+    - resources_dir (str, optional): the directory holding the source files.
+    - license_texts (dict, optional): maps license text URLs to their text.
+
+    Returns:
+    - bytes: the bundle.
+    """
+
+    licenses = {row["license"]: row for row in _read_csv(os.path.join(resources_dir, LICENSES_CSV))}
+    for_codes = {row["code"]: row["name"] for row in _read_csv(os.path.join(resources_dir, FOR_CODES_CSV))}
+
+    blobs = {}
+    data = io.BytesIO()
+    def add_blob(key, content):
+        blobs[key] = [data.tell(), len(content)]
+        data.write(content)
+
+    for name in FILES:
+        with open(os.path.join(resources_dir, name), "rb") as f:
+            add_blob("files/" + name, f.read())
+    for url, text in sorted((license_texts or {}).items()):
+        add_blob("license_texts/" + url, text.encode("utf-8"))
+
+    index = {
+        "version": BUNDLE_VERSION,
+        "sources": source_hashes(resources_dir),
+        "licenses": licenses,
+        "for_codes": for_codes,
+        "for_children": for_code_children(for_codes),
+        "blobs": blobs,
+    }
+    index_bytes = json.dumps(index, ensure_ascii=False, separators=(',', ':')).encode("utf-8")
+    return _HEADER.pack(_MAGIC, BUNDLE_VERSION, len(index_bytes)) + index_bytes + data.getvalue()
+
+
+class ResourceBundle:
+
+    """
+    Read access to a compiled resource bundle (see build_bundle).
+
+    The index is parsed once, on load. Blobs are sliced from the underlying buffer when asked for, so a bundle
+    opened from disk with open_bundle is memory-mapped and only the pages holding the index and the blobs used
+    are read.
+
+    Parameters:
+    - buffer (bytes | mmap.mmap): the bundle.
+
+    Attributes:
+    - licenses (dict): maps license identifiers (e.g. 'CC-BY-4.0') to their row of licenses.csv, a dict with the
+      keys license, name, url, text and website_path. Empty cells are empty strings.
+    - for_codes (dict): maps ANZSRC FoR codes (2, 4 or 6 digits, as strings) to their names.
+    - for_children (dict): maps each FoR code to its child codes ("" to the divisions).
+    - sources (dict): the sha256 of each source file the bundle was built from.
+    """
+
+    def __init__(self, buffer):
+        magic, version, index_length = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC:
+            raise ValueError("Not a resource bundle")
+        if version != BUNDLE_VERSION:
+            raise ValueError(f"Resource bundle version {version} is not supported (expected {BUNDLE_VERSION})")
+        self._buffer = buffer
+        self._blobs_start = _HEADER.size + index_length
+        index = json.loads(bytes(buffer[_HEADER.size:self._blobs_start]).decode("utf-8"))
+        self.version = version
+        self.sources = index["sources"]
+        self.licenses = index["licenses"]
+        self.for_codes = index["for_codes"]
+        self.for_children = index["for_children"]
+        self._blobs = index["blobs"]
+
+    def blob(self, key):
+        """
+        Returns the bytes of a blob, or None if the bundle doesn't hold it.
+        """
+        location = self._blobs.get(key)
+        if location is None:
+            return None
+        start = self._blobs_start + location[0]
+        return bytes(self._buffer[start:start + location[1]])
+
+    def file_text(self, name):
+        """
+        Returns the text of a bundled source file (e.g. 'rocrate_context.jsonld'), or None.
+        """
+        content = self.blob("files/" + name)
+        return None if content is None else content.decode("utf-8")
+
+    def license_text(self, url):
+        """
+        Returns the bundled license text downloaded from url (a `text` URL of licenses.csv), or None.
+        """
+        content = self.blob("license_texts/" + url.strip())
+        return None if content is None else content.decode("utf-8")
+
+    def is_current(self, resources_dir=RESOURCES_DIR):
+        """
+        Returns True if the source files are unchanged since the bundle was built.
+        """
+        return self.sources == source_hashes(resources_dir)
+
+
+def open_bundle(path):
+    """
+    Opens a bundle file, memory-mapped (or read whole, if the file can't be mapped).
+    """
+    with open(path, "rb") as f:
+        try:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            buffer = f.read()
+    return ResourceBundle(buffer)
+
+
+@lru_cache(maxsize=1)
+def load_bundle(resources_dir=RESOURCES_DIR):
+    """
+    Returns the resource bundle, loaded once per process from .github/resources/resources.bundle.
+
+    If the bundle is missing, of another version, or older than its source files, a bundle is built in memory
+    from the source files instead (without license texts), so edits to the CSV files are never ignored.
+    """
+    path = os.path.join(resources_dir, BUNDLE_FILE)
+    try:
+        bundle = open_bundle(path)
+        if bundle.is_current(resources_dir):
+            return bundle
+        print(f"{BUNDLE_FILE} is out of date, rebuilding it in memory. Run `python3 .github/scripts/resource_bundle.py build`.")
+    except (OSError, ValueError) as e:
+        print(f"Could not load {BUNDLE_FILE} ({e}), building it in memory.")
+    return ResourceBundle(build_bundle(resources_dir))
+
+
+def download_license_texts(licenses):
+    """
+    Downloads the text of each license of the license table. Licenses whose text can't be downloaded are skipped.
+
+    Returns:
+    - dict: maps text URLs to texts.
+    """
+    from request_utils import session, TIMEOUT
+    texts = {}
+    for row in licenses.values():
+        url = row["text"].strip()
+        if not url or url in texts:
+            continue
+        try:
+            response = session.get(url, timeout=TIMEOUT)
+            response.raise_for_status()
+            texts[url] = response.text
+        except Exception as e:
+            print(f"Could not download the {row['license']} license text from {url}: {e}")
+    return texts
+
+
+def write_bundle(resources_dir=RESOURCES_DIR, offline=False):
+    """
+    Builds .github/resources/resources.bundle, downloading the license texts unless offline.
+
+    Run with `python3 .github/scripts/resource_bundle.py build [--offline]` after changing any source file,
+    and commit the result.
+    """
+    license_texts = None
+    if not offline:
+        licenses = {row["license"]: row for row in _read_csv(os.path.join(resources_dir, LICENSES_CSV))}
+        license_texts = download_license_texts(licenses)
+    content = build_bundle(resources_dir, license_texts)
+    path = os.path.join(resources_dir, BUNDLE_FILE)
+    with open(path + ".tmp", "wb") as f:
+        f.write(content)
+    os.replace(path + ".tmp", path)
+    print(f"Wrote {path}: {len(content)} bytes, {len(license_texts or {})} license texts")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "build":
+        write_bundle(offline="--offline" in sys.argv[2:])
+    elif len(sys.argv) >= 2 and sys.argv[1] == "check":
+        current = open_bundle(os.path.join(RESOURCES_DIR, BUNDLE_FILE)).is_current()
+        print(f"{BUNDLE_FILE} is {'up to date' if current else 'out of date'}")
+        sys.exit(0 if current else 1)
+    else:
+        print("usage: resource_bundle.py build [--offline] | resource_bundle.py check")
@@ -0,0 +1,120 @@
+import json
+import os
+import sys
+from crate_graph import CrateGraph
+from crosswalks import metadata_to_dict, dict_to_yaml, dict_to_report, metadata_to_nci
+from yaml_utils import format_yaml_string
+
+
+#files of a model repository (see write_repo_contents.py)
+CRATE_FILE = "ro-crate-metadata.json"
+NESTED_CRATE_FILE = os.path.join(".metadata_trail", "ro-crate-metadata-nested.json")
+ISSUE_DICT_FILE = os.path.join(".metadata_trail", "issue_dict.json")
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def load_model(model_dir):
+
+    """
+    Loads the RO-Crate of a model repository checkout and rebuilds its issue dictionary, without network access.
+
+    The nested crate of .metadata_trail is used, or the published ro-crate-metadata.json if there is none: a
+    flattened crate merges the entities that share an '@id', and one flattened by pyld has pyld's base IRI rather
+    than ./ as its root id. The fields the crate doesn't hold are taken from .metadata_trail/issue_dict.json, when
+    present.
+
+    Parameters:
+    - model_dir (str): the model repository directory.
+
+    Returns:
+    - tuple: (issue dictionary, RO-Crate dictionary, log string)
+    """
+
+    log = ""
+    crate = _read_json(os.path.join(model_dir, NESTED_CRATE_FILE)) or _read_json(os.path.join(model_dir, CRATE_FILE))
+    if crate is None:
+        raise FileNotFoundError(f"No {NESTED_CRATE_FILE} or {CRATE_FILE} in {model_dir}")
+    issue_dict = _read_json(os.path.join(model_dir, ISSUE_DICT_FILE))
+    if issue_dict is None:
+        log += f"Warning: no {ISSUE_DICT_FILE}, fields not held in the RO-Crate are left empty. \n"
+    return metadata_to_dict(crate, issue_dict), crate, log
+
+
+def regenerate(model_dir, out_dir):
+    """
+    Rebuilds the website index.md, the README report and the NCI/ISO CSV of a model into out_dir, offline.
+    The index.md date is the crate's datePublished, so an unchanged crate gives an unchanged file.
+    """
+    issue_dict, crate, log = load_model(model_dir)
+    timestamp = (CrateGraph(crate).root or {}).get("datePublished", False)
+    outputs = {
+        "index.md": format_yaml_string(dict_to_yaml(issue_dict, timestamp=timestamp)),
+        "README.md": dict_to_report(issue_dict, verbose=True),
+        "nci_iso.csv": metadata_to_nci(crate),
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    for name, content in outputs.items():
+        with open(os.path.join(out_dir, name), "w") as f:
+            f.write(content)
+    return log
+
+
+def check_round_trip(issue_dict, timestamp="2000-01-01T00:00:00.000Z"):
+
+    """
+    Checks that an issue dictionary survives the crosswalks: it is converted to an RO-Crate (nested, and
+    flattened), and read back from each with metadata_to_dict, with the issue dictionary as the metadata trail.
+    The website index.md of each rebuilt dictionary must be that of the original.
+
+    Each crate is also read back without a metadata trail (a model repository without issue_dict.json), and the
+    index.md and README report of the rebuilt dictionary must render. They are not compared: without the trail,
+    a flattened crate can't tell apart the entities it merged under one '@id'.
+
+    Parameters:
+    - issue_dict (dict): the issue dictionary.
+    - timestamp (str, optional): the datePublished of the crate and the date of the page.
+
+    Returns:
+    - list: a description of each difference; empty if the round trip is exact.
+    """
+
+    from crosswalks import dict_to_metadata
+    from crate_flatten import flatten_compact
+    import difflib
+
+    expected = format_yaml_string(dict_to_yaml(issue_dict, timestamp=timestamp))
+    nested = json.loads(dict_to_metadata(issue_dict, flat_compact_crate=False, timestamp=timestamp))
+    problems = []
+    for name, crate in (("nested", nested), ("flattened", flatten_compact(nested))):
+        rebuilt = format_yaml_string(dict_to_yaml(metadata_to_dict(crate, issue_dict), timestamp=timestamp))
+        if rebuilt != expected:
+            diff = difflib.unified_diff(expected.splitlines(), rebuilt.splitlines(), "issue_dict", name, lineterm="", n=0)
+            problems.append(f"index.md rebuilt from the {name} crate differs:\n" + "\n".join(diff))
+        try:
+            crate_only = metadata_to_dict(crate)
+            format_yaml_string(dict_to_yaml(crate_only, timestamp=timestamp))
+            dict_to_report(crate_only, verbose=True)
+        except Exception as err:
+            problems.append(f"the {name} crate can't be read without a metadata trail: {type(err).__name__}: {err}")
+    return problems
+
+
+if __name__ == "__main__":
+    #python3 .github/scripts/reverse_crosswalk.py <model repository directory> <output directory>
+    #python3 .github/scripts/reverse_crosswalk.py check <issue_dict.json>
+    if len(sys.argv) == 3 and sys.argv[1] == "check":
+        with open(sys.argv[2]) as f:
+            problems = check_round_trip(json.load(f))
+        print("".join(p + "\n" for p in problems) or "round trip ok\n", end="")
+        sys.exit(1 if problems else 0)
+    if len(sys.argv) != 3:
+        print("usage: reverse_crosswalk.py MODEL_DIR OUT_DIR | reverse_crosswalk.py check ISSUE_DICT_JSON")
+        sys.exit(2)
+    print(regenerate(sys.argv[1], sys.argv[2]), end="")
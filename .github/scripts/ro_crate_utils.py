@@ -1,4 +1,5 @@
 import requests
+import os
 import string
 import json
 import random
@@ -6,7 +7,11 @@ from config import *
 import re
 import glob
 from collections.abc import MutableMapping
-from fuzzywuzzy import fuzz, process
+from person_index import PersonIndex
+from crosswalk_engine import crate_plan, entity_rules, apply_entity_rules
+from crate_graph import CrateGraph, BLANK_ID_MODE, content_hash, new_allocator
+import template_store
+import jsonld_loader
 
 
 def recursively_filter_key(obj, entity_template):
@@ -53,6 +58,53 @@ def recursively_filter_key(obj, entity_template):
 
 
 
+def compile_entity_template(entity_template):
+
+    """
+    Compiles an entity template (as returned by load_entity_template) into a lookup table of allowed keys.
+
+    Parameters:
+    entity_template (dict): maps '@type' values to lists of keys to retain. If None, nothing is filtered.
+
+    Returns:
+    dict: maps each '@type' to a frozenset of the keys to retain, for use with filtered_copy.
+    """
+    if not entity_template:
+        return {}
+    return {entity_type: frozenset(keys) for entity_type, keys in entity_template.items()}
+
+
+def filtered_copy(obj, type_keys):
+
+    """
+    Returns a filtered deep copy of a nested data structure (dictionaries, lists, tuples).
+
+    This is the single-pass equivalent of copy.deepcopy followed by recursively_filter_key: dictionaries
+    whose '@type' appears in type_keys are copied with only the allowed keys, so discarded sub-trees are
+    never copied. Other dictionaries are copied with all their keys, lists and tuples are copied as the same
+    type, and all other values are shared with the input.
+
+    Parameters:
+    obj (dict | list | tuple): The nested data structure to be copied.
+    type_keys (dict): maps '@type' values to the set of keys to retain, as built by compile_entity_template.
+
+    Returns:
+    dict | list | tuple: the filtered copy. The input is not modified.
+    """
+
+    if isinstance(obj, dict):
+        entity_type = obj.get('@type')
+        allowed = type_keys.get(entity_type) if isinstance(entity_type, str) else None
+        if allowed is None:
+            return {k: filtered_copy(v, type_keys) for k, v in obj.items()}
+        return {k: filtered_copy(v, type_keys) for k, v in obj.items() if k in allowed}
+    if isinstance(obj, list):
+        return [filtered_copy(v, type_keys) for v in obj]
+    if isinstance(obj, tuple):
+        return tuple(filtered_copy(v, type_keys) for v in obj)
+    return obj
+
+
 def get_random_string(length=9):
     """
     Generates a random string of characters, with a hash prepended,
@@ -100,7 +152,8 @@ def replace_blank_null_id(entity):
 
     1. If 'uri' key exists in the entity, its value is used.
     2. If 'url' key exists, its value is used.
-    3. If neither 'uri' nor 'url' is present, a randomly generated string is assigned.
+    3. If neither 'uri' nor 'url' is present, a randomly generated string is assigned,
+       or, if crate_graph.BLANK_ID_MODE is 'content', an id derived from a hash of the entity's content.
 
     Args:
         entity (dict): The dictionary representing an RO-Crate entity.
@@ -111,7 +164,10 @@ def replace_blank_null_id(entity):
     Note:
         The function modifies the 'entity' dictionary in-place and also returns it.
     """
-    replace_string = get_random_string()
+    if BLANK_ID_MODE == 'content':
+        replace_string = '#' + content_hash(entity)[:12]
+    else:
+        replace_string = get_random_string()
 
     if 'uri' in entity.keys():
         replace_string =entity['uri']
@@ -161,7 +217,7 @@ def search_replace_blank_node_ids(crate, graph_index):
             crate['@graph'][graph_index][key] = entity
 
 
-def search_replace_sub_dict(crate, graph_index):
+def search_replace_sub_dict(crate, graph_index, crate_graph=None):
 
     """
     Extracts a nested entity from within an RO-Crate's entity and relocates it to the top level of the
@@ -177,6 +233,8 @@ def search_replace_sub_dict(crate, graph_index):
     Args:
         ro_crate (dict): The RO-Crate object, represented as a python dictionary.
         graph_index (int): The index of the entity in the '@graph' array to be examined for nested entities.
+        crate_graph (CrateGraph, optional): an index of the crate's '@graph', reused across calls (see
+            flatten_crate). Built from the crate if not given.
 
     Returns:
         None: The function modifies the ro_crate object in-place, relocating nested entities and updating references.
@@ -186,10 +244,13 @@ def search_replace_sub_dict(crate, graph_index):
     #grab the entity out of the crate as a dictionary
     json_dict = crate['@graph'][graph_index]
 
-    for key in json_dict.keys():
+    #index of the top-level @ids, kept up to date as nested entities are appended
+    if crate_graph is None:
+        crate_graph = CrateGraph(crate)
+    current_ids = crate_graph.ids()
 
+    for key in json_dict.keys():
 
-        current_ids = top_level_id(crate)
         if isinstance(json_dict[key], dict):
             try:
                 at_id = json_dict[key]['@id']
@@ -199,7 +260,7 @@ def search_replace_sub_dict(crate, graph_index):
             if len(json_dict[key].keys()) > 1:
                 if at_id not in current_ids:
                     #dict() is necessary to make a copy not a reference
-                    crate['@graph'].append(dict(json_dict[key]))
+                    crate_graph.append(dict(json_dict[key]))
 
                 #replace local dict with @id
                 [json_dict[key].pop(k) for k in list(json_dict[key].keys()) if k != '@id']
@@ -221,7 +282,7 @@ def search_replace_sub_dict(crate, graph_index):
                     if len(json_dict[key][j].keys()) > 1:
                         if at_id not in current_ids:
                             #the dict() is necessary to make a copy not a reference
-                            crate['@graph'].append(dict(json_dict[key][j]))
+                            crate_graph.append(dict(json_dict[key][j]))
                     #replace local dict with @id
                     [json_dict[key][j].pop(k) for k in list(json_dict[key][j].keys()) if k != '@id']
 
@@ -298,13 +359,6 @@ def apply_entity_mapping_extended(metadata, mapping, issue_dict, graph_index):
     None: The function updates the metadata in place and does not return a value.
     """
 
-    def get_nested_value(d, key):
-        """Accesses a nested value in a dictionary using a dot-separated key."""
-        keys = key.split('.')
-        for k in keys:
-            d = d.get(k, {})
-        return d if d else None
-
     # Validate metadata structure and graph_index
     if '@graph' not in metadata or not isinstance(metadata['@graph'], list):
         print("Warning: The provided metadata must contain an '@graph' key with a list of entities.")
@@ -313,22 +367,8 @@ def apply_entity_mapping_extended(metadata, mapping, issue_dict, graph_index):
         print(f"Warning: graph_index {graph_index} is out of range for the metadata's '@graph' array.")
         return
 
-    # Iterate over the mapping and apply updates where possible
-    for target_key, issue_keys in mapping.items():
-        if issue_keys is None:
-            # Skip mapping if issue_keys is None
-            continue
-
-        if isinstance(issue_keys, list):
-            # Handle list of keys - collect corresponding values from issue_dict, supporting nested keys
-            values = [get_nested_value(issue_dict, key) for key in issue_keys if get_nested_value(issue_dict, key) is not None]
-            if values:
-                metadata['@graph'][graph_index][target_key] = values
-        else:
-            # Handle single or nested key
-            value = get_nested_value(issue_dict, issue_keys)
-            if value is not None:
-                metadata['@graph'][graph_index][target_key] = value
+    # Apply the (compiled and cached) mapping rules, skipping entries mapped to None
+    apply_entity_rules(metadata['@graph'][graph_index], entity_rules(mapping), issue_dict)
 
 
 
@@ -359,131 +399,83 @@ def dict_to_ro_crate_mapping(crate, issue_dict,  mapping_list):
     ##Apply mapping
     ####################
 
-    #loop through the dictionaries in the mappign list
-    #each provides a mapping between the issue_dict and a particular entitity in the R0-crate
-    for i, mapping in enumerate(mapping_list):
-        if '@id' in mapping.keys():
-            #get the value corresponding to the @id key
-            entity_val = mapping['@id']
-            #now search the correspoding entity by looping through the entities in the RO-Crate @graph array
-            for j, entity in enumerate(crate['@graph']):
-                if entity['@id'] == entity_val:
-                    #once found apply the mapping
-                    apply_entity_mapping_extended(crate, mapping, issue_dict, graph_index=j)
-        else:
-            pass
+    #the mapping list is compiled once into a cached plan; the @graph array is indexed once per call
+    crate_plan(mapping_list).apply(crate, issue_dict)
 
 
 
-def load_crate_template(metadata_template_url="https://raw.githubusercontent.com/ModelAtlasofTheEarth/metadata_schema/main/mate_ro_crate/ro-crate-metadata.json"):
+def load_crate_template(metadata_template_url=None):
 
     """
-    Downloads the M@TE RO-Crate metadata template from a specified URL and returns it as a dictionary.
+    Loads the M@TE RO-Crate metadata template and returns it as a dictionary.
+
+    The template is downloaded at most once per process (and revalidated against an on-disk cache),
+    or read from the pinned snapshot in .github/resources/templates; see template_store.TemplateStore.
+    Each call returns a fresh copy that can be modified freely.
 
     Parameters:
-    - metadata_template_url (str): URL to the JSON-LD metadata template.
+    - metadata_template_url (str): URL to the JSON-LD metadata template. Defaults to the
+      ro-crate-metadata.json of the metadata_schema repository at template_store.default_ref().
 
     Returns:
     - dict: The loaded metadata template as a dictionary, or None if an error occurs.
     """
 
+    if metadata_template_url is None:
+        metadata_template_url = template_store.template_url(template_store.CRATE_TEMPLATE)
     try:
-        response = requests.get(metadata_template_url)
-        response.raise_for_status()  # Raises an HTTPError if the HTTP request returned an unsuccessful status code
-        crate = json.loads(response.text)
-        print("JSON-LD data loaded successfully.")
-        return crate
-    except requests.exceptions.RequestException as e:
+        return template_store.store.get(metadata_template_url)
+    except (requests.exceptions.RequestException, OSError, ValueError) as e:
         print(f"Failed to download the file. Error: {e}")
         return None
 
 
 
-def load_entity_template(entity_template_url="https://raw.githubusercontent.com/ModelAtlasofTheEarth/metadata_schema/main/mate_ro_crate/type_templates.json"):
+def load_entity_template(entity_template_url=None):
     """
-    Downloads a JSON-LD entity template from the specified URL and returns it as a dictionary.
+    Loads the M@TE JSON-LD entity (type) template and returns it as a dictionary.
+
+    Cached in the same way as load_crate_template.
 
     Parameters:
-    - entity_template_url (str): URL to the JSON-LD entity template.
+    - entity_template_url (str): URL to the JSON-LD entity template. Defaults to the
+      type_templates.json of the metadata_schema repository at template_store.default_ref().
 
     Returns:
     - dict: The loaded entity template as a dictionary, or None if an error occurs.
     """
 
+    if entity_template_url is None:
+        entity_template_url = template_store.template_url(template_store.ENTITY_TEMPLATE)
     try:
-        response = requests.get(entity_template_url)
-        response.raise_for_status()  # Raises an HTTPError for bad HTTP responses
-        entity_template = json.loads(response.text)
-        print("JSON-LD data loaded successfully.")
-        return entity_template
-    except requests.exceptions.RequestException as e:
+        return template_store.store.get(entity_template_url)
+    except (requests.exceptions.RequestException, OSError, ValueError) as e:
         print(f"Failed to download the file. Error: {e}")
         return None
 
 
-def get_next_id(existing_ids):
+def update_blank_node_ids(ro_crate, allocator=None):
     """
-    Generates the next unique ID based on the highest existing ID found.
-    """
-    if not existing_ids:
-        return '#b1'  # Start from 1 if no IDs found yet
-    max_id = max(existing_ids)
-    next_id = max_id + 1
-    return f'#b{next_id}'
-
-def update_ids(entity, pattern, existing_ids):
-    """
-    Recursively updates '@id' fields in an entity if they are not valid or missing,
-    ensuring not to overwrite valid existing '@id' values and generating unique IDs.
-    """
-    if isinstance(entity, dict):
-        # If '@id' exists, check if it's valid
-        if '@id' in entity:
-            if isinstance(entity['@id'], str) and pattern.match(entity['@id']):
-                # Extract number from existing valid ID and update the set of IDs
-                num = int(pattern.findall(entity['@id'])[0])
-                existing_ids.add(num)
-            elif not entity['@id']:  # Check if @id is empty
-                # Assign a new unique ID
-                new_id = get_next_id(existing_ids)
-                entity['@id'] = new_id
-                existing_ids.add(int(pattern.findall(new_id)[0]))
-        else:
-            # No '@id' field present, create a new one
-            new_id = get_next_id(existing_ids)
-            entity['@id'] = new_id
-            existing_ids.add(int(pattern.findall(new_id)[0]))
+    Traverse the '@graph' in an RO-Crate JSON-LD document and give every entity with a missing or empty
+    '@id' a new id, respecting existing valid '@id' and ensuring no duplicates.
 
-        # Recursively process other dictionary values
-        for key, value in entity.items():
-            update_ids(value, pattern, existing_ids)
+    The graph is walked once: existing ids are collected and the entities that need an id are assigned one
+    from the allocator. By default this is a new allocator for crate_graph.BLANK_ID_MODE: '#bN' blank node ids
+    above every existing '#bN' id, or content-derived ids in 'content' mode.
 
-    elif isinstance(entity, list):
-        # Process each item in the list recursively
-        for item in entity:
-            update_ids(item, pattern, existing_ids)
+    Args:
+        ro_crate (dict): the RO-Crate, modified in place.
+        allocator (BlankNodeAllocator | ContentIdAllocator, optional): an allocator shared with other crate builders.
 
-def update_blank_node_ids(ro_crate):
-    """
-    Traverse the '@graph' in an RO-Crate JSON-LD document and recursively update blank node IDs,
-    respecting existing valid '@id' and ensuring no duplicates.
+    Returns:
+        dict: the RO-Crate.
     """
     if '@graph' not in ro_crate:
         return ro_crate
 
-    pattern = re.compile(r'^#b(\d+)$')
-    existing_ids = set()
-
-    # First collect all valid existing IDs
-    for entity in ro_crate['@graph']:
-        update_ids(entity, pattern, existing_ids)
-
-    # Reset existing IDs to handle updates properly
-    existing_ids.clear()
-
-    # Now update invalid or missing IDs
-    for entity in ro_crate['@graph']:
-        update_ids(entity, pattern, existing_ids)
+    if allocator is None:
+        allocator = new_allocator()
+    allocator.assign(ro_crate['@graph'])
 
     return ro_crate
 
@@ -517,6 +509,8 @@ def flatten_crate(crate):
     crate = update_blank_node_ids(crate)
 
     try:
+        #one index for the whole pass: search_replace_sub_dict appends through it, so it stays current
+        crate_graph = CrateGraph(crate)
         current_length = len(crate['@graph'])
         previous_length = current_length - 1
 
@@ -527,7 +521,7 @@ def flatten_crate(crate):
             for i in range(current_length):
                 # Apply the two functions to each entity in the '@graph'
                 #search_replace_blank_node_ids(crate, i)
-                search_replace_sub_dict(crate, i)
+                search_replace_sub_dict(crate, i, crate_graph)
 
             # Update the current length after modifications
             current_length = len(crate['@graph'])
@@ -542,26 +536,21 @@ def flatten_crate(crate):
 
 
 def find_index_by_id(ro_crate, id_value):
+    """
+    Returns the index of the entity with '@id' == id_value in the crate's '@graph' array.
+
+    This builds a CrateGraph on every call; where several lookups are needed, build a CrateGraph
+    once and use CrateGraph.get / CrateGraph.index_of instead.
+    """
     list_of_dicts = ro_crate['@graph']
     # Check if the first parameter is a list
     if not isinstance(list_of_dicts, list):
         return "Error: The first parameter must be a list of dictionaries."
 
-    # Check if the list contains dictionaries
-    for item in list_of_dicts:
-        if not isinstance(item, dict):
-            return "Error: All items in the list must be dictionaries."
-
-    for index, dictionary in enumerate(list_of_dicts):
-        # Check if '@id' key exists in the dictionary
-        if '@id' in dictionary:
-            if dictionary['@id'] == id_value:
-                return index
-        else:
-            return "Error: One or more dictionaries in the list do not contain an '@id' key."
-
-    # If the loop completes without returning, the id_value was not found
-    return f"Warning: No dictionary found with '@id' value '{id_value}'."
+    index = CrateGraph(list_of_dicts).index_of(id_value)
+    if index is None:
+        return f"Warning: No dictionary found with '@id' value '{id_value}'."
+    return index
 
 
 
@@ -611,10 +600,13 @@ def defaults_and_customise_ro_crate(issue_dict, ro_crate, timestamp=False):
     In some cases it may be easier to apply these here. Examples are the isPartOf of puiblisher fields
     """
 
+    #index the @graph array once for all of the lookups below
+    crate_graph = CrateGraph(ro_crate)
+
     #add some default parts of the record
-    root_index = find_index_by_id(ro_crate, './')
-    ro_crate['@graph'][root_index]['isPartOf'].append(MATE_DOI)
-    ro_crate['@graph'][root_index]['publisher'] = [AUSCOPE_RECORD, NCI_RECORD]
+    root_entity = crate_graph.root
+    root_entity['isPartOf'].append(MATE_DOI)
+    root_entity['publisher'] = [AUSCOPE_RECORD, NCI_RECORD]
     #add the mate.science url for this model
     #the logic is that the metadata captures all of the access points:
     # the root identifier is the doi that points to the geonetwork record
@@ -622,18 +614,16 @@ def defaults_and_customise_ro_crate(issue_dict, ro_crate, timestamp=False):
     # the model_outputs/model_outputs url is the thredds URL
     mate_science_url = MATE_WEBSITE + 'models/{}/'
     mate_gh_url = MATE_GITHUB + '{}/'
-    slug = ro_crate['@graph'][root_index]['alternateName']
-    ro_crate['@graph'][root_index]['url'] = [mate_science_url.format(slug), mate_gh_url.format(slug)]
+    slug = root_entity['alternateName']
+    root_entity['url'] = [mate_science_url.format(slug), mate_gh_url.format(slug)]
     thredds_string = MATE_THREDDS_BASE.format(slug)
-    roc_index = find_index_by_id(ro_crate, 'model_output_data')
-    ro_crate['@graph'][roc_index]['url'] = thredds_string
-    roc_index = find_index_by_id(ro_crate, 'model_code_inputs')
-    ro_crate['@graph'][roc_index]['url'] = thredds_string
+    crate_graph['model_output_data']['url'] = thredds_string
+    crate_graph['model_code_inputs']['url'] = thredds_string
 
 
     #add date time as the date published ro-crate
     if timestamp:
-        ro_crate['@graph'][root_index]["datePublished"] = timestamp
+        root_entity["datePublished"] = timestamp
 
     #add any custom text, such as ["model_setup_description"]
 
@@ -673,8 +663,9 @@ def get_default_contexts(context_urls=[
 
     Loads JSON-LD contexts from specified URLs or local files as a fallback.
 
-    Attempts to fetch context data from each URL provided. If fetching fails,
-    it falls back to loading context JSON files from local directories. The contexts
+    Contexts are loaded through jsonld_loader.document_loader, which serves the contexts
+    bundled in .github/resources without using the network and caches any other URL.
+    If none can be loaded, it falls back to loading all the bundled context files. The contexts
     are merged into a single dictionary.
 
     Args:
@@ -691,32 +682,24 @@ def get_default_contexts(context_urls=[
 
     """
 
-    # Define paths for local testing and GitHub workflow
-    try:
-        directory_path = "../.github/resources"
-        local_paths = glob.glob(f'{directory_path}/*context.jsonld')
-        #local_paths = glob.glob(f'{directory_path}/rocrate_context.jsonld')
-    except:
-        directory_path = ".github/resources"
-        local_paths = glob.glob(f'{directory_path}/*context.jsonld')
-        #local_paths = glob.glob(f'{directory_path}/rocrate_context.jsonld')
+    # Bundled context files, found relative to this module rather than the working directory
+    local_paths = sorted(glob.glob(os.path.join(jsonld_loader.RESOURCES_DIR, '*context.jsonld')))
 
     context_list = []
 
-    # Attempt to load contexts from URLs
+    # Load contexts through the caching document loader: bundled contexts are read from
+    # .github/resources, any other URL is fetched once and cached
     for url in context_urls:
         try:
-            response = requests.get(url)
-            response.raise_for_status()  # Raises an HTTPError for bad requests
-            context = response.json()
+            context = template_store.copy_json(jsonld_loader.document_loader.document(url))
             context_list.append(context)
             if verbose:
-                print(f"Loaded context from URL: {url}")
-        except requests.exceptions.RequestException as e:
+                print(f"Loaded context for URL: {url}")
+        except Exception as e:
             if verbose:
                 print(f"Failed to load context from URL {url}: {e}")
 
-    # If no contexts loaded from URLs, fallback to local files
+    # If no contexts could be loaded, fallback to all local files
     if not context_list:
         for filepath in local_paths:
             try:
@@ -767,45 +750,35 @@ def replace_keys_recursive(obj):
 
 
 
-def collect_person_ids(data, person_records):
+def collect_person_ids(data, person_index):
     """
-    Recursively collects Person records with @id and stores them in person_records.
+    Collects Person records with @id into a person reconciliation index.
 
     Args:
         data: The input data structure (dict or list) to traverse.
-        person_records: A dictionary to store the collected Person records.
+        person_index: The PersonIndex to add the Person records to.
     """
-    if isinstance(data, list):
-        for item in data:
-            collect_person_ids(item, person_records)
-    elif isinstance(data, MutableMapping):
-        if data.get('@type') == 'Person' and '@id' in data:
-            key = f"{data.get('givenName')} {data.get('familyName')}"
-            if key not in person_records:
-                person_records[key] = data.get('@id')
-        for value in data.values():
-            collect_person_ids(value, person_records)
+    person_index.collect(data)
 
-def assign_missing_ids(data, person_records, threshold=80):
+def assign_missing_ids(data, person_index):
     """
-    Recursively assigns missing @id to Person records using fuzzy matching.
+    Assigns missing @id to Person records by matching their names against a person reconciliation index.
 
     Args:
         data: The input data structure (dict or list) to traverse.
-        person_records: A dictionary of collected Person records with their @id.
-        threshold: The minimum similarity score for fuzzy matching (default is 80).
-    """
-    if isinstance(data, list):
-        for item in data:
-            assign_missing_ids(item, person_records, threshold)
-    elif isinstance(data, MutableMapping):
-        if data.get('@type') == 'Person' and '@id' not in data:
-            key = f"{data.get('givenName')} {data.get('familyName')}"
-            best_match = process.extractOne(key, person_records.keys(), scorer=fuzz.token_sort_ratio)
-            if best_match and best_match[1] >= threshold:
-                data['@id'] = person_records[best_match[0]]
-        for value in data.values():
-            assign_missing_ids(value, person_records, threshold)
+        person_index: A PersonIndex of the Person records with their @id.
+    """
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(reversed(item))
+        elif isinstance(item, MutableMapping):
+            if item.get('@type') == 'Person' and '@id' not in item:
+                match = person_index.match(item)
+                if match:
+                    item['@id'] = match[2]
+            stack.extend(reversed(list(item.values())))
 
 def assign_ids(metadata, threshold=80):
     """
@@ -814,7 +787,11 @@ def assign_ids(metadata, threshold=80):
     Args:
         metadata: The input metadata dictionary to process.
         threshold: The minimum similarity score for fuzzy matching (default is 80).
+
+    Returns:
+        PersonIndex: the index used, whose report() lists the match decisions made.
     """
-    person_records = {}
-    collect_person_ids(metadata, person_records)
-    assign_missing_ids(metadata, person_records, threshold)
+    person_index = PersonIndex(threshold)
+    collect_person_ids(metadata, person_index)
+    assign_missing_ids(metadata, person_index)
+    return person_index
@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+import re
+import sys
+import requests
+from request_utils import session, TIMEOUT
+
+
+#the M@TE crate and entity templates live in the metadata_schema repository
+#MATE_SCHEMA_REF can be set to a branch, tag or commit SHA to select the version used,
+#otherwise the commit of the pinned snapshot is used if there is one, and main if not
+SCHEMA_REPO = "ModelAtlasofTheEarth/metadata_schema"
+SCHEMA_REF = os.getenv("MATE_SCHEMA_REF")
+TEMPLATE_BASE_URL = "https://raw.githubusercontent.com/" + SCHEMA_REPO + "/{ref}/mate_ro_crate/"
+CRATE_TEMPLATE = "ro-crate-metadata.json"
+ENTITY_TEMPLATE = "type_templates.json"
+
+#a pinned snapshot of the templates can be shipped with this repository (see `pin` below)
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "resources", "templates")
+SNAPSHOT_LOCK = "templates.lock.json"
+
+#on-disk cache of downloaded templates, revalidated with conditional requests
+CACHE_DIR = os.getenv("MATE_TEMPLATE_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "mate", "templates"))
+
+#if set, templates are only served from the snapshot/cache and the network is never used
+OFFLINE = os.getenv("MATE_TEMPLATE_OFFLINE", "").lower() in ("1", "true", "yes")
+
+_commit_sha = re.compile(r"^[0-9a-f]{40}$")
+_template_url = re.compile(r"^https://raw\.githubusercontent\.com/" + re.escape(SCHEMA_REPO) + r"/(?P<ref>[^/]+)/mate_ro_crate/(?P<name>[^/]+)$")
+
+
+def default_ref():
+    """
+    Returns the metadata_schema ref templates are loaded from: MATE_SCHEMA_REF, else the pinned snapshot commit, else main.
+    """
+    return SCHEMA_REF or store.lock.get("sha") or "main"
+
+
+def template_url(name, ref=None):
+    """
+    Returns the raw.githubusercontent.com URL of a metadata_schema template at the given ref (default: default_ref()).
+    """
+    return TEMPLATE_BASE_URL.format(ref=ref or default_ref()) + name
+
+
+def copy_json(obj):
+    """
+    Deep copies a JSON-like structure (dicts, lists and immutable scalars).
+
+    Much cheaper than copy.deepcopy, which keeps a memo and dispatches on type for every object.
+    """
+    if isinstance(obj, dict):
+        return {k: copy_json(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [copy_json(v) for v in obj]
+    return obj
+
+
+class TemplateStore:
+
+    """
+    Loads the M@TE crate and entity templates once per process and hands out copies.
+
+    Lookup order for a template URL:
+    1. the parsed master already held in memory;
+    2. the pinned snapshot in .github/resources/templates, if the URL's ref is the pinned commit, or we are offline;
+    3. the on-disk cache: entries for a commit SHA are immutable and used as is, other entries are revalidated
+       with If-None-Match / If-Modified-Since, so an unchanged template costs a 304 response;
+    4. a fresh download through the pooled request_utils session.
+    If the network fails, the disk cache and then the snapshot are used as fallbacks.
+
+    Parameters:
+    - cache_dir (str): directory for the on-disk cache, or None to disable it.
+    - snapshot_dir (str): directory holding the pinned snapshot and its lock file.
+    - offline (bool): never use the network.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, snapshot_dir=SNAPSHOT_DIR, offline=OFFLINE):
+        self.cache_dir = cache_dir
+        self.snapshot_dir = snapshot_dir
+        self.offline = offline
+        self._masters = {}
+        self._lock = None
+
+    def get(self, url):
+        """
+        Returns a private deep copy of the parsed template at url. Raises an exception if it cannot be loaded.
+        """
+        if url not in self._masters:
+            self._masters[url] = self._load(url)
+        return copy_json(self._masters[url])
+
+    def clear(self):
+        """
+        Drops the parsed templates held in memory (the disk cache is kept).
+        """
+        self._masters.clear()
+
+    def _load(self, url):
+        match = _template_url.match(url)
+        ref = match.group("ref") if match else None
+        name = match.group("name") if match else None
+
+        snapshot = self._read_snapshot(name) if name else None
+        if snapshot is not None and (self.offline or ref == self.lock.get("sha")):
+            return snapshot
+
+        cached = self._read_cache(url)
+        if cached is not None and (self.offline or (ref and _commit_sha.match(ref))):
+            return json.loads(cached["body"])
+
+        if self.offline:
+            raise FileNotFoundError(f"Template {url} is not available offline")
+
+        try:
+            headers = {}
+            if cached is not None:
+                if cached.get("etag"):
+                    headers["If-None-Match"] = cached["etag"]
+                if cached.get("last_modified"):
+                    headers["If-Modified-Since"] = cached["last_modified"]
+            response = session.get(url, headers=headers, timeout=TIMEOUT)
+            if response.status_code == 304 and cached is not None:
+                return json.loads(cached["body"])
+            response.raise_for_status()
+            template = json.loads(response.text)
+            self._write_cache(url, response)
+            return template
+        except requests.exceptions.RequestException as e:
+            if cached is not None:
+                print(f"Failed to revalidate {url}, using cached copy. Error: {e}")
+                return json.loads(cached["body"])
+            if snapshot is not None:
+                print(f"Failed to download {url}, using pinned snapshot. Error: {e}")
+                return snapshot
+            raise
+
+    @property
+    def lock(self):
+        if self._lock is None:
+            try:
+                with open(os.path.join(self.snapshot_dir, SNAPSHOT_LOCK)) as f:
+                    self._lock = json.load(f)
+            except (OSError, ValueError):
+                self._lock = {}
+        return self._lock
+
+    def _read_snapshot(self, name):
+        if name not in self.lock.get("files", {}):
+            return None
+        try:
+            with open(os.path.join(self.snapshot_dir, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _cache_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest()[:32] + ".json")
+
+    def _read_cache(self, url):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._cache_path(url)) as f:
+                entry = json.load(f)
+            return entry if entry.get("url") == url else None
+        except (OSError, ValueError):
+            return None
+
+    def _write_cache(self, url, response):
+        if not self.cache_dir:
+            return
+        entry = {"url": url,
+                 "etag": response.headers.get("ETag"),
+                 "last_modified": response.headers.get("Last-Modified"),
+                 "body": response.text}
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._cache_path(url)
+            with open(path + ".tmp", "w") as f:
+                json.dump(entry, f)
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            print(f"Could not write template cache: {e}")
+
+
+#shared store, used by ro_crate_utils.load_crate_template / load_entity_template
+store = TemplateStore()
+
+
+def resolve_commit_sha(ref):
+    """
+    Resolves a branch or tag of the metadata_schema repository to a commit SHA using the GitHub API.
+    """
+    if _commit_sha.match(ref):
+        return ref
+    headers = {"Accept": "application/vnd.github.sha"}
+    token = os.getenv("GITHUB_TOKEN")
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    response = session.get(f"https://api.github.com/repos/{SCHEMA_REPO}/commits/{ref}", headers=headers, timeout=TIMEOUT)
+    response.raise_for_status()
+    return response.text.strip()
+
+
+def pin(ref="main", snapshot_dir=SNAPSHOT_DIR):
+    """
+    Downloads the templates at the commit `ref` currently points to and writes them, with a lock file
+    recording the commit SHA, into snapshot_dir.
+
+    Run with `python3 .github/scripts/template_store.py pin [ref]` and commit the result.
+    """
+    sha = resolve_commit_sha(ref)
+    os.makedirs(snapshot_dir, exist_ok=True)
+    lock = {"repository": SCHEMA_REPO, "ref": ref, "sha": sha, "files": {}}
+    for name in (CRATE_TEMPLATE, ENTITY_TEMPLATE):
+        url = template_url(name, sha)
+        response = session.get(url, timeout=TIMEOUT)
+        response.raise_for_status()
+        template = json.loads(response.text)
+        with open(os.path.join(snapshot_dir, name), "w") as f:
+            json.dump(template, f, indent=2)
+            f.write("\n")
+        lock["files"][name] = {"url": url, "sha256": hashlib.sha256(response.content).hexdigest()}
+    with open(os.path.join(snapshot_dir, SNAPSHOT_LOCK), "w") as f:
+        json.dump(lock, f, indent=2)
+        f.write("\n")
+    print(f"Pinned {SCHEMA_REPO} templates at {sha}")
+    return lock
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "pin":
+        pin(*sys.argv[2:3])
+    else:
+        print("usage: template_store.py pin [ref]")
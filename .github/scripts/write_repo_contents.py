@@ -3,19 +3,21 @@ import re
 from github import Github, Auth
 from parse_issue import parse_issue
 from crosswalks import dict_to_metadata, dict_to_yaml, dict_to_report, metadata_to_nci
-from ro_crate_utils import replace_keys_recursive, assign_ids
+from ro_crate_utils import assign_ids
+from crate_flatten import flatten_and_compact
+from crate_validator import validate_crate
 from yaml_utils import format_yaml_string
 from request_utils import download_license_text
 from copy_files import copy_files
-from ruamel.yaml import YAML
 import io
-from io import StringIO
 import json
 from datetime import datetime
-from pyld import jsonld
-import copy
+from jsonld_loader import install_document_loader
 
 
+# serve JSON-LD contexts from the bundled resources / local cache, so pyld needs no network
+install_document_loader()
+
 # Environment variables
 token = os.environ.get("GITHUB_TOKEN")
 issue_number = int(os.environ.get("ISSUE_NUMBER"))
@@ -43,37 +45,35 @@ data, error_log = parse_issue(issue)
 # Convert dictionary to metadata json
 rocratestr_nested = dict_to_metadata(data, flat_compact_crate=False, timestamp= timestamp)
 rocratedict = json.loads(rocratestr_nested)
-default_context_list = copy.deepcopy(rocratedict['@context'])
 #patch missign ids on Person Records
-assign_ids(rocratedict['@graph'])
+person_index = assign_ids(rocratedict['@graph'])
+if person_index.decisions:
+    print(person_index.report())
 
 
 #######
 #Not sure why, but placing this block above the flatten block made a difference.
-csv_buffer = StringIO()
-#get a iso record as pandas df...
-nci_iso_record = metadata_to_nci(rocratedict)
-nci_iso_record.to_csv(csv_buffer, index=False)
-# Reset buffer position to the beginning
-csv_buffer.seek(0)
-csv_content = csv_buffer.getvalue()
+#get the iso record as a csv string
+csv_content = metadata_to_nci(rocratedict)
 model_repo.create_file(".metadata_trail/nci_iso.csv","add nci_iso record csv", csv_content)
 
-#This is modifying rocratedict in place, which was not the intention
+#flatten and compact the crate, with the native flattener and/or pyld depending on MATE_FLATTEN_MODE
+#(see crate_flatten.flatten_and_compact). rocratedict is not modified.
 try:
-
-    expanded = jsonld.expand(rocratedict)
-    flattened  = jsonld.flatten(expanded)
-    rocratedict['@graph'] = flattened
-    #this strips the @ from the @ids,
-    flatcompact = jsonld.compact(rocratedict, ctx  = default_context_list)
-    #add the @ back to type, id
-    flatcompact = replace_keys_recursive(flatcompact)
+    flatcompact = flatten_and_compact(rocratedict)
 
 except:
     #use the flattening routine we wrote
     #this is not necessary fully compacted (although we try to build compact records)
-    flatcompact = dict_to_metadata(data, flat_compact_crate=True, timestamp= timestamp)
+    flatcompact = json.loads(dict_to_metadata(data, flat_compact_crate=True, timestamp= timestamp))
+
+
+#validate the crate that is written to the model repository and log any problems
+try:
+    for warning in validate_crate(flatcompact):
+        print(warning)
+except Exception as err:
+    print(f"Unable to validate the RO-Crate. Error: {err}")
 
 
 #FOR TESTING - print out dictionary as a comment
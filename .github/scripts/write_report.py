@@ -1,7 +1,19 @@
 import os
+import sys
+import json
+from datetime import datetime, timezone
 from github import Github, Auth
 from parse_issue import parse_issue
-from crosswalks import dict_to_report
+from issue_fields import IssueFormError
+from crosswalks import dict_to_report, dict_to_metadata
+from ro_crate_utils import assign_ids
+from crate_flatten import flatten_and_compact
+from crate_validator import validate_crate, format_warnings
+from jsonld_loader import install_document_loader
+
+
+# serve JSON-LD contexts from the bundled resources / local cache, so pyld needs no network
+install_document_loader()
 
 # Environment variables
 token = os.environ.get("GITHUB_TOKEN")
@@ -20,7 +32,30 @@ if comment_id:
     comment = issue.get_comment(id = comment_id)
 
 # Parse issue
-data, error_log = parse_issue(issue)
+try:
+    data, error_log = parse_issue(issue)
+except IssueFormError as err:
+    #the issue body doesn't match the issue form (e.g. a heading was edited), so no report can be made
+    report = f"""### Model Report
+The issue could not be read: its headings or answers don't match the issue form. \n
+{err}
+Please edit the markdown file at the top of the issue to restore them, and the report will be regenerated."""
+    if comment_id:
+        comment.edit(report)
+    else:
+        issue.create_comment(report)
+    sys.exit(1)
+
+# Check the RO-Crate the model repository would be created with (as write_repo_contents.py builds it), so
+# problems are reported on every edit, before anything is published. The validator reuses the templates the
+# crate was built from, so this loads nothing further
+try:
+    timestamp = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+    rocratedict = json.loads(dict_to_metadata(data, flat_compact_crate=False, timestamp=timestamp))
+    assign_ids(rocratedict['@graph'])
+    crate_log = format_warnings(validate_crate(flatten_and_compact(rocratedict)))
+except Exception as err:
+    crate_log = f"Warning: unable to build the RO-Crate for validation: `{err}` \n"
 
 # Write report
 report = """### Model Report
@@ -35,6 +70,8 @@ report += f"### Parsed data \n {dict_to_report(data)} \n\n"
 
 report += f"### Errors and Warnings \n {error_log} \n\n"
 
+report += f"### RO-Crate validation \n {crate_log} \n\n"
+
 report += """### Next steps
 * once the `model_reviewers` team has approved the model, we will create a repository for your model \n\n"""
 
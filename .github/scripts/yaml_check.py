@@ -0,0 +1,71 @@
+import difflib
+import random
+import sys
+from yaml_utils import format_yaml_string
+
+
+#strings the two emitters are most likely to write differently: YAML indicators, quotes, reserved words, numbers
+#and dates, and non-ASCII, non-BMP and non-printable characters
+SAMPLE_STRINGS = [
+    '', 'x', 'yes', 'No', 'null', '~', 'true', '0123', '1.5', '1e3', '2024-01-01', '10:30',
+    'a: b', '- x', '#c', 'a #c', ' lead', 'trail ', '@x', '`x', '%x', '?', ':', '-', '*x', '&x', '!x', '|x', '>x',
+    '{a}', '[b]', 'a,b', "it's", "'q'", "'", "#it's", '"q"', 'say "hi"', 'http://x.y/z?a=b#c',
+    'ünï', 'Zoë', '日本', 'Mantle 🌋 model', '𝒳', 'x\x85y', 'a b', '﻿x', 'a\x7fb', 'tab\there',
+    'line1\nline2', 'x' * 300,
+]
+SAMPLE_KEYS = ['name', 'src', 'c-d', 'e_f', 'title', "it's", 'ünï', '🌋', 'x' * 200]
+
+
+def _value(rng, depth):
+    r = rng.random()
+    if depth > 3 or r < 0.4:
+        return rng.choice([rng.choice(SAMPLE_STRINGS), rng.choice(SAMPLE_STRINGS) + str(rng.randint(0, 9)),
+                           rng.randint(-5, 10**6), 1.5, 1e20, True, False, None])
+    if r < 0.7:
+        return {rng.choice(SAMPLE_KEYS) + str(i): _value(rng, depth + 1) for i in range(rng.randint(0, 4))}
+    return [_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+
+
+def sample_documents(n=2000, seed=0):
+    """
+    Returns n front matter dictionaries built at random (with a fixed seed) from SAMPLE_STRINGS and SAMPLE_KEYS,
+    nested up to four levels, plus one document per sample string.
+    """
+    rng = random.Random(seed)
+    documents = [{'value': s, s or 'empty': [s, {'key': s}]} for s in SAMPLE_STRINGS]
+    for _ in range(n):
+        documents.append({rng.choice(SAMPLE_KEYS) + str(i): _value(rng, 0) for i in range(rng.randint(1, 6))})
+    return documents
+
+
+def check(documents):
+
+    """
+    Golden check of the fast YAML emitter: renders each document with format_yaml_string in 'fast' and 'rt'
+    mode, which must agree byte for byte (documents the fast path can't reproduce fall back to 'rt').
+
+    Parameters:
+    - documents (list): front matter dictionaries.
+
+    Returns:
+    - list: a unified diff (str) per document whose outputs differ
+    """
+
+    diffs = []
+    for document in documents:
+        golden = format_yaml_string(document, mode='rt')
+        fast = format_yaml_string(document, mode='fast')
+        if fast != golden:
+            diffs.append(''.join(difflib.unified_diff(golden.splitlines(True), fast.splitlines(True), 'round-trip', 'fast')))
+    return diffs
+
+
+if __name__ == "__main__":
+    #python3 .github/scripts/yaml_check.py [number of random documents]
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    documents = sample_documents(n)
+    diffs = check(documents)
+    for diff in diffs[:10]:
+        print(diff)
+    print(f"{len(documents)} documents, {len(diffs)} differ")
+    sys.exit(1 if diffs else 0)
@@ -1,9 +1,13 @@
 import re
+import os
 import copy
-from ruamel.yaml import YAML
+import difflib
 import io
 from config import *
 from parse_utils import extract_doi_parts
+from identifiers import find, ORCID
+from crosswalk_engine import yaml_plan
+from for_resolver import term_codes
 
 
 def navigate_and_assign(source, path, value):
@@ -12,8 +16,8 @@ def navigate_and_assign(source, path, value):
     for i, key in enumerate(keys[:-1]):
         if key.isdigit():  # If the key is a digit, it's an index for a list
             key = int(key)
-            while len(source) <= key:  # Extend the list if necessary
-                source.append({})
+            if len(source) <= key:  # Extend the list if necessary
+                source.extend({} for _ in range(key + 1 - len(source)))
             source = source[key]
         else:
             if i < len(keys) - 2 and keys[i + 1].isdigit():  # Next key is a digit, so ensure this key leads to a list
@@ -23,8 +27,8 @@ def navigate_and_assign(source, path, value):
     # Assign the value to the final key
     if keys[-1].isdigit():  # If the final key is a digit, it's an index for a list
         key = int(keys[-1])
-        while len(source) <= key:  # Extend the list if necessary
-            source.append(None)
+        if len(source) <= key:  # Extend the list if necessary
+            source.extend([None] * (key + 1 - len(source)))
         source[key] = value
     else:
         source[keys[-1]] = value
@@ -86,9 +90,18 @@ def apply_mapping(a, b, c):
         navigate_and_assign(a, a_path, value)
 
 def map_dictionaries(a, b, c):
-    """Map values from dictionary B to dictionary A using the mapping defined in dictionary C, dynamically handling lists."""
-    expanded_c = expand_mapping_for_lists(b, c)
-    apply_mapping(a, b, expanded_c)
+    """Map values from dictionary B to dictionary A using the mapping defined in dictionary C, dynamically handling lists.
+
+    The mapping is compiled once into a cached execution plan (see crosswalk_engine.YamlPlan) that gives the same
+    result as expand_mapping_for_lists followed by apply_mapping. Mappings whose paths contain list indices
+    are not compiled, and are applied with those two functions."""
+    try:
+        plan = yaml_plan(c)
+    except ValueError:
+        expanded_c = expand_mapping_for_lists(b, c)
+        apply_mapping(a, b, expanded_c)
+        return
+    plan.apply(a, b)
 
 
 def get_value(d, keys):
@@ -107,12 +120,11 @@ def extract_orcid_id(orcid_input):
     orcid_str = str(orcid_input)
 
     # First, try to match the standard ORCiD format with hyphens
-    pattern_hyphenated = re.compile(r'\d{4}-\d{4}-\d{4}-\d{3}[0-9X]')
-    match = pattern_hyphenated.search(orcid_str)
+    orcid = find(orcid_str, ORCID)
 
-    if match:
-        # If a match is found, return the matched string (the ORCiD ID)
-        return match.group()
+    if orcid:
+        # If a match is found, return the ORCiD ID
+        return orcid.value
 
     # If no match is found, try to match a continuous string of digits
     pattern_continuous = re.compile(r'\d{15,16}')
@@ -279,7 +291,8 @@ def configure_yaml_output_dict(output_dict, issue_dict,
         output_dict['date'] = timestamp
 
     #enforce list and sytax for FOR codes
-    updated_codes = extract_integers(output_dict['for_codes'])
+    #(the mapping only carries one termCode, so a list of terms is read from issue_dict)
+    updated_codes = extract_integers(term_codes(issue_dict.get('for_codes')) or output_dict['for_codes'])
     output_dict.update({'for_codes': updated_codes })
 
     #By default empty values are empty strings.
@@ -386,17 +399,182 @@ def save_yaml_with_header(yaml_content, file_path=None):
 
 
 
-def format_yaml_string(web_yaml_dict):
-    yaml = YAML(typ=['rt', 'string'])
-    yaml.preserve_quotes = True
-    #control the indentation...
-    yaml.indent(mapping=2, sequence=4, offset=2)
-    # Set the width to a large number to avoid line breaks
-    yaml.width = 10000
+#YAML emission used by format_yaml_string:
+# 'fast'   - block layout written directly, scalars rendered in one batch by the C (libyaml) safe dumper;
+#            documents the fast path cannot reproduce exactly are emitted with the round-trip emitter
+# 'rt'     - the ruamel round-trip emitter only
+# 'verify' - run both, print any difference and return the round-trip output (opt-in, for checking)
+#the fast output is checked against the round-trip output by yaml_check.py (run on every change to the scripts)
+YAML_MODE = os.getenv("MATE_YAML_MODE", "fast")
+
+#longest key the emitters write as a simple (implicit) key
+_MAX_SIMPLE_KEY = 128
+
+#characters the two emitters write differently: libyaml escapes characters outside the Basic Multilingual Plane
+#and NEL/line and paragraph separators, where the round-trip emitter writes them as they are (or folds them).
+#Strings with any character outside printable ASCII and the printable BMP are left to the round-trip emitter
+_FAST_UNSAFE_CHARS = re.compile('[^\x20-\x7e\xa0-\u2027\u202a-\ud7ff\ue000-\ufffd]')
+
+
+class _FastPathUnsupported(Exception):
+    pass
+
+
+_emitters = {}
+
+
+def _emitter(kind):
+    #configured YAML instances are built once and reused
+    if kind not in _emitters:
+        from ruamel.yaml import YAML
+        if kind == 'rt':
+            yaml = YAML(typ=['rt', 'string'])
+            yaml.preserve_quotes = True
+            #control the indentation...
+            yaml.indent(mapping=2, sequence=4, offset=2)
+            # Set the width to a large number to avoid line breaks
+            yaml.width = 10000
+        else:
+            #uses the C emitter when ruamel.yaml.clib is installed
+            yaml = YAML(typ='safe', pure=False)
+            yaml.width = 10000
+            yaml.allow_unicode = True
+            yaml.default_flow_style = False
+        _emitters[kind] = yaml
+    return _emitters[kind]
+
+
+def _format_yaml_rt(web_yaml_dict):
     # Use an in-memory text stream to hold the YAML content
     stream = io.StringIO()
     stream.write('---\n')
-    yaml.dump(web_yaml_dict, stream)
+    _emitter('rt').dump(web_yaml_dict, stream)
     stream.write('---\n')
-    yaml_content_with_frontmatter = stream.getvalue()
-    return yaml_content_with_frontmatter
+    return stream.getvalue()
+
+
+def _render_scalars(obj):
+    #renders every key and scalar value of obj with one call to the safe dumper, by dumping them as a list
+    #(one '- value' line each). Returns a dict keyed by (type, value)
+    scalars = {}
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        item_type = type(item)
+        if item_type is dict:
+            for key, value in item.items():
+                if type(key) is str and _FAST_UNSAFE_CHARS.search(key):
+                    raise _FastPathUnsupported('special character')
+                scalars.setdefault((type(key), key), key)
+                stack.append(value)
+        elif item_type is list:
+            stack.extend(item)
+        elif item is not None:
+            if item_type not in (str, int, float, bool):
+                raise _FastPathUnsupported(item_type.__name__)
+            if item_type is str and _FAST_UNSAFE_CHARS.search(item):
+                raise _FastPathUnsupported('special character')
+            scalars.setdefault((item_type, item), item)
+    values = list(scalars.values())
+    stream = io.StringIO()
+    _emitter('safe').dump(values, stream)
+    lines = stream.getvalue().split('\n')
+    #every scalar must fit on one line (no line breaks or folding) for the layout below
+    if len(lines) != len(values) + 1 or any(not line.startswith('- ') for line in lines[:-1]):
+        raise _FastPathUnsupported('multi-line scalar')
+    rendered = {}
+    for k, line in zip(scalars, lines):
+        #a quoted string holding a single quote is double quoted by the round-trip emitter, single quoted by libyaml
+        if line.startswith("- '") and "'" in str(k[1]):
+            raise _FastPathUnsupported('quoted single quote')
+        rendered[k] = line[2:]
+    return rendered
+
+
+def _format_yaml_fast(web_yaml_dict):
+    #writes the block layout of the round-trip emitter (indent mapping=2, sequence=4, offset=2) directly:
+    #'key: value', 'key:' for None, '{}'/'[]' for empty collections, sequences indented under their key
+    rendered = _render_scalars(web_yaml_dict)
+    out = ['---\n']
+
+    def scalar(value):
+        return rendered[(type(value), value)]
+
+    def inline(value):
+        if value is None:
+            return ''
+        if type(value) is dict:
+            return None if value else '{}'
+        if type(value) is list:
+            return None if value else '[]'
+        return scalar(value)
+
+    def mapping(d, indent, first_prefix=None):
+        for i, (key, value) in enumerate(d.items()):
+            prefix = first_prefix if i == 0 and first_prefix is not None else ' ' * indent
+            key_text = scalar(key)
+            if len(key_text) > _MAX_SIMPLE_KEY:
+                raise _FastPathUnsupported('long key')
+            text = inline(value)
+            if text is None:
+                out.append(f"{prefix}{key_text}:\n")
+                if type(value) is dict:
+                    mapping(value, indent + 2)
+                else:
+                    sequence(value, indent + 2)
+            elif text:
+                out.append(f"{prefix}{key_text}: {text}\n")
+            else:
+                out.append(f"{prefix}{key_text}:\n")
+
+    def sequence(items, dash):
+        for item in items:
+            text = inline(item)
+            if text is not None:
+                out.append(f"{' ' * dash}- {text}\n")
+            elif type(item) is dict:
+                mapping(item, dash + 2, ' ' * dash + '- ')
+            else:
+                #nested sequences are laid out differently; leave them to the round-trip emitter
+                raise _FastPathUnsupported('nested sequence')
+
+    if type(web_yaml_dict) is not dict or not web_yaml_dict:
+        raise _FastPathUnsupported('top level')
+    mapping(web_yaml_dict, 0)
+    out.append('---\n')
+    return ''.join(out)
+
+
+def format_yaml_string(web_yaml_dict, mode=None):
+
+    """
+    Formats a dictionary as YAML front matter (enclosed in '---' lines) for the website.
+
+    The layout is that of the ruamel round-trip emitter with indent mapping=2, sequence=4, offset=2 and
+    width 10000, which Gatsby relies on. See YAML_MODE for the available emitters.
+
+    Parameters:
+    - web_yaml_dict (dict): the front matter dictionary.
+    - mode (str, optional): 'fast', 'rt' or 'verify'. Defaults to YAML_MODE.
+
+    Returns:
+    - str: the YAML front matter.
+    """
+
+    mode = mode or YAML_MODE
+    if mode == 'rt':
+        return _format_yaml_rt(web_yaml_dict)
+
+    try:
+        fast = _format_yaml_fast(web_yaml_dict)
+    except _FastPathUnsupported:
+        return _format_yaml_rt(web_yaml_dict)
+    if mode == 'fast':
+        return fast
+
+    #golden check: the fast output must match the round-trip output byte for byte
+    golden = _format_yaml_rt(web_yaml_dict)
+    if fast != golden:
+        diff = difflib.unified_diff(golden.splitlines(True), fast.splitlines(True), 'round-trip', 'fast')
+        print("YAML verification: fast and round-trip output differ\n" + ''.join(diff))
+    return golden